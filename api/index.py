@@ -11,14 +11,15 @@ parent_dir = os.path.dirname(current_dir)
 if parent_dir not in sys.path:
     sys.path.insert(0, parent_dir)
 
-print(f"[DEBUG] Current dir: {current_dir}")
-print(f"[DEBUG] Parent dir: {parent_dir}")
-print(f"[DEBUG] sys.path: {sys.path}")
+# Path dumps only when asked for; they run on every cold start
+if os.getenv("STARTUP_DEBUG"):
+    print(f"[DEBUG] Current dir: {current_dir}")
+    print(f"[DEBUG] Parent dir: {parent_dir}")
+    print(f"[DEBUG] sys.path: {sys.path}")
 
 try:
     # Now import the FastAPI app from backend
     from backend.main import app
-    print("[SUCCESS] Imported backend.main.app successfully!")
 except ImportError as e:
     print(f"[ERROR] Failed to import backend.main: {e}")
     import traceback
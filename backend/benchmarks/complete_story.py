@@ -0,0 +1,126 @@
+"""
+Micro-benchmark of /stories/{id}/complete serialization: the old per-node
+pydantic models vs. the row-to-JSON path in backend/core/story_json.py.
+
+Run from the project root:
+    python -m backend.benchmarks.complete_story
+    python -m backend.benchmarks.complete_story --sizes 7,40,121,500 --iterations 500
+
+Trees are synthetic binary trees with story-sized text, serialized from the
+same node rows every path receives from the database. The fast path is
+timed with each JSON backend available (orjson, pydantic-core) and in both
+response shapes; body sizes show what referencing the root by id saves.
+"""
+
+import argparse
+import statistics
+import time
+from datetime import datetime
+
+from pydantic_core import to_json
+
+from backend.core import story_json
+from backend.core.story_json import complete_story_body
+from backend.schemas.story import CompleteStoryNodeResponse, CompleteStoryResponse, StoryOptionsSchema
+
+CONTENT = (
+    "The lantern gutters as the tunnel splits in two. Cold air rises from the left passage, "
+    "and somewhere to the right, water drips in a slow, patient rhythm. "
+) * 2
+
+
+def make_rows(count: int, branching: int = 2) -> list:
+    """(id, content, is_root, is_ending, is_winning_ending, options) for a tree of `count` nodes"""
+    rows = []
+    for index in range(count):
+        children = [child for child in range(index * branching + 1, index * branching + branching + 1) if child < count]
+        rows.append((
+            1000 + index,
+            CONTENT,
+            index == 0,
+            not children,
+            not children and index % 3 == 0,
+            [{"text": f"Take passage {n + 1}", "node_id": 1000 + child} for n, child in enumerate(children)],
+        ))
+    return rows
+
+
+def legacy_body(story: tuple, rows: list) -> bytes:
+    """build_complete_story_tree + model_dump_json before the fast path, kept for comparison"""
+    node_dict = {}
+    root_id = None
+    for node_id, content, is_root, is_ending, is_winning_ending, options in rows:
+        node_dict[node_id] = CompleteStoryNodeResponse(
+            id=node_id,
+            content=content,
+            is_ending=is_ending,
+            is_winning_ending=is_winning_ending,
+            options=[StoryOptionsSchema.model_validate(option) for option in options]
+        )
+        if is_root:
+            root_id = node_id
+
+    story_id, title, created_at = story
+    return CompleteStoryResponse(
+        id=story_id,
+        title=title,
+        created_at=created_at,
+        root_node=node_dict[root_id],
+        all_nodes=node_dict
+    ).model_dump_json().encode()
+
+
+def time_ms(function, iterations: int) -> list:
+    timings = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        function()
+        timings.append((time.perf_counter() - started) * 1000)
+    return sorted(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="7,31,127,500", help="Comma-separated node counts")
+    parser.add_argument("--iterations", type=int, default=300)
+    args = parser.parse_args()
+
+    backends = {"pydantic-core": to_json}
+    if story_json.orjson is not None:
+        backends["orjson"] = story_json.orjson.dumps
+
+    story = (1, "The Drowned Lantern", datetime(2026, 1, 1, 12, 0, 0))
+    original_dumps = story_json.dumps
+    try:
+        for size in (int(value) for value in args.sizes.split(",")):
+            rows = make_rows(size)
+            paths = {"pydantic models": lambda: legacy_body(story, rows)}
+            for name, dumps in backends.items():
+                paths[f"{name} by id"] = (dumps, False)
+                paths[f"{name} legacy"] = (dumps, True)
+
+            print(f"\n{size} nodes, {args.iterations} iterations (ms per body)")
+            baseline = None
+            for name, path in paths.items():
+                if isinstance(path, tuple):
+                    dumps, legacy = path
+                    story_json.dumps = dumps
+                    function = lambda legacy=legacy: complete_story_body(story, rows, legacy=legacy)
+                else:
+                    function = path
+
+                function()  # warm up
+                timings = time_ms(function, args.iterations)
+                mean = statistics.mean(timings)
+                baseline = baseline or mean
+                print(
+                    f"  {name:<22} mean {mean:8.3f}  p50 {timings[len(timings) // 2]:8.3f}  "
+                    f"p95 {timings[min(len(timings) - 1, int(len(timings) * 0.95))]:8.3f}  "
+                    f"x{baseline / mean:5.1f}  {len(function()):7d} bytes"
+                )
+    finally:
+        story_json.dumps = original_dumps
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,233 @@
+"""
+Offline stand-in for the Groq chat completions API.
+
+Serves POST /openai/v1/chat/completions (plain and streaming) with random
+tree-shaped stories, so the whole generation flow can be load-tested without
+spending quota. Run from the project root:
+    python -m backend.benchmarks.fake_groq --port 8100 --latency 0.5 --tokens-per-second 400
+
+and point the API (or worker) at it:
+    GROQ_BASE_URL=http://127.0.0.1:8100 GROQ_API_KEY=fake uvicorn backend.main:app
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import re
+import time
+import uuid
+from dataclasses import asdict, dataclass
+from typing import Optional
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+# Rough characters per token, used for usage numbers and pacing
+CHARS_PER_TOKEN = 4
+STREAM_CHUNK_CHARS = 16
+
+
+@dataclass
+class FakeGroqConfig:
+    latency: float = 0.5              # seconds before the first token
+    latency_jitter: float = 0.2       # +/- fraction applied to latency
+    tokens_per_second: float = 400.0  # output pace; 0 = instant
+    failure_rate: float = 0.0         # share of requests answered with a 503
+    rate_limit_rate: float = 0.0      # share of requests answered with a 429
+    malformed_rate: float = 0.0       # share of stories returned as broken JSON
+    depth: int = 3
+    branching: int = 2
+    seed: Optional[int] = None
+
+
+class FakeStoryWriter:
+    """Random story trees shaped like what the prompt asks for"""
+
+    def __init__(self, config: FakeGroqConfig, rng: random.Random):
+        self.config = config
+        self.rng = rng
+
+    def story(self) -> dict:
+        return {"title": self._title(), "rootNode": self._node(1, self.config.depth, self.config.branching)}
+
+    def reply_for(self, prompt: str) -> dict:
+        """Answer the fan-out prompts in kind; anything else gets a whole story"""
+        branching = int(_first(r"exactly (\d+) options", prompt) or self.config.branching)
+        if "Create the opening" in prompt:
+            return {"title": self._title(), "rootNode": self._node(1, 1, branching, open_bottom=True)}
+        if "Story so far" in prompt:
+            levels = int(_first(r"tree (\d+) level", prompt) or 1)
+            return self._node(1, levels, branching, open_bottom="are NOT endings" in prompt)
+        return self.story()
+
+    def _title(self) -> str:
+        return f"The {self.rng.choice(_ADJECTIVES)} {self.rng.choice(_PLACES)}"
+
+    def _node(self, level: int, depth: int, branching: int, open_bottom: bool = False) -> dict:
+        if level >= depth and not open_bottom:
+            return {
+                "content": self._paragraph(),
+                "isEnding": True,
+                "isWinningEnding": self.rng.random() < 0.4,
+                "options": []
+            }
+        options = []
+        for _ in range(branching):
+            option = {"text": f"{self.rng.choice(_VERBS)} the {self.rng.choice(_PLACES).lower()}"}
+            if level < depth:
+                option["nextNode"] = self._node(level + 1, depth, branching, open_bottom)
+            options.append(option)
+        return {"content": self._paragraph(), "isEnding": False, "isWinningEnding": False, "options": options}
+
+    def _paragraph(self) -> str:
+        return " ".join(self.rng.choice(_SENTENCES) for _ in range(self.rng.randint(2, 4)))
+
+    def completion_text(self, prompt: str = "") -> str:
+        """The model's reply: fenced JSON, sometimes deliberately broken"""
+        body = json.dumps(self.reply_for(prompt), indent=2)
+        if self.rng.random() < self.config.malformed_rate:
+            body = self._break(body)
+        return f"Here is your story:\n```json\n{body}\n```"
+
+    def _break(self, body: str) -> str:
+        kind = self.rng.choice(("truncated", "trailing_comma", "single_quotes"))
+        if kind == "truncated":
+            return body[: self.rng.randint(len(body) // 3, len(body) - 10)]
+        if kind == "trailing_comma":
+            return body.replace('"options": []', '"options": [],', 1).replace("\n}", ",\n}", 1)
+        return body.replace('"title"', "'title'", 1)
+
+
+def create_app(config: Optional[FakeGroqConfig] = None) -> FastAPI:
+    config = config or FakeGroqConfig()
+    rng = random.Random(config.seed)
+    writer = FakeStoryWriter(config, rng)
+    stats = {"requests": 0, "streams": 0, "failures": 0, "rate_limited": 0}
+
+    app = FastAPI(title="Fake Groq")
+
+    @app.get("/stats")
+    def get_stats():
+        return {**stats, "config": asdict(config)}
+
+    @app.post("/openai/v1/chat/completions")
+    async def chat_completions(request: Request):
+        params = await request.json()
+        stats["requests"] += 1
+
+        roll = rng.random()
+        if roll < config.rate_limit_rate:
+            stats["rate_limited"] += 1
+            return _error(429, "rate_limit_exceeded", {"retry-after": "1"})
+        if roll < config.rate_limit_rate + config.failure_rate:
+            stats["failures"] += 1
+            return _error(503, "service_unavailable")
+
+        jitter = 1 + rng.uniform(-config.latency_jitter, config.latency_jitter)
+        await asyncio.sleep(max(0.0, config.latency * jitter))
+
+        prompt = "\n".join(m.get("content") or "" for m in params.get("messages", []))
+        text = writer.completion_text(prompt)
+        prompt_tokens = sum(len(m.get("content") or "") for m in params.get("messages", [])) // CHARS_PER_TOKEN
+        completion_tokens = max(1, len(text) // CHARS_PER_TOKEN)
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        }
+        model = params.get("model", "fake")
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+
+        if params.get("stream"):
+            stats["streams"] += 1
+            return StreamingResponse(
+                _stream(config, completion_id, model, text, usage),
+                media_type="text/event-stream"
+            )
+
+        if config.tokens_per_second:
+            await asyncio.sleep(completion_tokens / config.tokens_per_second)
+        return {
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": text},
+                "finish_reason": "stop",
+            }],
+            "usage": usage,
+        }
+
+    return app
+
+
+async def _stream(config: FakeGroqConfig, completion_id: str, model: str, text: str, usage: dict):
+    delay = STREAM_CHUNK_CHARS / CHARS_PER_TOKEN / config.tokens_per_second if config.tokens_per_second else 0
+    created = int(time.time())
+
+    def chunk(delta: dict, finish_reason=None, **extra) -> str:
+        payload = {
+            "id": completion_id,
+            "object": "chat.completion.chunk",
+            "created": created,
+            "model": model,
+            "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+            **extra,
+        }
+        return f"data: {json.dumps(payload)}\n\n"
+
+    yield chunk({"role": "assistant", "content": ""})
+    for start in range(0, len(text), STREAM_CHUNK_CHARS):
+        if delay:
+            await asyncio.sleep(delay)
+        yield chunk({"content": text[start:start + STREAM_CHUNK_CHARS]})
+    yield chunk({}, "stop", x_groq={"id": completion_id, "usage": usage})
+    yield "data: [DONE]\n\n"
+
+
+def _first(pattern: str, text: str) -> Optional[str]:
+    match = re.search(pattern, text)
+    return match.group(1) if match else None
+
+
+def _error(status: int, code: str, headers: Optional[dict] = None) -> JSONResponse:
+    return JSONResponse(
+        {"error": {"message": f"Fake {code}", "type": code, "code": code}},
+        status_code=status,
+        headers=headers
+    )
+
+
+_ADJECTIVES = ["Sunken", "Whispering", "Forgotten", "Burning", "Silver", "Hollow"]
+_PLACES = ["Citadel", "Forest", "Harbor", "Library", "Observatory", "Caverns"]
+_VERBS = ["Explore", "Sneak past", "Climb", "Search", "Avoid", "Enter"]
+_SENTENCES = [
+    "A cold wind carries the smell of rain and old stone.",
+    "Somewhere ahead, a lantern flickers and goes out.",
+    "Your footsteps echo longer than they should.",
+    "A stranger watches you from the shadows, saying nothing.",
+    "The map in your pocket no longer matches the road.",
+    "Distant bells ring out a warning you don't understand.",
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    defaults = FakeGroqConfig()
+    for field, value in asdict(defaults).items():
+        parser.add_argument(f"--{field.replace('_', '-')}", type=type(value) if value is not None else int, default=value)
+    args = parser.parse_args()
+
+    import uvicorn
+
+    config = FakeGroqConfig(**{field: getattr(args, field) for field in asdict(defaults)})
+    uvicorn.run(create_app(config), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+"""
+Micro-benchmark of completion JSON extraction: the old brace-counting
+extractor vs. the single-pass repairer in backend/core/json_repair.py.
+
+Run from the project root:
+    python -m backend.benchmarks.json_extract
+    python -m backend.benchmarks.json_extract --corpus completions.jsonl
+
+The synthetic corpus covers clean replies, prose and fences, braces inside
+story text, raw newlines, trailing commas, single quotes and replies cut off
+at max_tokens. --corpus adds captured completions, one JSON object with a
+"text" field per line. The last table times parsing the extracted JSON into
+a validated StoryLLMResponse.
+"""
+
+import argparse
+import json
+import random
+import statistics
+import time
+from collections import defaultdict
+
+from backend.benchmarks.fake_groq import FakeGroqConfig, FakeStoryWriter
+from backend.core.json_repair import extract_json
+from backend.core.models import StoryLLMResponse
+
+
+def legacy_extract_json(text: str) -> str:
+    """StoryGenerator._extract_json before the repairer, kept for comparison"""
+    text = text.strip()
+    if "```" in text:
+        text = text.replace("```json", "").replace("```", "").strip()
+    if not text.startswith('{'):
+        start = text.find('{')
+        if start != -1:
+            text = text[start:]
+    brace_count = 0
+    for i, char in enumerate(text):
+        if char == '{':
+            brace_count += 1
+        elif char == '}':
+            brace_count -= 1
+            if brace_count == 0:
+                return text[:i + 1]
+    return text
+
+
+def repair_extract_json(text: str) -> str:
+    return extract_json(text).text
+
+
+EXTRACTORS = {"legacy": legacy_extract_json, "repair": repair_extract_json}
+
+
+def synthetic_corpus(size: int, depth: int, seed: int) -> dict:
+    rng = random.Random(seed)
+    writer = FakeStoryWriter(FakeGroqConfig(depth=depth), rng)
+
+    def story_json(indent=2) -> str:
+        return json.dumps(writer.story(), indent=indent)
+
+    def with_braces() -> str:
+        story = writer.story()
+        story["rootNode"]["content"] += " The door is carved with {runes} and a lone '}'."
+        return json.dumps(story, indent=2)
+
+    def truncated() -> str:
+        body = story_json()
+        return "```json\n" + body[: rng.randint(len(body) // 2, len(body) - 5)]
+
+    makers = {
+        "clean": lambda: story_json(None),
+        "fenced_prose": lambda: f"Here is your story:\n```json\n{story_json()}\n```\nEnjoy!",
+        "braces_in_strings": lambda: f"```json\n{with_braces()}\n```",
+        "raw_newlines": lambda: story_json().replace(". ", ".\n", 3),
+        "trailing_commas": lambda: story_json().replace('"options": []', '"options": [],'),
+        "single_quotes": lambda: story_json().replace('"title"', "'title'").replace('"content"', "'content'"),
+        "truncated": truncated,
+    }
+    return {name: [make() for _ in range(size)] for name, make in makers.items()}
+
+
+def load_corpus(path: str) -> list:
+    with open(path) as f:
+        return [json.loads(line)["text"] for line in f if line.strip()]
+
+
+def count_nodes(node) -> int:
+    if not isinstance(node, dict):
+        return 0
+    return 1 + sum(count_nodes(option.get("nextNode")) for option in node.get("options") or [] if isinstance(option, dict))
+
+
+def evaluate(extractor, texts: list, repeat: int) -> dict:
+    parsed, nodes = 0, 0
+    for text in texts:
+        try:
+            data = json.loads(extractor(text))
+        except ValueError:
+            continue
+        if isinstance(data, dict) and "title" in data and "rootNode" in data:
+            parsed += 1
+            nodes += count_nodes(data["rootNode"])
+
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for text in texts:
+            extractor(text)
+        timings.append((time.perf_counter() - started) / len(texts) * 1e6)
+
+    return {
+        "parsed": parsed,
+        "total": len(texts),
+        "nodes": nodes,
+        "us_per_call": statistics.median(timings),
+        "chars": statistics.mean(len(text) for text in texts),
+    }
+
+
+def time_parsers(texts: list, repeat: int) -> dict:
+    """Per-call cost of turning extracted JSON into a story tree"""
+    parsers = {
+        "json.loads": json.loads,
+        "json.loads + model_validate": lambda text: StoryLLMResponse.model_validate(json.loads(text)),
+        "model_validate_json": StoryLLMResponse.model_validate_json,
+    }
+    results = {}
+    for name, parse in parsers.items():
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            for text in texts:
+                parse(text)
+            timings.append((time.perf_counter() - started) / len(texts) * 1e6)
+        results[name] = statistics.median(timings)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", type=int, default=200, help="synthetic responses per category")
+    parser.add_argument("--depth", type=int, default=3)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--corpus", help="JSONL of captured completions ({\"text\": ...} per line)")
+    args = parser.parse_args()
+
+    corpus = synthetic_corpus(args.size, args.depth, args.seed)
+    if args.corpus:
+        corpus["captured"] = load_corpus(args.corpus)
+
+    totals = defaultdict(lambda: [0, 0])
+    print(f"{'category':<18} {'chars':>6}  {'extractor':<7} {'parsed':>9} {'nodes':>6} {'us/call':>9}")
+    for category, texts in corpus.items():
+        for name, extractor in EXTRACTORS.items():
+            result = evaluate(extractor, texts, args.repeat)
+            totals[name][0] += result["parsed"]
+            totals[name][1] += result["total"]
+            print(
+                f"{category:<18} {result['chars']:6.0f}  {name:<7} "
+                f"{result['parsed']:>4}/{result['total']:<4} {result['nodes']:>6} {result['us_per_call']:9.1f}"
+            )
+
+    print()
+    for name, (parsed, total) in totals.items():
+        print(f"{name:<7} parsed {parsed}/{total} ({parsed / total:.1%})")
+
+    print("\nparse + validate (clean replies)")
+    clean = [repair_extract_json(text) for text in corpus["clean"]]
+    for name, us in time_parsers(clean, args.repeat).items():
+        print(f"  {name:<28} {us:8.1f} us/call")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,398 @@
+"""
+End-to-end load test of the story flow:
+    POST /stories/create -> long-poll GET /jobs/{id} -> GET /stories/{id}/complete
+
+By default the API and a fake Groq server (backend/benchmarks/fake_groq.py)
+are started in this process against a scratch database, which also lets the
+run count DB queries. Run from the project root:
+    python -m backend.benchmarks.loadtest --players 20 --stories 5 --output loadtest.json
+    python -m backend.benchmarks.loadtest --latency 2 --failure-rate 0.05 --baseline loadtest.json
+
+With --lazy each player also walks one random path through the story,
+opening every node and pausing --think-time before choosing.
+
+Or drive an already running API (started with GROQ_BASE_URL pointing at the
+fake server); DB queries are not counted then:
+    python -m backend.benchmarks.loadtest --api-url http://127.0.0.1:8000
+
+Results are written as JSON; --baseline prints the change against an
+earlier results file.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import statistics
+import subprocess
+import threading
+import time
+import uuid
+from collections import Counter, defaultdict
+from dataclasses import asdict
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+
+from backend.benchmarks.fake_groq import FakeGroqConfig, create_app
+
+TERMINAL_STATUSES = ("completed", "failed")
+
+
+class RunResults:
+    def __init__(self):
+        self.job_seconds: List[float] = []
+        self.api_ms: Dict[str, List[float]] = defaultdict(list)
+        self.completed = 0
+        self.failed = 0
+        self.errors: Counter = Counter()
+        self.lazy_stats: Optional[dict] = None
+        self.admission_stats: Optional[dict] = None
+
+
+class QueryCounter:
+    """Counts statements sent to the API's database engine"""
+
+    def __init__(self, engine):
+        from sqlalchemy import event
+
+        self.count = 0
+        self._lock = threading.Lock()
+        event.listen(engine, "before_cursor_execute", self._on_execute)
+
+    def _on_execute(self, *args):
+        with self._lock:
+            self.count += 1
+
+
+class ServerThread:
+    """Run an ASGI app with uvicorn on a background thread"""
+
+    def __init__(self, app, port: int):
+        import uvicorn
+
+        self.server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+        self.thread = threading.Thread(target=self.server.run, daemon=True)
+        self.url = f"http://127.0.0.1:{port}"
+
+    def __enter__(self):
+        self.thread.start()
+        while not self.server.started:
+            if not self.thread.is_alive():
+                raise SystemExit(f"Server on {self.url} failed to start")
+            time.sleep(0.05)
+        return self
+
+    def __exit__(self, *exc):
+        self.server.should_exit = True
+        self.thread.join(timeout=10)
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def percentiles(values: List[float]) -> dict:
+    if not values:
+        return {"count": 0}
+    ordered = sorted(values)
+
+    def rank(p: float) -> float:
+        return ordered[min(len(ordered) - 1, max(0, round(p * len(ordered)) - 1))]
+
+    return {
+        "count": len(ordered),
+        "mean": round(statistics.mean(ordered), 3),
+        "p50": round(rank(0.50), 3),
+        "p95": round(rank(0.95), 3),
+        "p99": round(rank(0.99), 3),
+        "max": round(ordered[-1], 3),
+    }
+
+
+async def timed(results: RunResults, name: str, request) -> httpx.Response:
+    started = time.perf_counter()
+    response = await request
+    results.api_ms[name].append((time.perf_counter() - started) * 1000)
+    response.raise_for_status()
+    return response
+
+
+async def play_story(client: httpx.AsyncClient, api_prefix: str, request: dict, args, results: RunResults):
+    started = time.perf_counter()
+    try:
+        # Every create is a new story, not a retry of the last one
+        job = (await timed(results, "create", client.post(
+            f"{api_prefix}/stories/create", json=request, headers={"Idempotency-Key": str(uuid.uuid4())}
+        ))).json()
+        while job["status"] not in TERMINAL_STATUSES:
+            if time.perf_counter() - started > args.job_timeout:
+                raise TimeoutError("job timed out")
+            job = (await timed(results, "job_status", client.get(
+                f"{api_prefix}/jobs/{job['job_id']}", params={"wait": 25, "since": job["status"]}
+            ))).json()
+
+        if job["status"] == "failed":
+            results.failed += 1
+            results.errors[f"job failed: {(job.get('error') or '')[:80]}"] += 1
+            return
+
+        results.job_seconds.append(time.perf_counter() - started)
+        story = (await timed(results, "complete", client.get(f"{api_prefix}/stories/{job['story_id']}/complete"))).json()
+        if request.get("lazy"):
+            await play_path(client, api_prefix, story, args.think_time, results)
+        results.completed += 1
+    except (httpx.HTTPError, TimeoutError) as e:
+        results.failed += 1
+        results.errors[type(e).__name__ if not isinstance(e, httpx.HTTPStatusError) else f"HTTP {e.response.status_code}"] += 1
+
+
+async def play_path(client: httpx.AsyncClient, api_prefix: str, story: dict, think_time: float, results: RunResults):
+    """Walk one random path through a lazy story, opening each node like a player"""
+    node_id = story.get("root_node_id") or story["root_node"]["id"]
+    while True:
+        node = (await timed(results, "lazy_node", client.get(
+            f"{api_prefix}/stories/{story['id']}/nodes/{node_id}"
+        ))).json()
+        if node["is_ending"] or not node["options"]:
+            return
+        await asyncio.sleep(think_time)
+        node_id = random.choice(node["options"])["node_id"]
+
+
+async def play(api_url: str, api_prefix: str, request: dict, args, results: RunResults):
+    """One player: their own session cookie, stories one after another"""
+    async with httpx.AsyncClient(base_url=api_url, timeout=60) as client:
+        for _ in range(args.stories):
+            await play_story(client, api_prefix, request, args, results)
+
+
+async def run_load(args, api_url: str) -> Tuple[RunResults, float]:
+    results = RunResults()
+    request = {"theme": args.theme}
+    if args.story_depth:
+        request["depth"] = args.story_depth
+    if args.story_branching:
+        request["branching"] = args.story_branching
+    if args.lazy:
+        request["lazy"] = True
+
+    started = time.perf_counter()
+    await asyncio.gather(*[
+        play(api_url, args.api_prefix, request, args, results)
+        for _ in range(args.players)
+    ])
+    elapsed = time.perf_counter() - started
+    async with httpx.AsyncClient(base_url=api_url) as client:
+        results.admission_stats = (await client.get(f"{args.api_prefix}/stories/admission/stats")).json()
+        if args.lazy:
+            results.lazy_stats = (await client.get(f"{args.api_prefix}/stories/lazy/stats")).json()
+    return results, elapsed
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def in_process_run(args, fake_config: FakeGroqConfig) -> dict:
+    """Start fake Groq + the API here, then run the load against them"""
+    fake_port = free_port()
+    os.environ["POSTGRES_URL"] = args.database_url
+    os.environ["GROQ_BASE_URL"] = f"http://127.0.0.1:{fake_port}"
+    os.environ.setdefault("GROQ_API_KEY", "fake")
+    # Measure the app, not our own client-side Groq throttling
+    os.environ.setdefault("GROQ_REQUESTS_PER_MINUTE", "1000000")
+    os.environ.setdefault("GROQ_TOKENS_PER_MINUTE", "1000000000")
+    # Players send the same request over and over on purpose
+    os.environ.setdefault("IDEMPOTENCY_WINDOW_SECONDS", "0")
+
+    # Imported late so settings pick up the environment above
+    from backend.core.config import settings
+    from backend.db.database import engine, pool_metrics
+    from backend.main import app
+
+    counter = QueryCounter(engine)
+    with ServerThread(create_app(fake_config), fake_port) as fake, ServerThread(app, free_port()) as api:
+        queries_before = counter.count
+        results, elapsed = asyncio.run(run_load(args, api.url))
+        queries = counter.count - queries_before
+        fake_stats = httpx.get(f"{fake.url}/stats").json()
+
+    return {
+        "results": results,
+        "elapsed": elapsed,
+        "db_queries": queries,
+        "fake_groq": {key: value for key, value in fake_stats.items() if key != "config"},
+        "db_pool": pool_metrics.stats(),
+        "settings": {
+            "database": engine.dialect.name,
+            "JOB_QUEUE": settings.JOB_QUEUE,
+            "STREAM_GENERATION": settings.STREAM_GENERATION,
+            "STORY_STORAGE": settings.STORY_STORAGE,
+            "BULK_PERSIST": settings.BULK_PERSIST,
+            "SINGLE_FLIGHT": settings.SINGLE_FLIGHT,
+            "POOL_THEMES": settings.POOL_THEMES,
+            "ADMISSION_MAX_ACTIVE_JOBS": settings.ADMISSION_MAX_ACTIVE_JOBS,
+            "IDEMPOTENCY_WINDOW_SECONDS": settings.IDEMPOTENCY_WINDOW_SECONDS,
+        },
+    }
+
+
+def report(args, fake_config: FakeGroqConfig, run: dict) -> dict:
+    results: RunResults = run["results"]
+    stories = results.completed + results.failed
+    return {
+        "recorded_at": datetime.now(timezone.utc).isoformat(),
+        "git_commit": git_commit(),
+        "config": {
+            "players": args.players,
+            "stories_per_player": args.stories,
+            "theme": args.theme,
+            "story_depth": args.story_depth,
+            "story_branching": args.story_branching,
+            "lazy": args.lazy,
+            "think_time": args.think_time if args.lazy else None,
+            "api_url": args.api_url,
+            "fake_groq": asdict(fake_config) if not args.api_url else None,
+            "settings": run.get("settings"),
+        },
+        "stories": {
+            "completed": results.completed,
+            "failed": results.failed,
+            "elapsed_seconds": round(run["elapsed"], 3),
+            "throughput_per_second": round(results.completed / run["elapsed"], 3) if run["elapsed"] else None,
+        },
+        "job_completion_seconds": percentiles(results.job_seconds),
+        "api_latency_ms": {name: percentiles(timings) for name, timings in sorted(results.api_ms.items())},
+        "db_queries_per_story": round(run["db_queries"] / stories, 2) if run.get("db_queries") is not None and stories else None,
+        "fake_groq": run.get("fake_groq"),
+        "db_pool": run.get("db_pool"),
+        "groq_requests_per_story": (
+            round(run["fake_groq"]["requests"] / results.completed, 2)
+            if run.get("fake_groq") and results.completed else None
+        ),
+        "lazy": results.lazy_stats,
+        "admission": results.admission_stats,
+        "errors": dict(results.errors),
+    }
+
+
+# (label, path into the results file, True if higher is better)
+COMPARED_METRICS = [
+    ("throughput/s", ("stories", "throughput_per_second"), True),
+    ("job p50 s", ("job_completion_seconds", "p50"), False),
+    ("job p95 s", ("job_completion_seconds", "p95"), False),
+    ("job p99 s", ("job_completion_seconds", "p99"), False),
+    ("create p95 ms", ("api_latency_ms", "create", "p95"), False),
+    ("complete p95 ms", ("api_latency_ms", "complete", "p95"), False),
+    ("queries/story", ("db_queries_per_story",), False),
+    ("groq calls/story", ("groq_requests_per_story",), False),
+    ("checkout p95 ms", ("db_pool", "checkout_wait_ms_p95"), False),
+    ("choice p95 ms", ("api_latency_ms", "lazy_node", "p95"), False),
+    ("tokens/story", ("lazy", "avg_tokens_per_story"), False),
+    ("failed", ("stories", "failed"), False),
+]
+
+
+def compare(baseline: dict, current: dict):
+    def lookup(data: dict, path: tuple):
+        for key in path:
+            data = data.get(key) if isinstance(data, dict) else None
+        return data
+
+    print(f"\n  vs. baseline {baseline.get('git_commit') or ''} ({baseline.get('recorded_at', '?')})")
+    for label, path, higher_is_better in COMPARED_METRICS:
+        before, after = lookup(baseline, path), lookup(current, path)
+        if before is None or after is None:
+            continue
+        change = f"{(after - before) / before * 100:+6.1f}%" if before else "   n/a"
+        worse = after < before if higher_is_better else after > before
+        print(f"    {label:<16} {before:>10} -> {after:<10} {change}{'  (worse)' if worse and before != after else ''}")
+
+
+def print_summary(data: dict):
+    stories = data["stories"]
+    print(
+        f"\n{stories['completed']} completed, {stories['failed']} failed in {stories['elapsed_seconds']}s "
+        f"({stories['throughput_per_second']} stories/s)"
+    )
+    jobs = data["job_completion_seconds"]
+    if jobs["count"]:
+        print(f"  job completion (s)  p50 {jobs['p50']}  p95 {jobs['p95']}  p99 {jobs['p99']}  max {jobs['max']}")
+    for name, timings in data["api_latency_ms"].items():
+        print(f"  {name:<18} (ms) p50 {timings['p50']}  p95 {timings['p95']}  p99 {timings['p99']}")
+    if data["db_queries_per_story"] is not None:
+        print(f"  DB queries per story  {data['db_queries_per_story']}")
+    if data["db_pool"]:
+        pool = data["db_pool"]
+        print(
+            f"  DB pool ({pool['profile']})  checkout p50 {pool['checkout_wait_ms_p50']} ms  "
+            f"p95 {pool['checkout_wait_ms_p95']} ms  max {pool['checkout_wait_ms_max']} ms  "
+            f"opened {pool['connections_opened']}"
+        )
+    if data["groq_requests_per_story"] is not None:
+        print(f"  Groq calls per story  {data['groq_requests_per_story']}")
+    if data["lazy"]:
+        print(f"  lazy stories  {data['lazy']}")
+    if data.get("admission"):
+        admission = data["admission"]
+        print(
+            f"  admission  admitted {admission['admitted']}  shed {admission['shed_overload']} overload, "
+            f"{admission['shed_session']} per session  served existing {admission['served_existing']}"
+        )
+    for error, count in data["errors"].items():
+        print(f"  error x{count}: {error}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--players", type=int, default=10, help="concurrent players")
+    parser.add_argument("--stories", type=int, default=3, help="stories each player creates, one after another")
+    parser.add_argument("--theme", default="fantasy")
+    parser.add_argument("--story-depth", type=int, help="request a fan-out story this deep")
+    parser.add_argument("--story-branching", type=int, help="request a fan-out story with this branching")
+    parser.add_argument("--lazy", action="store_true", help="create lazy stories and play one path through each")
+    parser.add_argument("--think-time", type=float, default=2.0, help="seconds a lazy player reads before choosing")
+    parser.add_argument("--job-timeout", type=float, default=120.0)
+    parser.add_argument("--api-url", help="drive a running API instead of starting one")
+    parser.add_argument("--api-prefix", default="/api")
+    parser.add_argument("--database-url", default="sqlite:///loadtest.db", help="scratch database for the in-process API")
+    parser.add_argument("--output", default="loadtest_results.json")
+    parser.add_argument("--baseline", help="earlier results file to compare against")
+
+    fake = parser.add_argument_group("fake Groq (in-process runs)")
+    fake_defaults = asdict(FakeGroqConfig())
+    for field, value in fake_defaults.items():
+        fake.add_argument(f"--{field.replace('_', '-')}", type=type(value) if value is not None else int, default=value)
+    args = parser.parse_args()
+
+    fake_config = FakeGroqConfig(**{field: getattr(args, field) for field in fake_defaults})
+    if args.api_url:
+        results, elapsed = asyncio.run(run_load(args, args.api_url))
+        run = {"results": results, "elapsed": elapsed, "db_queries": None}
+    else:
+        run = in_process_run(args, fake_config)
+
+    data = report(args, fake_config, run)
+    print_summary(data)
+    with open(args.output, "w") as f:
+        json.dump(data, f, indent=2)
+    print(f"\nResults written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            compare(json.load(f), data)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""
+Admission control for POST /stories/create.
+
+Every pending or processing job holds a slot. A new job is admitted only
+while there are fewer than ADMISSION_MAX_ACTIVE_JOBS overall (503 otherwise)
+and ADMISSION_MAX_SESSION_JOBS for the requesting session (429), so a spike
+is turned away up front instead of queueing work that would time out.
+
+Counts come from story_jobs, so they cover every API instance and worker.
+Two requests racing for the last slot can both get in: the caps are there
+to bound overload, not to be exact quotas.
+
+Retry-After is how long the jobs ahead should take at the completion rate
+seen over the last ADMISSION_THROUGHPUT_WINDOW seconds.
+"""
+
+import math
+import threading
+from dataclasses import dataclass
+from datetime import timedelta
+from typing import Optional
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from backend.core.config import settings
+from backend.core.job_queue import utcnow
+from backend.core.log import get_logger
+from backend.core.metrics import ADMISSION_DECISIONS
+from backend.core.story_pool import normalize_theme
+from backend.models.job import ACTIVE_STATUSES, StoryJob
+
+log = get_logger("Admission")
+
+FINISHED_STATUSES = ("completed", "failed")
+
+
+@dataclass
+class Rejection:
+    status_code: int
+    detail: str
+    retry_after: int
+
+
+class AdmissionController:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.decisions = {"admitted": 0, "shed_session": 0, "shed_overload": 0, "served_existing": 0}
+        self.last_active: Optional[int] = None
+        self.last_throughput: Optional[float] = None
+
+    def check(self, db: Session, session_id: str) -> Optional[Rejection]:
+        """None if a new job for this session may start, else why not and when to retry"""
+        if settings.ADMISSION_MAX_SESSION_JOBS > 0:
+            session_jobs = [
+                job_id for (job_id,) in db.query(StoryJob.id)
+                .filter(StoryJob.session_id == session_id, StoryJob.status.in_(ACTIVE_STATUSES))
+                .order_by(StoryJob.id)
+            ]
+            if len(session_jobs) >= settings.ADMISSION_MAX_SESSION_JOBS:
+                # A slot frees up when the session's oldest job finishes
+                ahead = self._active_jobs(db, up_to_id=session_jobs[0])
+                self.record("shed_session")
+                return Rejection(
+                    429,
+                    f"You already have {len(session_jobs)} stories being written; wait for one to finish",
+                    self._retry_after(db, ahead)
+                )
+
+        if settings.ADMISSION_MAX_ACTIVE_JOBS > 0:
+            active = self._active_jobs(db)
+            with self._lock:
+                self.last_active = active
+            if active >= settings.ADMISSION_MAX_ACTIVE_JOBS:
+                self.record("shed_overload")
+                log.warning("Shedding story request", active_jobs=active, limit=settings.ADMISSION_MAX_ACTIVE_JOBS)
+                return Rejection(
+                    503,
+                    "Too many stories are being written right now; try again shortly",
+                    self._retry_after(db, active - settings.ADMISSION_MAX_ACTIVE_JOBS + 1)
+                )
+
+        self.record("admitted")
+        return None
+
+    def existing_story(self, db: Session, theme: str) -> Optional[int]:
+        """The most recent finished classic story written for this theme, however it was typed"""
+        return (
+            db.query(StoryJob.story_id)
+            .filter(
+                StoryJob.theme_key == normalize_theme(theme),
+                StoryJob.status == "completed",
+                StoryJob.story_id.isnot(None),
+                StoryJob.depth.is_(None),
+            )
+            .order_by(StoryJob.id.desc())
+            .limit(1)
+            .scalar()
+        )
+
+    def record(self, outcome: str):
+        with self._lock:
+            self.decisions[outcome] += 1
+        ADMISSION_DECISIONS.inc(outcome=outcome)
+
+    def _active_jobs(self, db: Session, up_to_id: Optional[int] = None) -> int:
+        query = db.query(func.count(StoryJob.id)).filter(StoryJob.status.in_(ACTIVE_STATUSES))
+        if up_to_id is not None:
+            query = query.filter(StoryJob.id <= up_to_id)
+        return query.scalar()
+
+    def _retry_after(self, db: Session, jobs_ahead: int) -> int:
+        """Seconds until `jobs_ahead` jobs finish at the recent completion rate"""
+        window = settings.ADMISSION_THROUGHPUT_WINDOW
+        finished = db.query(func.count(StoryJob.id)).filter(
+            StoryJob.completed_at >= utcnow() - timedelta(seconds=window),
+            StoryJob.status.in_(FINISHED_STATUSES)
+        ).scalar()
+        throughput = finished / window
+        with self._lock:
+            self.last_throughput = throughput
+        if not throughput:
+            return settings.ADMISSION_RETRY_AFTER_MAX
+        return max(1, min(settings.ADMISSION_RETRY_AFTER_MAX, math.ceil(jobs_ahead / throughput)))
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                **self.decisions,
+                "max_active_jobs": settings.ADMISSION_MAX_ACTIVE_JOBS,
+                "max_session_jobs": settings.ADMISSION_MAX_SESSION_JOBS,
+                "last_active_jobs": self.last_active,
+                "last_throughput_per_second": (
+                    round(self.last_throughput, 3) if self.last_throughput is not None else None
+                ),
+            }
+
+
+admission = AdmissionController()
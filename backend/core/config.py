@@ -3,6 +3,8 @@ from pydantic_settings import BaseSettings, SettingsConfigDict
 from pydantic import Field
 import os
 
+from backend.core.log import configure_logging, get_logger
+
 class Settings(BaseSettings):
     model_config = SettingsConfigDict(
         env_file=".env",
@@ -14,11 +16,144 @@ class Settings(BaseSettings):
     API_PREFIX: str = "/api"
     DEBUG: bool = True
     DATABASE_URL: Optional[str] = None
+    # Which of the fallbacks in __init__ set DATABASE_URL (logged at import)
+    DATABASE_SOURCE: Optional[str] = None
+
+    # "text" ([NAME] message key=value) or "json" (one object per line)
+    LOG_FORMAT: str = "text"
+    LOG_LEVEL: str = "INFO"
     
     allowed_origins_str: str = Field(default="", validation_alias="ALLOWED_ORIGINS")
     OPENAI_API_KEY: Optional[str] = None
     GROQ_API_KEY: Optional[str] = None
-    
+
+    # Schema work at start-up: "create" runs create_all + additive migrations,
+    # "check" only does so when the stored schema fingerprint is stale (one
+    # SELECT otherwise), "skip" leaves it to `python -m backend.manage migrate`
+    SCHEMA_MODE: str = "check"
+
+    # Engine profile: "serverless" (NullPool, for pgbouncer/Neon pooler URLs),
+    # "server" (sized QueuePool with pre-ping), "sqlite" (WAL) or "auto",
+    # which picks sqlite for SQLite URLs, serverless on Vercel, else server
+    DB_PROFILE: str = "auto"
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: float = 30.0
+    DB_POOL_RECYCLE: int = 1800
+    DB_CONNECT_TIMEOUT: int = 10
+    DB_SQLITE_BUSY_TIMEOUT: float = 15.0
+
+    # Write the whole story tree in one batched INSERT instead of flushing per node
+    BULK_PERSIST: bool = True
+
+    # Where story trees live: "nodes" (story_nodes rows), "blob" (one
+    # compressed value on the stories row) or "both"
+    STORY_STORAGE: str = "nodes"
+
+    # Point at a Groq-compatible server (e.g. backend/benchmarks/fake_groq.py)
+    GROQ_BASE_URL: Optional[str] = None
+
+    # Shared AsyncGroq connection pool
+    GROQ_TIMEOUT: float = 45.0
+    GROQ_MAX_CONNECTIONS: int = 100
+    GROQ_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    GROQ_KEEPALIVE_EXPIRY: float = 30.0
+
+    # Client-side Groq rate limiting (corrected from response headers)
+    GROQ_REQUESTS_PER_MINUTE: int = 30
+    GROQ_TOKENS_PER_MINUTE: int = 6000
+    GROQ_COMPLETION_TOKEN_ESTIMATE: int = 1200
+    GROQ_MAX_RETRIES: int = 3
+    GROQ_RETRY_BASE_SECONDS: float = 1.0
+    GROQ_RETRY_MAX_SECONDS: float = 30.0
+
+    # Fan-out generation of deeper trees (depth/branching on CreateStoryRequest)
+    FANOUT_MAX_DEPTH: int = 6
+    FANOUT_MAX_BRANCHING: int = 4
+    FANOUT_MAX_NODES: int = 121
+    FANOUT_LEVELS_PER_CALL: int = 3
+    FANOUT_CALL_ATTEMPTS: int = 2
+
+    # Lazy stories: how many children of an opened node get their own
+    # children generated ahead of the player's choice (0 = no prefetch)
+    LAZY_PREFETCH_CHILDREN: int = 4
+    # Most nodes one lazy story may grow to, however many get expanded. Lazy
+    # shapes whose full tree would be larger are refused up front
+    LAZY_MAX_NODES: int = 341
+
+    # Coalesce jobs asking for the same theme and shape at the same time:
+    # at most MAX_GENERATIONS Groq generations per key, each shared by up
+    # to MAX_WAITERS extra jobs (see backend/core/single_flight.py)
+    SINGLE_FLIGHT: bool = False
+    SINGLE_FLIGHT_MAX_GENERATIONS: int = 1
+    SINGLE_FLIGHT_MAX_WAITERS: int = 50
+
+    # Stream the completion and persist nodes as they arrive
+    STREAM_GENERATION: bool = False
+
+    # "background": run jobs in FastAPI BackgroundTasks of the API process.
+    # "database": only enqueue them; `python -m backend.worker` runs them.
+    JOB_QUEUE: str = "background"
+    WORKER_PROCESSES: int = 1
+    WORKER_CONCURRENCY: int = 8
+    WORKER_POLL_INTERVAL: float = 1.0
+    JOB_LEASE_SECONDS: float = 60.0
+    JOB_HEARTBEAT_SECONDS: float = 15.0
+    JOB_MAX_ATTEMPTS: int = 3
+    JOB_RETRY_BASE_SECONDS: float = 5.0
+    JOB_RETRY_MAX_SECONDS: float = 300.0
+
+    # Job table maintenance (backend/core/job_maintenance.py). Jobs run by
+    # BackgroundTasks that show no sign of life for JOB_STUCK_SECONDS are
+    # requeued or failed; finished jobs older than JOB_RETENTION_DAYS are
+    # moved to story_jobs_archive ("archive") or dropped ("delete").
+    JOB_STUCK_SECONDS: float = 600.0
+    JOB_RETENTION_DAYS: float = 30.0
+    JOB_RETENTION_MODE: str = "archive"
+    JOB_MAINTENANCE_BATCH_SIZE: int = 500
+    JOB_MAINTENANCE_MAX_BATCHES: int = 20
+    # Seconds between maintenance runs in the queue worker (0 = off).
+    # Without a worker, schedule manage.py maintain-jobs, or opt in to
+    # JOB_MAINTENANCE_IN_API to run it in the API processes
+    # (JOB_QUEUE=background only; an advisory lock keeps it to one at a time)
+    JOB_MAINTENANCE_INTERVAL: float = 300.0
+    JOB_MAINTENANCE_IN_API: bool = False
+
+    # Admission control for POST /stories/create (backend/core/admission.py):
+    # pending + processing jobs allowed overall (503 beyond) and per session
+    # (429 beyond); 0 = no limit. Retry-After comes from the completion rate
+    # over the last THROUGHPUT_WINDOW seconds, capped at RETRY_AFTER_MAX.
+    ADMISSION_MAX_ACTIVE_JOBS: int = 200
+    ADMISSION_MAX_SESSION_JOBS: int = 3
+    ADMISSION_THROUGHPUT_WINDOW: float = 60.0
+    ADMISSION_RETRY_AFTER_MAX: int = 120
+    # When overloaded, hand out a copy of an existing story written for the
+    # same theme instead of a 503
+    ADMISSION_SERVE_EXISTING: bool = True
+
+    # Opt-in: without an Idempotency-Key header, identical create requests
+    # from one session within the same window of this many seconds share a
+    # job (0 = only dedupe requests that send a key)
+    IDEMPOTENCY_WINDOW_SECONDS: float = 0.0
+
+    # Warm pool of pre-generated stories for popular themes
+    pool_themes_str: str = Field(default="", validation_alias="POOL_THEMES")
+    POOL_TARGET_DEPTH: int = 5
+    POOL_REFILL_INTERVAL: float = 30.0
+    POOL_REFILL_CONCURRENCY: int = 3
+
+    # /admin endpoints: X-Admin-Token must match; unset = admin endpoints disabled
+    ADMIN_TOKEN: Optional[str] = None
+    # Most recent jobs aggregated by GET /admin/jobs/timelines
+    ADMIN_TIMELINE_MAX_JOBS: int = 5000
+
+    # LRU cache of /stories/{id}/complete bodies
+    STORY_CACHE_MAX_ENTRIES: int = 1024
+    STORY_CACHE_MAX_BYTES: int = 32 * 1024 * 1024
+    # Also inline the root as `root_node` in /stories/{id}/complete (the
+    # shape older clients read) instead of only naming it by root_node_id
+    STORY_RESPONSE_LEGACY_SHAPE: bool = False
+
     def __init__(self, **values):
         super().__init__(**values)
         
@@ -26,7 +161,7 @@ class Settings(BaseSettings):
         vercel_postgres = os.getenv("POSTGRES_URL")
         if vercel_postgres:
             self.DATABASE_URL = vercel_postgres
-            print("✅ Using Vercel Postgres")
+            self.DATABASE_SOURCE = "Vercel Postgres"
             return
         
         # Priority 2: Check for custom PostgreSQL config
@@ -38,12 +173,12 @@ class Settings(BaseSettings):
         
         if all([db_user, db_password, db_host, db_port, db_name]):
             self.DATABASE_URL = f"postgresql://{db_user}:{db_password}@{db_host}:{db_port}/{db_name}"
-            print("✅ Using custom PostgreSQL")
+            self.DATABASE_SOURCE = "custom PostgreSQL"
             return
         
         # Fallback: In-memory SQLite (for local dev)
         self.DATABASE_URL = "sqlite:///:memory:"
-        print("⚠️ WARNING: Using in-memory SQLite")
+        self.DATABASE_SOURCE = "in-memory SQLite"
     
     @property
     def ALLOWED_ORIGINS(self) -> List[str]:
@@ -61,4 +196,16 @@ class Settings(BaseSettings):
             ]
         return []
 
-settings = Settings()
\ No newline at end of file
+    @property
+    def POOL_THEMES(self) -> List[str]:
+        """Parse comma-separated pool themes from env (normalized)"""
+        themes = [" ".join(theme.lower().split()) for theme in self.pool_themes_str.split(",")]
+        return [theme for theme in themes if theme]
+
+settings = Settings()
+configure_logging(settings.LOG_FORMAT, settings.LOG_LEVEL)
+
+if settings.DATABASE_SOURCE == "in-memory SQLite":
+    get_logger("CONFIG").warning("Using in-memory SQLite")
+else:
+    get_logger("CONFIG").info(f"Using {settings.DATABASE_SOURCE}")
@@ -0,0 +1,96 @@
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import Dict, Optional, Set, Tuple
+
+TERMINAL_STATUSES = ("completed", "failed")
+
+
+class JobEventBus:
+    """In-process pub/sub for story job state.
+
+    Keeps the latest state of every job this process is working on, and pushes
+    each change to subscribed SSE/WebSocket/long-poll handlers. publish() may
+    be called from threadpool workers; delivery always happens on the event
+    loop. Jobs handled by another process never show up here, so readers fall
+    back to the database when there is no snapshot.
+    """
+
+    def __init__(self, max_jobs: int = 10000, retention_seconds: float = 300.0):
+        self.max_jobs = max_jobs
+        self.retention_seconds = retention_seconds
+        self._lock = threading.Lock()
+        self._snapshots: "OrderedDict[str, dict]" = OrderedDict()
+        self._finished_at: Dict[str, float] = {}
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def snapshot(self, job_id: str) -> Optional[dict]:
+        with self._lock:
+            state = self._snapshots.get(job_id)
+            return dict(state) if state else None
+
+    def publish(self, job_id: str, event: str, data: dict):
+        """Merge `data` into the job's state and notify subscribers"""
+        with self._lock:
+            state = self._snapshots.setdefault(job_id, {"job_id": job_id})
+            state.update(data)
+            self._snapshots.move_to_end(job_id)
+            if state.get("status") in TERMINAL_STATUSES:
+                self._finished_at[job_id] = time.monotonic()
+            self._prune()
+            message = (event, dict(state))
+            queues = list(self._subscribers.get(job_id, ()))
+            loop = self._loop
+
+        if not queues or loop is None or loop.is_closed():
+            return
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        for queue in queues:
+            if running is loop:
+                queue.put_nowait(message)
+            else:
+                loop.call_soon_threadsafe(queue.put_nowait, message)
+
+    @asynccontextmanager
+    async def subscribe(self, job_id: str):
+        """Yield a queue that receives (event, state) tuples for one job"""
+        queue: asyncio.Queue = asyncio.Queue()
+        with self._lock:
+            self._loop = asyncio.get_running_loop()
+            self._subscribers.setdefault(job_id, set()).add(queue)
+        try:
+            yield queue
+        finally:
+            with self._lock:
+                queues = self._subscribers.get(job_id)
+                if queues is not None:
+                    queues.discard(queue)
+                    if not queues:
+                        del self._subscribers[job_id]
+
+    async def wait_for_event(self, job_id: str, timeout: float) -> Optional[Tuple[str, dict]]:
+        """Wait for the next event of a job; None on timeout"""
+        async with self.subscribe(job_id) as queue:
+            try:
+                return await asyncio.wait_for(queue.get(), timeout)
+            except asyncio.TimeoutError:
+                return None
+
+    def _prune(self):
+        now = time.monotonic()
+        for job_id, finished in list(self._finished_at.items()):
+            if now - finished > self.retention_seconds:
+                self._finished_at.pop(job_id)
+                self._snapshots.pop(job_id, None)
+        while len(self._snapshots) > self.max_jobs:
+            job_id, _ = self._snapshots.popitem(last=False)
+            self._finished_at.pop(job_id, None)
+
+
+job_events = JobEventBus()
@@ -0,0 +1,250 @@
+"""
+story_jobs lifecycle maintenance.
+
+Two sweeps, each in bounded batches so a run never holds long locks:
+
+- Stuck jobs. A job run by BackgroundTasks has no lease, only a heartbeat_at
+  its instance refreshes every JOB_HEARTBEAT_SECONDS, so when that instance
+  dies mid-generation the row stays "processing" (or "pending", if the task
+  never started) for good. Once such a job has shown no sign of life for
+  JOB_STUCK_SECONDS it is requeued for another attempt, or failed when its
+  attempts are used up or nothing would pick it up again. Leased jobs are
+  left alone: the queue reclaims them when their lease runs out. Jobs the
+  sweeping process is itself running are never touched. A "reserved" job
+  whose create request died before deciding how to serve it is failed, so
+  its idempotency key can be used again.
+- Retention. Finished jobs older than JOB_RETENTION_DAYS are moved to
+  story_jobs_archive, or deleted with JOB_RETENTION_MODE=delete.
+
+Run from the project root with
+    python -m backend.manage maintain-jobs
+(e.g. from cron), or let the queue worker (backend/worker.py) run it every
+JOB_MAINTENANCE_INTERVAL seconds. Without a worker (JOB_QUEUE=background),
+JOB_MAINTENANCE_IN_API has the API processes run it on that interval
+instead. Runs hold an advisory lock on Postgres, so however many processes
+are scheduled, one sweeps at a time.
+"""
+
+import asyncio
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Collection, List, Optional
+
+from sqlalchemy import and_, func, insert, or_, select
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from backend.core.config import settings
+from backend.core.job_queue import running_jobs, utcnow
+from backend.core.log import get_logger
+from backend.core.metrics import JOB_MAINTENANCE
+from backend.db.database import SessionLocal, advisory_lock
+from backend.models.job import StoryJob, StoryJobArchive
+
+log = get_logger("JobMaintenance")
+
+FINISHED_STATUSES = ("completed", "failed")
+
+# pg_advisory_xact_lock key held by whichever process is sweeping
+MAINTENANCE_LOCK_ID = 0x4A4F4253  # "JOBS"
+
+# Copied as-is into story_jobs_archive
+ARCHIVED_COLUMNS = (
+    "id", "job_id", "session_id", "theme", "status", "story_id", "error", "created_at",
+    "completed_at", "depth", "branching", "lazy", "attempts", "timeline",
+)
+
+
+def _stuck(cutoff: datetime, skip: Collection[str] = ()):
+    """Jobs without a lease that nothing has touched since `cutoff`, except `skip`"""
+    last_seen = func.coalesce(StoryJob.heartbeat_at, StoryJob.started_at, StoryJob.created_at)
+    stuck = or_(
+        and_(StoryJob.status == "processing", StoryJob.lease_owner.is_(None), last_seen < cutoff),
+        and_(StoryJob.status == "reserved", StoryJob.created_at < cutoff),
+    )
+    if settings.JOB_QUEUE == "background":
+        # Nothing polls for pending jobs in this mode; they only run if their
+        # BackgroundTask does
+        stuck = or_(stuck, and_(
+            StoryJob.status == "pending",
+            func.coalesce(StoryJob.available_at, StoryJob.created_at) < cutoff
+        ))
+    if skip:
+        stuck = and_(stuck, StoryJob.job_id.notin_(skip))
+    return stuck
+
+
+def recover_stuck_jobs(db: Session, requeue: bool, skip: Collection[str] = ()) -> dict:
+    """Requeue (if `requeue` and attempts remain) or fail stuck jobs.
+
+    Pass requeue=True only when something will run the requeued jobs: the
+    queue workers (JOB_QUEUE=database). Jobs in `skip` are left alone. Each
+    row is updated only if it is still stuck, so concurrent runs never both
+    act on the same job.
+    """
+    cutoff = utcnow() - timedelta(seconds=settings.JOB_STUCK_SECONDS)
+    skip = set(skip)
+    requeued: List[str] = []
+    failed = 0
+
+    for _ in range(settings.JOB_MAINTENANCE_MAX_BATCHES):
+        candidates = (
+            db.query(StoryJob.id, StoryJob.job_id, StoryJob.status, StoryJob.attempts)
+            .filter(_stuck(cutoff, skip))
+            .order_by(StoryJob.id)
+            .limit(settings.JOB_MAINTENANCE_BATCH_SIZE)
+            .with_for_update(skip_locked=True)
+            .all()
+        )
+        if not candidates:
+            break
+
+        for row_id, job_id, status, attempts in candidates:
+            # A reserved job was never admitted, so there is nothing to rerun
+            if requeue and status != "reserved" and (attempts or 0) < settings.JOB_MAX_ATTEMPTS:
+                values = {
+                    "status": "pending",
+                    "available_at": utcnow(),
+                    "error": f"Requeued after {settings.JOB_STUCK_SECONDS:.0f}s without progress",
+                }
+            else:
+                values = {
+                    "status": "failed",
+                    "completed_at": utcnow(),
+                    "error": f"Abandoned after {settings.JOB_STUCK_SECONDS:.0f}s without progress",
+                }
+            values.update(lease_owner=None, lease_expires_at=None)
+            updated = (
+                db.query(StoryJob)
+                .filter(StoryJob.id == row_id, _stuck(cutoff, skip))
+                .update(values, synchronize_session=False)
+            )
+            if not updated:
+                continue
+            if values["status"] == "pending":
+                requeued.append(job_id)
+            else:
+                failed += 1
+        db.commit()
+
+        if len(candidates) < settings.JOB_MAINTENANCE_BATCH_SIZE:
+            break
+
+    if requeued or failed:
+        JOB_MAINTENANCE.inc(len(requeued), action="requeued")
+        JOB_MAINTENANCE.inc(failed, action="failed")
+        log.warning("Recovered stuck jobs", requeued=len(requeued), failed=failed)
+    return {"requeued": requeued, "failed": failed}
+
+
+def expire_finished_jobs(db: Session) -> int:
+    """Archive or delete finished jobs past JOB_RETENTION_DAYS. Returns how many."""
+    cutoff = utcnow() - timedelta(days=settings.JOB_RETENTION_DAYS)
+    archive = settings.JOB_RETENTION_MODE == "archive"
+    expired = 0
+
+    for _ in range(settings.JOB_MAINTENANCE_MAX_BATCHES):
+        job_ids = [
+            row_id for (row_id,) in db.query(StoryJob.id)
+            .filter(StoryJob.completed_at < cutoff, StoryJob.status.in_(FINISHED_STATUSES))
+            .order_by(StoryJob.completed_at)
+            .limit(settings.JOB_MAINTENANCE_BATCH_SIZE)
+            .with_for_update(skip_locked=True)
+        ]
+        if not job_ids:
+            break
+
+        if archive:
+            db.execute(
+                insert(StoryJobArchive).from_select(
+                    ARCHIVED_COLUMNS,
+                    select(*(getattr(StoryJob, column) for column in ARCHIVED_COLUMNS)).where(StoryJob.id.in_(job_ids))
+                )
+            )
+        db.query(StoryJob).filter(StoryJob.id.in_(job_ids)).delete(synchronize_session=False)
+        db.commit()
+        expired += len(job_ids)
+
+        if len(job_ids) < settings.JOB_MAINTENANCE_BATCH_SIZE:
+            break
+
+    if expired:
+        action = "archived" if archive else "deleted"
+        JOB_MAINTENANCE.inc(expired, action=action)
+        log.info("Expired finished jobs", jobs=expired, action=action)
+    return expired
+
+
+class JobMaintenance:
+    """Runs both sweeps and keeps the outcome of recent runs"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.runs = 0
+        self.failures = 0
+        self.requeued = 0
+        self.failed = 0
+        self.expired = 0
+        self.last_run_at: Optional[float] = None
+        self.last_run_ms: Optional[float] = None
+
+    def run_once(self, requeue: bool) -> dict:
+        """Run both sweeps, unless another process is running them (then "skipped" is set)"""
+        with advisory_lock(MAINTENANCE_LOCK_ID) as acquired:
+            if not acquired:
+                log.info("Another process is running maintenance")
+                return {"requeued": [], "failed": 0, "expired": 0, "skipped": True}
+            return self._sweep(requeue)
+
+    def _sweep(self, requeue: bool) -> dict:
+        started = time.perf_counter()
+        db = SessionLocal()
+        try:
+            # A copy: jobs finish (and leave the set) on other threads
+            recovered = recover_stuck_jobs(db, requeue, skip=set(running_jobs))
+            expired = expire_finished_jobs(db)
+        except Exception:
+            db.rollback()
+            with self._lock:
+                self.failures += 1
+            raise
+        finally:
+            db.close()
+
+        with self._lock:
+            self.runs += 1
+            self.requeued += len(recovered["requeued"])
+            self.failed += recovered["failed"]
+            self.expired += expired
+            self.last_run_at = time.time()
+            self.last_run_ms = round((time.perf_counter() - started) * 1000, 1)
+        return {**recovered, "expired": expired}
+
+    async def run_periodic(self):
+        """Sweep every JOB_MAINTENANCE_INTERVAL seconds until cancelled (queue worker, or API with JOB_MAINTENANCE_IN_API)"""
+        log.info("Periodic maintenance started", interval=settings.JOB_MAINTENANCE_INTERVAL)
+        # Requeued jobs only run again if queue workers are polling for them
+        requeue = settings.JOB_QUEUE == "database"
+        while True:
+            try:
+                await run_in_threadpool(self.run_once, requeue)
+            except Exception as e:
+                log.error("Maintenance run failed", error=str(e))
+            await asyncio.sleep(settings.JOB_MAINTENANCE_INTERVAL)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "runs": self.runs,
+                "failures": self.failures,
+                "requeued": self.requeued,
+                "failed": self.failed,
+                "expired": self.expired,
+                "retention_mode": settings.JOB_RETENTION_MODE,
+                "last_run_at": self.last_run_at,
+                "last_run_ms": self.last_run_ms,
+            }
+
+
+job_maintenance = JobMaintenance()
@@ -0,0 +1,171 @@
+"""
+Database-backed job queue on the story_jobs table.
+
+Workers claim a job by taking a lease (lease_owner + lease_expires_at) and
+keep it alive with heartbeats. A job whose lease ran out (worker crashed or
+was killed) becomes claimable again; failed attempts are retried with
+jittered exponential backoff via available_at.
+"""
+
+import random
+from datetime import datetime, timedelta, timezone
+from typing import Optional, Set
+
+from sqlalchemy import and_, func, or_
+from sqlalchemy.orm import Session
+
+from backend.core.config import settings
+from backend.db.database import SessionLocal
+from backend.models.job import StoryJob
+
+# How often claim_next_job() retries when another worker takes the same row
+CLAIM_ATTEMPTS = 3
+
+# Job ids this process is executing right now (see backend/core/jobs.py)
+running_jobs: Set[str] = set()
+
+
+def utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def retry_delay(attempts: int) -> float:
+    """Seconds to wait before retry number `attempts` (full jitter)"""
+    ceiling = min(settings.JOB_RETRY_MAX_SECONDS, settings.JOB_RETRY_BASE_SECONDS * 2 ** (attempts - 1))
+    return random.uniform(ceiling / 2, ceiling)
+
+
+def _claimable(now: datetime):
+    return or_(
+        and_(
+            StoryJob.status == "pending",
+            or_(StoryJob.available_at.is_(None), StoryJob.available_at <= now)
+        ),
+        and_(StoryJob.status == "processing", StoryJob.lease_expires_at < now),
+    )
+
+
+def claim_next_job(worker_id: str) -> Optional[str]:
+    """Lease the oldest runnable job for `worker_id` and return its job_id.
+
+    The candidate row is locked with FOR UPDATE SKIP LOCKED on Postgres so
+    workers don't queue up behind each other. The UPDATE repeats the
+    claimable condition, so on SQLite (no row locks) two workers still can't
+    both win the same job.
+    """
+    db = SessionLocal()
+    try:
+        for _ in range(CLAIM_ATTEMPTS):
+            now = utcnow()
+            candidate = (
+                db.query(StoryJob.id)
+                .filter(_claimable(now))
+                .order_by(StoryJob.id)
+                .limit(1)
+                .with_for_update(skip_locked=True)
+                .scalar()
+            )
+            if candidate is None:
+                db.rollback()
+                return None
+
+            claimed = (
+                db.query(StoryJob)
+                .filter(StoryJob.id == candidate, _claimable(now))
+                .update(
+                    {
+                        "status": "processing",
+                        "lease_owner": worker_id,
+                        "lease_expires_at": now + timedelta(seconds=settings.JOB_LEASE_SECONDS),
+                        "heartbeat_at": now,
+                        "started_at": func.coalesce(StoryJob.started_at, now),
+                        "attempts": StoryJob.attempts + 1,
+                    },
+                    synchronize_session=False
+                )
+            )
+            if claimed:
+                job_id = db.query(StoryJob.job_id).filter(StoryJob.id == candidate).scalar()
+                db.commit()
+                return job_id
+            db.rollback()
+        return None
+    finally:
+        db.close()
+
+
+def renew_lease(job_id: str, worker_id: str) -> bool:
+    """Heartbeat: extend the lease. False means the job is no longer ours."""
+    db = SessionLocal()
+    try:
+        now = utcnow()
+        renewed = (
+            db.query(StoryJob)
+            .filter(
+                StoryJob.job_id == job_id,
+                StoryJob.status == "processing",
+                StoryJob.lease_owner == worker_id
+            )
+            .update(
+                {
+                    "heartbeat_at": now,
+                    "lease_expires_at": now + timedelta(seconds=settings.JOB_LEASE_SECONDS),
+                },
+                synchronize_session=False
+            )
+        )
+        db.commit()
+        return bool(renewed)
+    finally:
+        db.close()
+
+
+def touch_heartbeat(job_id: str) -> bool:
+    """Heartbeat for a job run without a lease (BackgroundTasks mode)"""
+    db = SessionLocal()
+    try:
+        touched = (
+            db.query(StoryJob)
+            .filter(
+                StoryJob.job_id == job_id,
+                StoryJob.status == "processing",
+                StoryJob.lease_owner.is_(None)
+            )
+            .update({"heartbeat_at": utcnow()}, synchronize_session=False)
+        )
+        db.commit()
+        return bool(touched)
+    finally:
+        db.close()
+
+
+def release_lease(job: StoryJob):
+    job.lease_owner = None
+    job.lease_expires_at = None
+
+
+def schedule_retry(job: StoryJob, error: str):
+    """Put a failed job back in the queue after a backoff delay"""
+    release_lease(job)
+    job.status = "pending"
+    job.error = error
+    job.available_at = utcnow() + timedelta(seconds=retry_delay(job.attempts))
+
+
+def queue_stats(db: Session) -> dict:
+    """Counts of queued, delayed, running and stale jobs"""
+    now = utcnow()
+    ready = db.query(func.count(StoryJob.id)).filter(
+        StoryJob.status == "pending",
+        or_(StoryJob.available_at.is_(None), StoryJob.available_at <= now)
+    ).scalar()
+    delayed = db.query(func.count(StoryJob.id)).filter(
+        StoryJob.status == "pending", StoryJob.available_at > now
+    ).scalar()
+    running = db.query(func.count(StoryJob.id)).filter(
+        StoryJob.status == "processing", StoryJob.lease_expires_at >= now
+    ).scalar()
+    stale = db.query(func.count(StoryJob.id)).filter(
+        StoryJob.status == "processing", StoryJob.lease_expires_at < now
+    ).scalar()
+    return {"ready": ready, "delayed": delayed, "running": running, "stale": stale}
@@ -0,0 +1,257 @@
+"""
+Story job execution, shared by the API's background tasks and the
+standalone queue worker (backend/worker.py).
+"""
+
+import asyncio
+import time
+from datetime import timezone
+from typing import Optional
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from backend.core.config import settings
+from backend.core.job_events import job_events
+from backend.core.job_queue import release_lease, running_jobs, schedule_retry, touch_heartbeat, utcnow
+from backend.core.log import get_logger
+from backend.core.metrics import JOB_DURATION_SECONDS, JOB_OUTCOMES, JOB_QUEUE_WAIT_SECONDS
+from backend.core.single_flight import story_flights
+from backend.core.story_generator import ProgressCallback, StoryGenerator
+from backend.core.story_pool import normalize_theme
+from backend.core.timeline import JobTimeline, current_timeline, mark
+from backend.db.database import SessionLocal
+from backend.models.job import StoryJob
+from backend.models.story import Story
+from backend.schemas.job import StoryJobResponse
+
+log = get_logger("JOB")
+
+
+async def run_story_job(job_id: str, lease_owner: Optional[str] = None):
+    """Generate the story for one job and record the outcome.
+
+    Without `lease_owner` the job is started here (BackgroundTasks mode).
+    With it, a queue worker has already claimed the job, and a failed attempt
+    goes back into the queue until JOB_MAX_ATTEMPTS is reached.
+    """
+    log.info("Started", job_id=job_id)
+
+    # Keep the job's attributes loaded after commits: reading an expired job
+    # while awaiting Groq would check out a connection and hold it for the
+    # whole generation
+    db = SessionLocal(expire_on_commit=False)
+    # Spans marked anywhere below land on this attempt's timeline
+    timeline = JobTimeline()
+    timeline_token = current_timeline.set(timeline)
+    running_jobs.add(job_id)
+    heartbeat = None
+
+    try:
+        job = await run_in_threadpool(_start_job, db, job_id, lease_owner is not None, timeline)
+
+        if not job:
+            log.warning("Job not found", job_id=job_id)
+            return
+        if lease_owner is None:
+            # Queue workers renew their lease; here heartbeat_at is the only
+            # sign of life stuck-job recovery has to go on
+            heartbeat = asyncio.create_task(_keep_alive(job_id))
+
+        started = time.perf_counter()
+        mode = _generation_mode(job)
+        try:
+            if job.attempts and job.attempts > settings.JOB_MAX_ATTEMPTS:
+                raise Exception(f"Gave up after {settings.JOB_MAX_ATTEMPTS} attempts")
+
+            def record_progress(story_id: Optional[int], nodes_ready: int):
+                job.story_id = story_id
+                job.nodes_ready = nodes_ready
+                job.root_ready = story_id is not None
+                progress = {"story_id": story_id, "nodes_ready": nodes_ready, "root_ready": job.root_ready}
+                event.listen(
+                    db, "after_commit",
+                    lambda session: job_events.publish(job_id, "progress", progress),
+                    once=True
+                )
+
+            # No timeout wrapper - the shared client enforces GROQ_TIMEOUT
+            log.info("Generating", job_id=job_id, mode=mode)
+            if job.lazy:
+                story = await StoryGenerator.generate_story_lazy(
+                    db, job.session_id, job.theme, job.depth, job.branching, on_progress=record_progress
+                )
+            elif settings.SINGLE_FLIGHT and (job.depth or job.branching or not settings.STREAM_GENERATION):
+                story = await _generate_coalesced(db, job, record_progress)
+            elif job.depth or job.branching:
+                story = await StoryGenerator.generate_story_fanout(
+                    db, job.session_id, job.theme, job.depth, job.branching, on_progress=record_progress
+                )
+            elif settings.STREAM_GENERATION:
+                story = await StoryGenerator.generate_story_streaming(
+                    db, job.session_id, job.theme, on_progress=record_progress
+                )
+            else:
+                story = await StoryGenerator.generate_story_async(
+                    db, job.session_id, job.theme, on_progress=record_progress
+                )
+
+            story_id = await run_in_threadpool(_complete_job, db, job, story, timeline, lease_owner)
+            status = "completed" if story_id is not None else "abandoned"
+            JOB_OUTCOMES.inc(status=status)
+            JOB_DURATION_SECONDS.observe(time.perf_counter() - started, mode=mode, status=status)
+            if story_id is not None:
+                log.info("Completed", job_id=job_id, story_id=story_id)
+
+        except Exception as e:
+            log.exception("Failed", job_id=job_id, error=str(e))
+            status = await run_in_threadpool(_fail_job, db, job, str(e), lease_owner, timeline)
+            JOB_OUTCOMES.inc(status=status)
+            JOB_DURATION_SECONDS.observe(time.perf_counter() - started, mode=mode, status=status)
+    finally:
+        if heartbeat is not None:
+            heartbeat.cancel()
+        running_jobs.discard(job_id)
+        current_timeline.reset(timeline_token)
+        db.close()
+
+
+async def _keep_alive(job_id: str):
+    """Refresh heartbeat_at every JOB_HEARTBEAT_SECONDS until cancelled"""
+    while True:
+        await asyncio.sleep(settings.JOB_HEARTBEAT_SECONDS)
+        try:
+            await run_in_threadpool(touch_heartbeat, job_id)
+        except Exception as e:
+            log.warning("Heartbeat failed", job_id=job_id, error=str(e))
+
+
+async def _generate_coalesced(db: Session, job: StoryJob, on_progress: ProgressCallback) -> Story:
+    """Share one generated tree among jobs asking for the same story at once"""
+    if job.depth or job.branching:
+        key = (normalize_theme(job.theme), job.depth, job.branching)
+        generate = lambda: StoryGenerator.generate_tree_fanout(job.theme, job.depth, job.branching)
+    else:
+        key = (normalize_theme(job.theme), None, None)
+        generate = lambda: StoryGenerator.generate_tree_async(job.theme)
+
+    # A job joining someone else's generation still gets its LLM span
+    mark("llm_request")
+    story_tree = await story_flights.run(key, generate)
+    mark("llm_done")
+    # Every job saves its own copy of the tree under its own session
+    return await run_in_threadpool(StoryGenerator._save_story, db, job.session_id, story_tree, on_progress)
+
+
+def _generation_mode(job: StoryJob) -> str:
+    if job.lazy:
+        return "lazy"
+    if settings.SINGLE_FLIGHT and (job.depth or job.branching or not settings.STREAM_GENERATION):
+        return "single_flight"
+    if job.depth or job.branching:
+        return "fanout"
+    return "streaming" if settings.STREAM_GENERATION else "async"
+
+
+def _queue_wait(job: StoryJob) -> Optional[float]:
+    """Seconds since the job became runnable (created, or its retry came due)"""
+    since = job.available_at or job.created_at
+    if since is None:
+        return None
+    if since.tzinfo is None:
+        since = since.replace(tzinfo=timezone.utc)
+    return max(0.0, (utcnow() - since).total_seconds())
+
+
+def _publish_state(db: Session, job: StoryJob):
+    """Commit the job and push its new state to subscribers"""
+    state = StoryJobResponse.model_validate(job).model_dump(mode="json")
+    db.commit()
+    job_events.publish(state["job_id"], "status", state)
+    return state
+
+
+def _start_job(db: Session, job_id: str, claimed: bool, timeline: JobTimeline) -> Optional[StoryJob]:
+    job = db.query(StoryJob).filter(StoryJob.job_id == job_id).first()
+    if job:
+        wait = _queue_wait(job)
+        if wait is not None:
+            JOB_QUEUE_WAIT_SECONDS.observe(wait)
+            timeline.mark("queued", timeline.elapsed_ms() - wait * 1000)
+        timeline.mark("started")
+        if not claimed:
+            # No lease here; heartbeat_at is what stuck-job recovery looks at
+            now = utcnow()
+            job.status = "processing"
+            job.attempts = (job.attempts or 0) + 1
+            job.started_at = job.started_at or now
+            job.heartbeat_at = now
+        timeline.attempt = job.attempts
+        _publish_state(db, job)
+    return job
+
+
+def _hold_lease(db: Session, job: StoryJob, lease_owner: Optional[str]) -> bool:
+    """Lock the job row for this transaction if `lease_owner` still holds its lease.
+
+    Without a lease there is nothing to check. The UPDATE's row lock (the
+    write lock on SQLite) keeps a worker reclaiming an expired lease out
+    until the outcome is committed. False means the lease ran out and the
+    job may already be running elsewhere: nothing of this attempt is written.
+    """
+    if lease_owner is None:
+        return True
+    held = (
+        db.query(StoryJob)
+        .filter(StoryJob.id == job.id, StoryJob.lease_owner == lease_owner)
+        .update({"lease_owner": lease_owner}, synchronize_session=False)
+    )
+    if not held:
+        db.rollback()
+        log.warning("Lost lease, not recording the outcome", job_id=job.job_id, worker_id=lease_owner)
+    return bool(held)
+
+
+def _complete_job(
+        db: Session, job: StoryJob, story: Story, timeline: JobTimeline, lease_owner: Optional[str] = None
+) -> Optional[int]:
+    """Record the story; None if the job's lease was lost meanwhile"""
+    if not _hold_lease(db, job, lease_owner):
+        return None
+    job.timeline = timeline.to_dict("completed")
+    job.story_id = story.id
+    job.status = "completed"
+    job.completed_at = utcnow()
+    job.error = None
+    release_lease(job)
+    return _publish_state(db, job)["story_id"]
+
+
+def _fail_job(
+        db: Session, job: StoryJob, error: str, lease_owner: Optional[str], timeline: JobTimeline
+) -> str:
+    """Record the failure and return the outcome: retried, failed, or abandoned if the lease was lost.
+
+    Only leased (queue) jobs are retried.
+    """
+    if not _hold_lease(db, job, lease_owner):
+        return "abandoned"
+    retry = lease_owner is not None
+    job.story_id = None
+    job.nodes_ready = 0
+    job.root_ready = False
+
+    if retry and job.attempts < settings.JOB_MAX_ATTEMPTS:
+        schedule_retry(job, error)
+        log.info("Retrying", job_id=job.job_id, at=job.available_at, attempt=job.attempts)
+        outcome = "retried"
+    else:
+        release_lease(job)
+        job.status = "failed"
+        job.completed_at = utcnow()
+        job.error = error
+        outcome = "failed"
+    job.timeline = timeline.to_dict(outcome)
+    _publish_state(db, job)
+    return outcome
@@ -0,0 +1,185 @@
+"""
+Single-pass JSON extraction and repair for LLM completions.
+
+`extract_json()` finds the first JSON object in a completion (ignoring prose
+and markdown fences around it) in one scan that understands string literals
+and escapes, so braces inside story text don't end the object early.
+
+Along the way it repairs the mistakes models actually make:
+
+- raw newlines/tabs inside strings are escaped
+- trailing commas before } or ] are dropped
+- single-quoted strings are rewritten with double quotes
+- output cut off (e.g. at max_tokens) is trimmed back to the last complete
+  value and the open objects/arrays are closed, keeping every finished subtree
+"""
+
+import re
+from dataclasses import dataclass, field
+from typing import List
+
+_ESCAPED_CONTROL = {"\n": "\\n", "\r": "\\r", "\t": "\\t"}
+_CLOSERS = {"{": "}", "[": "]"}
+
+_DOUBLE_QUOTED = re.compile(r'["\\\n\r\t]')
+_SINGLE_QUOTED = re.compile(r'[\'"\\\n\r\t]')
+_SIGNIFICANT = re.compile(r"\S")
+_PRIMITIVE_END = re.compile(r"[,}\]\s]")
+
+# What the innermost container expects next
+_KEY, _COLON, _VALUE, _COMMA = range(4)
+
+
+@dataclass
+class ExtractedJson:
+    text: str
+    repairs: List[str] = field(default_factory=list)
+
+    @property
+    def repaired(self) -> bool:
+        return bool(self.repairs)
+
+
+def extract_json(text: str) -> ExtractedJson:
+    """Return the first JSON object in `text`, repaired if needed.
+
+    If there is no '{' at all the stripped text is returned unchanged and
+    json.loads will report the problem.
+    """
+    start = text.find("{")
+    if start == -1:
+        return ExtractedJson(text.strip())
+
+    out: List[str] = []       # repaired output, flushed in slices of `text`
+    copied = start            # text[copied:i] is still pending in `out`
+    out_len = 0               # length of everything flushed to `out`
+    repairs: List[str] = []
+
+    stack: List[str] = []     # open containers
+    states: List[int] = []    # expectation per open container
+    quote = None              # quote char of the string we're in
+    safe_end, safe_depth = 0, 0  # output length/depth after the last complete value
+
+    def emit(i: int, replacement: str):
+        """Replace text[i] with `replacement` in the output"""
+        nonlocal copied, out_len
+        out.append(text[copied:i])
+        out.append(replacement)
+        out_len += (i - copied) + len(replacement)
+        copied = i + 1
+
+    def position(i: int) -> int:
+        """Output length if text[:i] were flushed"""
+        return out_len + (i - copied)
+
+    def value_done(i: int):
+        nonlocal safe_end, safe_depth
+        if states:
+            states[-1] = _COMMA
+        safe_end, safe_depth = position(i), len(stack)
+
+    def drop_trailing_comma():
+        """Remove a ',' already emitted right before a closer"""
+        nonlocal out_len
+        flushed = "".join(out)
+        cut = flushed.rstrip()
+        if cut.endswith(","):
+            out[:] = [cut[:-1]]
+            out_len = len(cut) - 1
+            if "removed trailing commas" not in repairs:
+                repairs.append("removed trailing commas")
+
+    i = start
+    end = len(text)
+    while i < end:
+        if quote is not None:
+            # Jump straight to the next character that matters in this string
+            match = (_DOUBLE_QUOTED if quote == '"' else _SINGLE_QUOTED).search(text, i)
+            if match is None:
+                break
+            i = match.start()
+            char = text[i]
+            if char == "\\":
+                if quote == "'" and text.startswith("'", i + 1):
+                    emit(i, "")  # \' is not a JSON escape; keep the quote
+                i += 2
+                continue
+            if char == quote:
+                quote = None
+                if char == "'":
+                    emit(i, '"')
+                if states and states[-1] == _KEY:
+                    states[-1] = _COLON
+                else:
+                    value_done(i + 1)
+            elif char == '"':
+                emit(i, '\\"')
+            else:
+                emit(i, _ESCAPED_CONTROL[char])
+                if "escaped control characters" not in repairs:
+                    repairs.append("escaped control characters")
+            i += 1
+            continue
+
+        match = _SIGNIFICANT.search(text, i)
+        if match is None:
+            break
+        i = match.start()
+        char = text[i]
+
+        if char == '"' or char == "'":
+            quote = char
+            if char == "'":
+                emit(i, '"')
+                if "single-quoted strings" not in repairs:
+                    repairs.append("single-quoted strings")
+        elif char in "{[":
+            if states:
+                states[-1] = _COMMA
+            stack.append(char)
+            states.append(_KEY if char == "{" else _VALUE)
+            safe_end, safe_depth = position(i + 1), len(stack)
+        elif char in "}]":
+            if not stack:
+                break
+            if states[-1] in (_KEY, _VALUE) and _last_significant(text, start, i) == ",":
+                out.append(text[copied:i])
+                out_len += i - copied
+                copied = i
+                drop_trailing_comma()
+            stack.pop()
+            states.pop()
+            value_done(i + 1)
+            if not stack:
+                out.append(text[copied:i + 1])
+                return ExtractedJson("".join(out), repairs)
+        elif char == ":":
+            if states:
+                states[-1] = _VALUE
+        elif char == ",":
+            if states:
+                states[-1] = _KEY if stack[-1] == "{" else _VALUE
+        else:
+            # Bare number/true/false/null: complete once a terminator follows
+            match = _PRIMITIVE_END.search(text, i)
+            if match is None:
+                break
+            value_done(match.start())
+            i = match.start()
+            continue
+        i += 1
+
+    # Ran out of text with containers still open: keep the complete part
+    out.append(text[copied:end])
+    flushed = "".join(out)[:safe_end]
+    closers = "".join(_CLOSERS[opener] for opener in reversed(stack[:safe_depth]))
+    repairs.append(f"truncated output, closed {len(closers)} open containers")
+    return ExtractedJson(flushed + closers, repairs)
+
+
+def _last_significant(text: str, start: int, i: int) -> str:
+    """Last non-whitespace character of text[start:i]"""
+    j = i - 1
+    while j >= start and text[j].isspace():
+        j -= 1
+    return text[j] if j >= start else ""
@@ -0,0 +1,273 @@
+"""
+On-demand growth of lazy stories.
+
+A lazy story starts with its opening and the nodes one choice away; every
+other option has node_id None until it is needed. Opening a node with
+`lazy_stories.expand()` generates its missing children (joining any
+generation already running for them), then speculatively generates the
+children of those children in the background, so the player's next choice
+is usually ready before they make it.
+
+Concurrent expansions of the same option in this process share one task.
+Across processes the parent row is locked (FOR UPDATE on Postgres) before
+a child is attached, and a child that lost the race is simply not stored.
+Attaches to one story also take its row first, one at a time, so the last
+one always sees every other child and marks the story complete. No story
+grows past LAZY_MAX_NODES nodes, checked before a child is generated and
+again, under that lock, before it is stored.
+"""
+
+import asyncio
+import time
+from collections import deque
+from typing import Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import func, update
+from starlette.concurrency import run_in_threadpool
+
+from backend.core.config import settings
+from backend.core.log import get_logger
+from backend.core.story_codec import node_to_dict
+from backend.core.story_generator import StoryGenerator
+from backend.db.database import SessionLocal
+from backend.models.story import Story, StoryNode
+
+log = get_logger("LazyStory")
+
+# Expansion waits kept for stats()
+WAIT_WINDOW = 1000
+
+
+class NodeLimitReached(Exception):
+    """The story already has LAZY_MAX_NODES nodes"""
+
+
+class LazyStoryExpander:
+    def __init__(self):
+        self._inflight: Dict[Tuple[int, int], asyncio.Task] = {}
+        self._prefetching: Set[asyncio.Task] = set()
+
+        self.generated = 0
+        self.prefetched = 0
+        self.failures = 0
+        self.ready_hits = 0
+        self.waits = 0
+        self.wait_ms = deque(maxlen=WAIT_WINDOW)
+
+    async def expand(self, story_id: int, node_id: int, prefetch: bool = True) -> Optional[dict]:
+        """Make sure every option of the node has a child; return the node.
+
+        Returns None if the node doesn't belong to the story.
+        """
+        started = time.perf_counter()
+        node, story = await run_in_threadpool(load_story_node, story_id, node_id)
+        if node is None:
+            return None
+        if not story["is_lazy"]:
+            return node
+
+        pending = [index for index, option in enumerate(node["options"]) if option.get("node_id") is None]
+        if pending:
+            results = await asyncio.gather(
+                *(self._child(story_id, node_id, index) for index in pending), return_exceptions=True
+            )
+            errors = [result for result in results if isinstance(result, BaseException)]
+            if errors:
+                raise errors[0]
+            node, _ = await run_in_threadpool(load_story_node, story_id, node_id)
+            self.waits += 1
+            self.wait_ms.append((time.perf_counter() - started) * 1000)
+        else:
+            self.ready_hits += 1
+
+        if prefetch and settings.LAZY_PREFETCH_CHILDREN:
+            children = [option["node_id"] for option in node["options"] if option.get("node_id") is not None]
+            for child_id in children[:settings.LAZY_PREFETCH_CHILDREN]:
+                task = asyncio.create_task(self._prefetch(story_id, child_id))
+                self._prefetching.add(task)
+                task.add_done_callback(self._prefetching.discard)
+        return node
+
+    def stats(self) -> dict:
+        waits = sorted(self.wait_ms)
+        with SessionLocal() as db:
+            stories, tokens = db.query(
+                func.count(Story.id), func.avg(Story.tokens_used)
+            ).filter(Story.is_lazy.is_(True)).one()
+        return {
+            "nodes_generated": self.generated,
+            "nodes_prefetched": self.prefetched,
+            "failures": self.failures,
+            "in_flight": len(self._inflight),
+            "choices_ready": self.ready_hits,
+            "choices_waited": self.waits,
+            "wait_ms_p50": round(waits[len(waits) // 2], 1) if waits else None,
+            "wait_ms_p95": round(waits[min(len(waits) - 1, int(len(waits) * 0.95))], 1) if waits else None,
+            "lazy_stories": stories,
+            "avg_tokens_per_story": round(float(tokens), 1) if tokens is not None else None,
+        }
+
+    async def _prefetch(self, story_id: int, node_id: int):
+        try:
+            node, story = await run_in_threadpool(load_story_node, story_id, node_id)
+            if node is None or not story["is_lazy"]:
+                return
+            pending = [index for index, option in enumerate(node["options"]) if option.get("node_id") is None]
+            results = await asyncio.gather(
+                *(self._child(story_id, node_id, index) for index in pending), return_exceptions=True
+            )
+            self.prefetched += sum(1 for result in results if not isinstance(result, BaseException))
+        except Exception as e:
+            log.warning("Prefetch failed", node_id=node_id, error=str(e))
+
+    def _child(self, story_id: int, node_id: int, index: int) -> asyncio.Task:
+        """The (shared) task generating option `index` of a node"""
+        key = (node_id, index)
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.create_task(self._generate_child(story_id, node_id, index))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return task
+
+    async def _generate_child(self, story_id: int, node_id: int, index: int):
+        context = await run_in_threadpool(_child_context, story_id, node_id, index)
+        if context is None:
+            return  # generated meanwhile
+
+        usage = {"tokens": 0}
+        level = context["level"]
+        try:
+            client = StoryGenerator._get_async_groq_client()
+            child = await StoryGenerator._generate_fanout_part(
+                client,
+                StoryGenerator._branch_prompt(
+                    context["theme"], context["title"], context["path"], 1,
+                    context["branching"], level >= context["depth"]
+                ),
+                usage
+            )
+            StoryGenerator._fanout_frontier(
+                StoryGenerator._single_node(child), context["path"], level, context["depth"], context["branching"]
+            )
+        except Exception as e:
+            self.failures += 1
+            log.error("Generating option failed", node_id=node_id, option=index, error=str(e))
+            raise
+
+        if await run_in_threadpool(_attach_child, story_id, node_id, index, child, usage["tokens"]):
+            self.generated += 1
+
+
+def load_story_node(story_id: int, node_id: int) -> Tuple[Optional[dict], Optional[dict]]:
+    db = SessionLocal()
+    try:
+        row = (
+            db.query(StoryNode, Story.is_lazy)
+            .join(Story, Story.id == StoryNode.story_id)
+            .filter(StoryNode.id == node_id, StoryNode.story_id == story_id)
+            .first()
+        )
+        if row is None:
+            return None, None
+        node, is_lazy = row
+        return {
+            "id": node.id,
+            "content": node.content,
+            "is_ending": node.is_ending,
+            "is_winning_ending": node.is_winning_ending,
+            "options": list(node.options or []),
+        }, {"is_lazy": bool(is_lazy)}
+    finally:
+        db.close()
+
+
+def _child_context(story_id: int, node_id: int, index: int) -> Optional[dict]:
+    """Prompt inputs for option `index` of a node, or None if it already has a child"""
+    db = SessionLocal()
+    try:
+        story = db.query(Story).filter(Story.id == story_id).first()
+        nodes = {node.id: node for node in db.query(StoryNode).filter(StoryNode.story_id == story_id)}
+        node = nodes.get(node_id)
+        if story is None or node is None or index >= len(node.options or []):
+            raise Exception(f"Node {node_id} has no option {index}")
+        option = node.options[index]
+        if option.get("node_id") is not None:
+            return None
+        if len(nodes) >= settings.LAZY_MAX_NODES:
+            raise NodeLimitReached(f"Story {story_id} has reached {settings.LAZY_MAX_NODES} nodes")
+
+        parents = {}
+        for parent in nodes.values():
+            for parent_option in parent.options or []:
+                if parent_option.get("node_id") is not None:
+                    parents[parent_option["node_id"]] = (parent, parent_option["text"])
+
+        path: List[str] = [node.content, f"Player chose: {option['text']}"]
+        current = node
+        while current.id in parents:
+            current, text = parents[current.id]
+            path[:0] = [current.content, f"Player chose: {text}"]
+
+        return {
+            "title": story.title,
+            "theme": story.theme,
+            "depth": story.depth,
+            "branching": story.branching,
+            "path": path,
+            "level": len(path) // 2 + 1,
+        }
+    finally:
+        db.close()
+
+
+def _attach_child(story_id: int, node_id: int, index: int, child: dict, tokens: int) -> bool:
+    """Store the child and point the option at it, unless someone beat us to it"""
+    db = SessionLocal()
+    try:
+        # Added in SQL so concurrent attaches don't overwrite each other's
+        # counts. The UPDATE also locks the story row until commit, which
+        # queues attaches to this story behind each other: the pending check
+        # below runs only after every earlier attach has committed.
+        db.execute(
+            update(Story)
+            .where(Story.id == story_id)
+            .values(tokens_used=func.coalesce(Story.tokens_used, 0) + tokens)
+        )
+        parent = db.query(StoryNode).filter(StoryNode.id == node_id).with_for_update().first()
+        options = list(parent.options or [])
+        if options[index].get("node_id") is not None:
+            db.commit()  # keep the token count; the tokens were spent
+            return False
+        nodes = db.query(func.count(StoryNode.id)).filter(StoryNode.story_id == story_id).scalar()
+        if nodes >= settings.LAZY_MAX_NODES:
+            db.commit()
+            raise NodeLimitReached(f"Story {story_id} has reached {settings.LAZY_MAX_NODES} nodes")
+
+        row = StoryGenerator.lazy_node_row(story_id, child)
+        db.add(row)
+        db.flush()
+        options[index] = {**options[index], "node_id": row.id}
+        parent.options = options
+
+        db.flush()
+        if not _has_pending(db, story_id):
+            story = db.query(Story).filter(Story.id == story_id).first()
+            story.is_complete = True
+            # The tree is final now, so its shape can be recorded
+            nodes = db.query(StoryNode).filter(StoryNode.story_id == story_id)
+            StoryGenerator.record_tree_stats(story, [node_to_dict(node) for node in nodes])
+        db.commit()
+        return True
+    finally:
+        db.close()
+
+
+def _has_pending(db, story_id: int) -> bool:
+    for (options,) in db.query(StoryNode.options).filter(StoryNode.story_id == story_id):
+        if any(option.get("node_id") is None for option in options or []):
+            return True
+    return False
+
+
+lazy_stories = LazyStoryExpander()
@@ -0,0 +1,89 @@
+"""
+Structured logging.
+
+    log = get_logger("JOB")
+    log.info("Started", job_id=job_id)
+
+prints `[JOB] Started job_id=...` with LOG_FORMAT=text (the default), or one
+JSON object per line with LOG_FORMAT=json, ready for a log pipeline. Fields
+are kept as data either way, so messages stay short and greppable.
+"""
+
+import json
+import logging
+import sys
+from datetime import datetime, timezone
+
+
+def _short_name(record: logging.LogRecord) -> str:
+    return record.name.removeprefix("app.")
+
+
+class _TextFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        fields = getattr(record, "fields", None) or {}
+        line = f"[{_short_name(record)}] {record.getMessage()}"
+        if fields:
+            line += " " + " ".join(f"{key}={value}" for key, value in fields.items())
+        if record.exc_info:
+            line += "\n" + self.formatException(record.exc_info)
+        return line
+
+
+class _JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname.lower(),
+            "logger": _short_name(record),
+            "msg": record.getMessage(),
+            **(getattr(record, "fields", None) or {}),
+        }
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class StructuredLogger:
+    """Thin wrapper taking keyword fields instead of `extra=`"""
+
+    def __init__(self, logger: logging.Logger):
+        self._logger = logger
+
+    def _log(self, level: int, message: str, fields: dict, exc_info=False):
+        if self._logger.isEnabledFor(level):
+            self._logger.log(level, message, exc_info=exc_info, extra={"fields": fields})
+
+    def debug(self, message: str, **fields):
+        self._log(logging.DEBUG, message, fields)
+
+    def info(self, message: str, **fields):
+        self._log(logging.INFO, message, fields)
+
+    def warning(self, message: str, **fields):
+        self._log(logging.WARNING, message, fields)
+
+    def error(self, message: str, **fields):
+        self._log(logging.ERROR, message, fields)
+
+    def exception(self, message: str, **fields):
+        """error() with the current exception's traceback"""
+        self._log(logging.ERROR, message, fields, exc_info=True)
+
+
+_handler = logging.StreamHandler(sys.stdout)
+_handler.setFormatter(_TextFormatter())
+_root = logging.getLogger("app")
+_root.addHandler(_handler)
+_root.setLevel(logging.INFO)
+_root.propagate = False
+
+
+def configure_logging(log_format: str = "text", level: str = "INFO"):
+    _handler.setFormatter(_JsonFormatter() if log_format == "json" else _TextFormatter())
+    _root.setLevel(level.upper())
+
+
+def get_logger(name: str) -> StructuredLogger:
+    logger = logging.getLogger(f"app.{name}")
+    return StructuredLogger(logger)
@@ -0,0 +1,267 @@
+"""
+In-process Prometheus metrics, served as text at GET /metrics.
+
+A deliberately small implementation (counters and fixed-bucket histograms
+with labels) so there is no extra dependency. Recording is a dict lookup, a
+bisect and a few additions under a lock, cheap enough for every request.
+Values are per process; Prometheus sums them across instances.
+"""
+
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Sequence, Tuple
+
+# Seconds; covers fast API routes up to long Groq generations
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+FAST_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} counter"
+        with self._lock:
+            values = list(self._values.items())
+        for key, value in values:
+            yield f"{self.name}{_labels(self.labelnames, key)} {_number(value)}"
+
+
+class Histogram:
+    def __init__(
+            self,
+            name: str,
+            documentation: str,
+            labelnames: Sequence[str] = (),
+            buckets: Sequence[float] = LATENCY_BUCKETS
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: [count per bucket (+Inf last), sum]
+        self._series: Dict[Tuple[str, ...], Tuple[List[int], List[float]]] = {}
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def observe(self, value: float, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = ([0] * (len(self.buckets) + 1), [0.0])
+            series[0][index] += 1
+            series[1][0] += value
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} histogram"
+        with self._lock:
+            series = [(key, list(counts), total[0]) for key, (counts, total) in self._series.items()]
+        for key, counts, total in series:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = 'le="' + _number(bound) + '"'
+                yield f"{self.name}_bucket{_labels(self.labelnames, key, le)} {cumulative}"
+            yield f"{self.name}_sum{_labels(self.labelnames, key)} {_number(total)}"
+            yield f"{self.name}_count{_labels(self.labelnames, key)} {cumulative}"
+
+
+class Gauge:
+    """Read at scrape time from a callback returning {label values: value}"""
+
+    TYPE = "gauge"
+
+    def __init__(
+            self,
+            name: str,
+            documentation: str,
+            collect: Callable[[], Dict[Tuple[str, ...], float]],
+            labelnames: Sequence[str] = ()
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.collect = collect
+        REGISTRY.append(self)
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} {self.TYPE}"
+        for key, value in self.collect().items():
+            yield f"{self.name}{_labels(self.labelnames, key)} {_number(value)}"
+
+
+class CallbackCounter(Gauge):
+    """A running total counted elsewhere, read at scrape time like a Gauge"""
+
+    TYPE = "counter"
+
+
+REGISTRY: List = []
+
+
+def render_metrics() -> str:
+    lines = []
+    for metric in REGISTRY:
+        try:
+            lines.extend(metric.render())
+        except Exception as e:
+            lines.append(f"# {metric.name} unavailable: {_escape(str(e))}")
+    return "\n".join(lines) + "\n"
+
+
+class MetricsMiddleware:
+    """ASGI middleware timing every request by route template (not raw path)"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status = [500]
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            # The router stores the matched route in the (shared) scope
+            route = scope.get("route")
+            HTTP_REQUEST_SECONDS.observe(
+                time.perf_counter() - started,
+                method=scope["method"],
+                route=getattr(route, "path", "unmatched"),
+                status=status[0],
+            )
+
+
+# --- Pipeline metrics ---
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "pathedplay_http_request_duration_seconds",
+    "API request latency by route template and status",
+    ("method", "route", "status"),
+)
+JOB_QUEUE_WAIT_SECONDS = Histogram(
+    "pathedplay_job_queue_wait_seconds",
+    "Time from a job becoming runnable to a worker starting it",
+)
+JOB_DURATION_SECONDS = Histogram(
+    "pathedplay_job_duration_seconds",
+    "Time spent running a job, by generation mode and outcome",
+    ("mode", "status"),
+)
+JOB_OUTCOMES = Counter(
+    "pathedplay_jobs_total",
+    "Finished job attempts by status (completed, failed, retried, abandoned)",
+    ("status",),
+)
+ADMISSION_DECISIONS = Counter(
+    "pathedplay_admission_decisions_total",
+    "Story creation requests by admission outcome (admitted, shed_session, shed_overload, served_existing)",
+    ("outcome",),
+)
+STORY_CREATE_REPLAYS = Counter(
+    "pathedplay_story_create_replays_total",
+    "Create requests answered with an existing job, by key source (header, derived)",
+    ("source",),
+)
+JOB_MAINTENANCE = Counter(
+    "pathedplay_job_maintenance_total",
+    "Jobs handled by table maintenance, by action (requeued, failed, archived, deleted)",
+    ("action",),
+)
+LLM_REQUEST_SECONDS = Histogram(
+    "pathedplay_llm_request_duration_seconds",
+    "Groq call latency per attempt (to the response headers for streams), by outcome",
+    ("outcome",),
+)
+LLM_TOKENS = Counter(
+    "pathedplay_llm_tokens_total",
+    "Tokens reported in Groq response usage",
+    ("type",),
+)
+STORY_PARSE_SECONDS = Histogram(
+    "pathedplay_story_parse_duration_seconds",
+    "Turning a completion into a story tree, by stage (extract, validate)",
+    ("stage",),
+    buckets=FAST_BUCKETS,
+)
+STORY_PARSE_FAILURES = Counter(
+    "pathedplay_story_parse_failures_total",
+    "Completions that could not be turned into a story, by reason",
+    ("reason",),
+)
+STORY_REPAIRS = Counter(
+    "pathedplay_story_json_repairs_total",
+    "Completions whose JSON had to be repaired before parsing",
+)
+STORY_STREAM_FALLBACKS = Counter(
+    "pathedplay_story_stream_fallbacks_total",
+    "Streamed stories re-parsed whole because the stream parser gave up or the stream ended early",
+)
+STORY_PERSIST_SECONDS = Histogram(
+    "pathedplay_story_persist_duration_seconds",
+    "Writing one story tree to the database, by persist mode",
+    ("mode",),
+    buckets=FAST_BUCKETS + (0.5, 1, 2.5),
+)
+STORY_NODES = Histogram(
+    "pathedplay_story_nodes",
+    "Nodes per saved story",
+    buckets=(4, 8, 16, 32, 64, 128, 256),
+)
+DB_CHECKOUT_SECONDS = Histogram(
+    "pathedplay_db_pool_checkout_duration_seconds",
+    "Waiting for (and pre-pinging) a pooled database connection",
+    buckets=FAST_BUCKETS + (0.5, 1, 5, 30),
+)
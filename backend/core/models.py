@@ -1,19 +1,67 @@
-from typing import List, Dict, Any, Optional
-from pydantic import BaseModel, Field
+from typing import List, Optional
+from pydantic import BaseModel, Field, ValidationInfo, model_validator
+
+from backend.core.log import get_logger
+
+log = get_logger("StoryTree")
+
+# Nodes past this count (pre-order) are forced to be endings
+MAX_STORY_NODES = 15
+# Trees deeper than this are rejected outright
+MAX_STORY_DEPTH = 8
+# Both can be raised per call with context={"max_nodes": ..., "max_depth": ...}
 
 
 class StoryOptionLLM(BaseModel):
-    text: str = Field(description="the text of the option shown to the user")
-    nextNode: Dict[str, Any] = Field(description="the next node content and its options")
+    text: str = Field(default="Continue", description="the text of the option shown to the user")
+    nextNode: "StoryNodeLLM" = Field(description="the next node content and its options")
 
 
 class StoryNodeLLM(BaseModel):
     content: str = Field(description="The main content of the story node")
-    isEnding: bool = Field(description="Whether this node is an ending node")
-    isWinningEnding: bool = Field(description="Whether this node is a winning ending node")
+    isEnding: bool = Field(default=False, description="Whether this node is an ending node")
+    isWinningEnding: bool = Field(default=False, description="Whether this node is a winning ending node")
     options: Optional[List[StoryOptionLLM]] = Field(default=None, description="The options for this node")
 
 
 class StoryLLMResponse(BaseModel):
     title: str = Field(description="The title of the story")
-    rootNode: StoryNodeLLM = Field(description="The root node of the story")
\ No newline at end of file
+    rootNode: StoryNodeLLM = Field(description="The root node of the story")
+
+    @model_validator(mode="after")
+    def check_tree(self, info: ValidationInfo) -> "StoryLLMResponse":
+        """Enforce the tree rules in one pre-order walk.
+
+        Endings lose any options, nodes past the node limit are cut down to
+        endings, and dead ends, winning non-endings or overly deep trees are
+        rejected.
+        """
+        context = info.context or {}
+        max_nodes = context.get("max_nodes", MAX_STORY_NODES)
+        max_depth = context.get("max_depth", MAX_STORY_DEPTH)
+
+        count = 0
+        stack = [(self.rootNode, 1)]
+        while stack:
+            node, depth = stack.pop()
+            count += 1
+            if depth > max_depth:
+                raise ValueError(f"story is deeper than {max_depth} levels")
+
+            if count > max_nodes and not node.isEnding:
+                log.warning("Hit node limit", max_nodes=max_nodes)
+                node.isEnding = True
+            if node.isEnding:
+                node.options = []
+                continue
+
+            if node.isWinningEnding:
+                raise ValueError(f"node {count} is a winning ending but not an ending")
+            if not node.options:
+                raise ValueError(f"node {count} is a dead end: no options and not an ending")
+            # Reversed so nodes are visited (and counted) in document order
+            stack.extend((option.nextNode, depth + 1) for option in reversed(node.options))
+        return self
+
+
+StoryOptionLLM.model_rebuild()
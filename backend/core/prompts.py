@@ -83,4 +83,50 @@ EXAMPLE (follow this EXACT structure):
 }}
 
 CRITICAL: Output ONLY the JSON, nothing else. Keep content brief.
-"""
\ No newline at end of file
+"""
+
+# Fan-out generation (StoryGenerator.generate_story_fanout): the opening first,
+# then one call per branch that continues from the path leading to it.
+
+FANOUT_ROOT_PROMPT = """Create the opening of a {theme} choose-your-own-adventure story.
+
+Write a title and an opening scene of 2-3 sentences that ends with a choice
+between exactly {branching} options. Do NOT write what happens after the choices.
+
+Output ONLY valid JSON:
+{{
+    "title": "The Dark Cave",
+    "rootNode": {{
+        "content": "You find a cave entrance. Tunnels branch ahead.",
+        "isEnding": false,
+        "isWinningEnding": false,
+        "options": [{{"text": "Enter left tunnel"}}, {{"text": "Enter right tunnel"}}]
+    }}
+}}
+"""
+
+FANOUT_BRANCH_PROMPT = """You are continuing a {theme} choose-your-own-adventure story titled "{title}".
+
+Story so far:
+{path}
+
+Write what happens next as a tree {levels} level(s) deep. Every choice has
+exactly {branching} options. Keep each content to 1-2 sentences.
+{bottom}
+
+Output ONLY valid JSON for the next node:
+{{
+    "content": "What happens after the player's choice.",
+    "isEnding": false,
+    "isWinningEnding": false,
+    "options": [
+        {{"text": "Option", "nextNode": {{"content": "...", "isEnding": true, "isWinningEnding": false, "options": []}}}}
+    ]
+}}
+"""
+
+FANOUT_ENDINGS = """Nodes on level {levels} are endings: "isEnding": true and "options": [].
+Make about one in three endings winning ("isWinningEnding": true), the rest losing."""
+
+FANOUT_OPEN_BOTTOM = """Nodes on level {levels} are NOT endings: give each of them {branching} options
+with only a "text" and no "nextNode" - the story continues there later."""
@@ -0,0 +1,244 @@
+"""
+Rate-limit-aware scheduler for Groq calls.
+
+Every Groq request goes through `groq_scheduler.run()`, which:
+
+- admits calls in FIFO order against a requests-per-minute and a
+  tokens-per-minute token bucket, delaying them instead of letting Groq
+  reject them;
+- corrects the buckets from Groq's x-ratelimit-* response headers and from
+  the actual token usage;
+- retries 429s, 5xx and connection errors with jittered exponential
+  backoff, honouring retry-after and pausing all callers after a 429.
+
+Queue depth and time spent throttled are kept in `stats()`.
+"""
+
+import asyncio
+import random
+import re
+import time
+from typing import Awaitable, Callable, Mapping, Optional
+
+from backend.core.config import settings
+from backend.core.log import get_logger
+from backend.core.metrics import LLM_REQUEST_SECONDS, LLM_TOKENS
+from backend.core.timeline import add_tokens, mark
+
+log = get_logger("GroqScheduler")
+
+_DURATION = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+_UNIT_SECONDS = {"h": 3600.0, "m": 60.0, "s": 1.0, "ms": 0.001}
+
+
+def parse_duration(value: Optional[str]) -> Optional[float]:
+    """Parse Groq reset values like '7.66s', '2m59.56s' or '450ms' into seconds"""
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = _DURATION.findall(value)
+    if not parts:
+        return None
+    return sum(float(amount) * _UNIT_SECONDS[unit] for amount, unit in parts)
+
+
+def record_usage(usage):
+    """Count prompt/completion tokens from a Groq usage object"""
+    prompt = getattr(usage, "prompt_tokens", 0) or 0
+    completion = getattr(usage, "completion_tokens", 0) or 0
+    LLM_TOKENS.inc(prompt, type="prompt")
+    LLM_TOKENS.inc(completion, type="completion")
+    add_tokens(prompt, completion)
+
+
+class TokenBucket:
+    """Continuously refilling bucket; reservations may go into debt"""
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.level = float(per_minute)
+        self.updated = time.monotonic()
+
+    @property
+    def rate(self) -> float:
+        return self.capacity / 60.0
+
+    def _refill(self, now: float):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """Seconds until `amount` is available"""
+        self._refill(now)
+        missing = min(amount, self.capacity) - self.level
+        return max(0.0, missing / self.rate) if missing > 0 else 0.0
+
+    def take(self, amount: float, now: float):
+        self._refill(now)
+        self.level -= amount
+
+    def give_back(self, amount: float, now: float):
+        self._refill(now)
+        self.level = min(self.capacity, self.level + amount)
+
+    def observe(self, limit: Optional[float], remaining: Optional[float], now: float):
+        """Align with what the server reports"""
+        self._refill(now)
+        if limit:
+            self.capacity = float(limit)
+        if remaining is not None:
+            self.level = min(self.level, float(remaining))
+
+
+class GroqScheduler:
+    def __init__(self):
+        self.requests = TokenBucket(settings.GROQ_REQUESTS_PER_MINUTE)
+        self.tokens = TokenBucket(settings.GROQ_TOKENS_PER_MINUTE)
+        self.paused_until = 0.0
+        self._lock: Optional[asyncio.Lock] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+        self.queue_depth = 0
+        self.max_queue_depth = 0
+        self.calls = 0
+        self.throttled_calls = 0
+        self.throttled_seconds = 0.0
+        self.retries = 0
+        self.rate_limited = 0
+        self.server_errors = 0
+        self.failures = 0
+
+    async def run(self, request: Callable[[], Awaitable], estimated_tokens: int):
+        """Send `request` (a with_raw_response call) and return the parsed result"""
+        import groq
+
+        attempt = 0
+        while True:
+            await self._admit(estimated_tokens)
+            started = time.perf_counter()
+            mark("llm_request")
+            try:
+                raw = await request()
+            except (groq.APIStatusError, groq.APIConnectionError) as e:
+                status = getattr(e, "status_code", None)
+                LLM_REQUEST_SECONDS.observe(time.perf_counter() - started, outcome=status or "connection_error")
+                headers = e.response.headers if getattr(e, "response", None) is not None else {}
+                retryable = status is None or status == 429 or status >= 500
+                now = time.monotonic()
+                self.tokens.give_back(estimated_tokens, now)
+
+                if status == 429:
+                    self.rate_limited += 1
+                    self._observe(headers)
+                elif status is not None and status >= 500:
+                    self.server_errors += 1
+
+                if not retryable or attempt >= settings.GROQ_MAX_RETRIES:
+                    self.failures += 1
+                    raise
+
+                delay = self._backoff(attempt, headers)
+                if status == 429:
+                    # Everyone else would get the same answer; hold them too
+                    self.paused_until = max(self.paused_until, now + delay)
+                log.warning("Retrying", status=status or "connection error", delay=round(delay, 1))
+                self.retries += 1
+                mark("llm_retry")
+                self.throttled_seconds += delay
+                await asyncio.sleep(delay)
+                attempt += 1
+                continue
+
+            LLM_REQUEST_SECONDS.observe(time.perf_counter() - started, outcome="ok")
+            mark("llm_response")
+            self._observe(raw.headers)
+            result = await raw.parse()
+            usage = getattr(result, "usage", None)
+            if usage is not None and getattr(usage, "total_tokens", None) is not None:
+                # Settle the reservation against what was really used
+                self.tokens.give_back(estimated_tokens - usage.total_tokens, time.monotonic())
+                record_usage(usage)
+            return result
+
+    def stats(self) -> dict:
+        now = time.monotonic()
+        return {
+            "queue_depth": self.queue_depth,
+            "max_queue_depth": self.max_queue_depth,
+            "calls": self.calls,
+            "throttled_calls": self.throttled_calls,
+            "throttled_seconds": round(self.throttled_seconds, 3),
+            "retries": self.retries,
+            "rate_limited": self.rate_limited,
+            "server_errors": self.server_errors,
+            "failures": self.failures,
+            "paused_for_seconds": round(max(0.0, self.paused_until - now), 3),
+            "requests_per_minute": self.requests.capacity,
+            "tokens_per_minute": self.tokens.capacity,
+            "tokens_available": round(self.tokens.level, 1),
+        }
+
+    async def _admit(self, estimated_tokens: int):
+        """Wait (in FIFO order) until the buckets can take this call"""
+        self.queue_depth += 1
+        self.max_queue_depth = max(self.max_queue_depth, self.queue_depth)
+        try:
+            async with self._get_lock():
+                waited = 0.0
+                while True:
+                    now = time.monotonic()
+                    delay = max(
+                        self.paused_until - now,
+                        self.requests.wait_time(1, now),
+                        self.tokens.wait_time(estimated_tokens, now),
+                    )
+                    if delay <= 0:
+                        break
+                    waited += delay
+                    await asyncio.sleep(delay)
+
+                now = time.monotonic()
+                self.requests.take(1, now)
+                self.tokens.take(estimated_tokens, now)
+                self.calls += 1
+                if waited:
+                    self.throttled_calls += 1
+                    self.throttled_seconds += waited
+        finally:
+            self.queue_depth -= 1
+
+    def _observe(self, headers: Mapping[str, str]):
+        now = time.monotonic()
+
+        def number(name: str) -> Optional[float]:
+            try:
+                return float(headers[name])
+            except (KeyError, TypeError, ValueError):
+                return None
+
+        # Groq's token limit is per minute; its request limit is per day, so
+        # only its remaining count is used (to stop when it hits zero)
+        self.tokens.observe(number("x-ratelimit-limit-tokens"), number("x-ratelimit-remaining-tokens"), now)
+        if number("x-ratelimit-remaining-requests") == 0:
+            reset = parse_duration(headers.get("x-ratelimit-reset-requests"))
+            if reset:
+                self.paused_until = max(self.paused_until, now + reset)
+
+    def _backoff(self, attempt: int, headers: Mapping[str, str]) -> float:
+        retry_after = parse_duration(headers.get("retry-after"))
+        ceiling = min(settings.GROQ_RETRY_MAX_SECONDS, settings.GROQ_RETRY_BASE_SECONDS * 2 ** attempt)
+        delay = random.uniform(ceiling / 2, ceiling)
+        return max(delay, retry_after or 0.0)
+
+    def _get_lock(self) -> asyncio.Lock:
+        loop = asyncio.get_running_loop()
+        if self._lock is None or self._loop is not loop:
+            self._lock = asyncio.Lock()
+            self._loop = loop
+        return self._lock
+
+
+groq_scheduler = GroqScheduler()
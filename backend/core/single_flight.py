@@ -0,0 +1,91 @@
+"""
+Single-flight coalescing of identical story generations.
+
+When many jobs ask for the same story at once (same normalized theme and
+shape), only SINGLE_FLIGHT_MAX_GENERATIONS Groq generations run for that key;
+further jobs join one of them and save their own copy of the resulting tree
+under their session. Each generation accepts at most
+SINGLE_FLIGHT_MAX_WAITERS joiners, so one failed call can't fail an unbounded
+number of jobs; jobs beyond that generate on their own.
+
+Coalescing is per process: with JOB_QUEUE=database every worker process
+coalesces its own jobs.
+"""
+
+import asyncio
+import threading
+from typing import Awaitable, Callable, Dict, Hashable, List
+
+from backend.core.config import settings
+from backend.core.models import StoryLLMResponse
+
+
+class _Flight:
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class StoryFlights:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flights: Dict[Hashable, List[_Flight]] = {}
+
+        self.generations = 0
+        self.joined = 0
+        self.overflow = 0
+        self.failures = 0
+
+    async def run(self, key: Hashable, generate: Callable[[], Awaitable[StoryLLMResponse]]) -> StoryLLMResponse:
+        """The tree for `key`: from a generation already in flight, or a new one"""
+        with self._lock:
+            flights = self._flights.setdefault(key, [])
+            if len(flights) < settings.SINGLE_FLIGHT_MAX_GENERATIONS:
+                flight = _Flight(asyncio.create_task(generate()))
+                flights.append(flight)
+                flight.task.add_done_callback(lambda task: self._land(key, flight))
+                self.generations += 1
+            else:
+                flight = min(flights, key=lambda candidate: candidate.waiters)
+                if flight.waiters >= settings.SINGLE_FLIGHT_MAX_WAITERS:
+                    flight = None
+                    self.overflow += 1
+                else:
+                    flight.waiters += 1
+                    self.joined += 1
+
+        if flight is None:
+            return await generate()
+        # Shielded: a cancelled job must not cancel the generation it shares
+        return await asyncio.shield(flight.task)
+
+    def stats(self) -> dict:
+        with self._lock:
+            jobs = self.generations + self.joined + self.overflow
+            return {
+                "enabled": settings.SINGLE_FLIGHT,
+                "max_generations_per_key": settings.SINGLE_FLIGHT_MAX_GENERATIONS,
+                "max_waiters_per_generation": settings.SINGLE_FLIGHT_MAX_WAITERS,
+                "generations": self.generations,
+                "joined": self.joined,
+                "overflow": self.overflow,
+                "failures": self.failures,
+                "hit_rate": self.joined / jobs if jobs else None,
+                "in_flight": {
+                    repr(key): [flight.waiters for flight in flights]
+                    for key, flights in self._flights.items()
+                },
+            }
+
+    def _land(self, key: Hashable, flight: _Flight):
+        with self._lock:
+            flights = self._flights.get(key, [])
+            if flight in flights:
+                flights.remove(flight)
+            if not flights:
+                self._flights.pop(key, None)
+            if flight.task.cancelled() or flight.task.exception() is not None:
+                self.failures += 1
+
+
+story_flights = StoryFlights()
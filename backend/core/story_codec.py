@@ -0,0 +1,103 @@
+"""
+Compact single-row encoding of a story tree.
+
+A story is always read whole, so it can live in one `stories.tree_blob`
+value instead of one `story_nodes` row per node. The blob is
+zlib-compressed JSON of one array per node:
+
+    [id, content, flags, [[option_text, node_id], ...]]
+
+where flags is a bitmask of the FLAG_* values below. `stories.tree_format`
+records the version so the layout can change without rewriting old rows.
+"""
+
+import json
+import zlib
+from typing import Iterable, List
+
+FORMAT_VERSION = 1
+
+FLAG_ROOT = 1
+FLAG_ENDING = 2
+FLAG_WINNING = 4
+
+
+def encode_tree(nodes: Iterable[dict]) -> bytes:
+    """Encode node dicts (id, content, is_root, is_ending, is_winning_ending, options)"""
+    packed = []
+    for node in nodes:
+        flags = (
+            (FLAG_ROOT if node["is_root"] else 0)
+            | (FLAG_ENDING if node["is_ending"] else 0)
+            | (FLAG_WINNING if node["is_winning_ending"] else 0)
+        )
+        options = [[option["text"], option["node_id"]] for option in node["options"] or []]
+        packed.append([node["id"], node["content"], flags, options])
+
+    payload = json.dumps(packed, ensure_ascii=False, separators=(",", ":"))
+    return zlib.compress(payload.encode("utf-8"), 6)
+
+
+def decode_tree(blob: bytes, version: int) -> List[dict]:
+    """Decode a blob back into node dicts"""
+    if version != FORMAT_VERSION:
+        raise ValueError(f"Unsupported story tree format: {version}")
+
+    nodes = []
+    for node_id, content, flags, options in json.loads(zlib.decompress(blob)):
+        nodes.append({
+            "id": node_id,
+            "content": content,
+            "is_root": bool(flags & FLAG_ROOT),
+            "is_ending": bool(flags & FLAG_ENDING),
+            "is_winning_ending": bool(flags & FLAG_WINNING),
+            "options": [{"text": text, "node_id": target} for text, target in options],
+        })
+    return nodes
+
+
+def node_to_dict(node) -> dict:
+    """Node dict for encode_tree() from a StoryNode row"""
+    return {
+        "id": node.id,
+        "content": node.content,
+        "is_root": node.is_root,
+        "is_ending": node.is_ending,
+        "is_winning_ending": node.is_winning_ending,
+        "options": node.options,
+    }
+
+
+def tree_stats(nodes: Iterable[dict]) -> dict:
+    """Shape metadata stored on the stories row, from node dicts as for encode_tree().
+
+    is_balanced is the intended mix of one winning ending per three losing
+    ones (the classic story has exactly 1 and 3).
+    """
+    nodes = list(nodes)
+    by_id = {node["id"]: node for node in nodes}
+    winning = sum(1 for node in nodes if node["is_ending"] and node["is_winning_ending"])
+    losing = sum(1 for node in nodes if node["is_ending"] and not node["is_winning_ending"])
+
+    # Levels including the root (a lone root is 1), following options breadth first
+    depth = 0
+    seen = set()
+    level = [node for node in nodes if node["is_root"]]
+    while level:
+        depth += 1
+        seen.update(node["id"] for node in level)
+        level = [
+            child for child in (
+                by_id.get(option.get("node_id")) for node in level for option in node["options"] or []
+            )
+            if child is not None and child["id"] not in seen
+        ]
+
+    return {
+        "node_count": len(nodes),
+        "winning_ending_count": winning,
+        "losing_ending_count": losing,
+        "max_depth": depth,
+        "content_length": sum(len(node["content"] or "") for node in nodes),
+        "is_balanced": winning >= 1 and losing == 3 * winning,
+    }
@@ -1,14 +1,48 @@
 
+from typing import Callable, List, Optional
+from sqlalchemy import func, insert, inspect, select, text
 from sqlalchemy.orm import Session
+from pydantic import ValidationError
+from backend.core.config import settings
+from backend.core.json_repair import extract_json
+from backend.core.log import get_logger
+from backend.core.metrics import (
+    STORY_NODES, STORY_PARSE_FAILURES, STORY_PARSE_SECONDS, STORY_PERSIST_SECONDS, STORY_REPAIRS,
+    STORY_STREAM_FALLBACKS
+)
+from backend.core.models import MAX_STORY_NODES, StoryLLMResponse, StoryNodeLLM
+from backend.core.prompts import FANOUT_BRANCH_PROMPT, FANOUT_ENDINGS, FANOUT_OPEN_BOTTOM, FANOUT_ROOT_PROMPT
+from backend.core.rate_limiter import groq_scheduler, record_usage
+from backend.core.story_codec import FORMAT_VERSION, encode_tree, node_to_dict, tree_stats
+from backend.core.stream_parser import StoryStreamParser, StreamNode
+from backend.core.timeline import mark
 from backend.models.story import Story, StoryNode
 from dotenv import load_dotenv
 import os
 import json
+import time
 
 load_dotenv()
 
+# Called with (story_id, nodes_ready) right before story nodes are committed,
+# so callers can update their own rows in the same transaction. A streamed
+# story that is thrown away reports (None, 0).
+ProgressCallback = Callable[[Optional[int], int], None]
+
+log = get_logger("StoryGen")
+
+# Story columns a copy takes over from its original (see copy_story)
+COPIED_STORY_COLUMNS = (
+    "title", "is_complete", "tree_blob", "tree_format", "theme", "depth", "branching", "is_lazy",
+    "node_count", "winning_ending_count", "losing_ending_count", "max_depth", "content_length", "is_balanced",
+)
+
+
 class StoryGenerator:
 
+    _async_client = None
+    _async_client_loop = None
+
     @classmethod
     def _get_groq_client(cls):
         """Get Groq client (FREE alternative to OpenAI)"""
@@ -21,14 +55,492 @@ class StoryGenerator:
         if not api_key:
             raise Exception("Missing GROQ_API_KEY in .env file. Get one at https://console.groq.com")
         
-        return Groq(api_key=api_key)
+        return Groq(api_key=api_key, base_url=settings.GROQ_BASE_URL)
+
+    @classmethod
+    def _get_async_groq_client(cls):
+        """Get the process-wide AsyncGroq client.
+
+        Created lazily and reused by every generation so jobs share one pool of
+        keep-alive connections instead of paying for TLS setup each time. The
+        client is tied to the event loop it was created on, so a new loop gets
+        a new client.
+        """
+        import asyncio
+
+        loop = asyncio.get_running_loop()
+        if cls._async_client is not None and cls._async_client_loop is loop:
+            return cls._async_client
+
+        try:
+            import httpx
+            from groq import AsyncGroq
+        except ImportError:
+            raise Exception("Install groq: pip install groq")
+
+        api_key = os.getenv("GROQ_API_KEY")
+        if not api_key:
+            raise Exception("Missing GROQ_API_KEY in .env file. Get one at https://console.groq.com")
+
+        http_client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=settings.GROQ_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.GROQ_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=settings.GROQ_KEEPALIVE_EXPIRY,
+            ),
+            timeout=settings.GROQ_TIMEOUT,
+        )
+        # Retries are handled by groq_scheduler, which knows about rate limits
+        cls._async_client = AsyncGroq(
+            api_key=api_key, base_url=settings.GROQ_BASE_URL, http_client=http_client, max_retries=0
+        )
+        cls._async_client_loop = loop
+        return cls._async_client
+
+    @classmethod
+    async def close_async_client(cls):
+        """Close the shared AsyncGroq client and its connection pool"""
+        if cls._async_client is not None:
+            await cls._async_client.close()
+            cls._async_client = None
+            cls._async_client_loop = None
 
     @classmethod
     def generate_story(cls, db: Session, session_id: str, theme: str = "fantasy") -> Story:
         """Generate a deeper story with multiple choice levels"""
         
         client = cls._get_groq_client()
-        
+
+        log.info("Calling Groq API for deeper story", theme=theme)
+        try:
+            response = client.chat.completions.create(**cls._completion_params(theme))
+        except Exception as e:
+            log.error("Generation failed", error=str(e))
+            raise Exception(f"Failed to generate story: {str(e)}")
+
+        story_tree = cls._parse_story(response.choices[0].message.content)
+        return cls._save_story(db, session_id, story_tree)
+
+    @classmethod
+    async def generate_story_async(
+            cls,
+            db: Session,
+            session_id: str,
+            theme: str = "fantasy",
+            on_progress: Optional[ProgressCallback] = None
+    ) -> Story:
+        """Async version of generate_story.
+
+        The Groq call is awaited on the shared client, so no worker thread is
+        held while the model runs; only the DB writes go to the threadpool.
+        """
+        from starlette.concurrency import run_in_threadpool
+
+        story_tree = await cls.generate_tree_async(theme)
+        return await run_in_threadpool(cls._save_story, db, session_id, story_tree, on_progress)
+
+    @classmethod
+    async def generate_tree_async(cls, theme: str = "fantasy") -> StoryLLMResponse:
+        """One Groq call for a whole story tree, parsed but not saved"""
+        client = cls._get_async_groq_client()
+
+        params = cls._completion_params(theme)
+
+        log.info("Calling Groq API for deeper story (async)", theme=theme)
+        try:
+            response = await groq_scheduler.run(
+                lambda: client.chat.completions.with_raw_response.create(**params),
+                cls._estimate_tokens(params)
+            )
+        except Exception as e:
+            log.error("Generation failed", error=str(e))
+            raise Exception(f"Failed to generate story: {str(e)}")
+
+        return cls._parse_story(response.choices[0].message.content)
+
+    @classmethod
+    async def generate_story_streaming(
+            cls,
+            db: Session,
+            session_id: str,
+            theme: str = "fantasy",
+            on_progress: Optional[ProgressCallback] = None
+    ) -> Story:
+        """Stream the completion and persist each node as soon as it is known.
+
+        The root node is committed after the first few dozen tokens, so a
+        player can start reading while the rest of the tree is generated.
+        Until the stream ends the story has is_complete=False. If the
+        incremental parser gives up, or the stream stops early, the partial
+        nodes are dropped and the whole text goes through the regular
+        extract, parse and save path instead.
+        """
+        from starlette.concurrency import run_in_threadpool
+
+        client = cls._get_async_groq_client()
+        parser = StoryStreamParser()
+        writer = _StreamingStoryWriter(db, session_id, on_progress)
+        text = []
+        streaming = True
+
+        params = cls._completion_params(theme)
+
+        log.info("Streaming Groq API response", theme=theme)
+        try:
+            stream = await groq_scheduler.run(
+                lambda: client.chat.completions.with_raw_response.create(**params, stream=True),
+                cls._estimate_tokens(params)
+            )
+            waiting_for_first_token = True
+            async for chunk in stream:
+                # Groq reports usage on the last chunk
+                usage = getattr(getattr(chunk, "x_groq", None), "usage", None)
+                if usage is not None:
+                    record_usage(usage)
+                if not chunk.choices or not chunk.choices[0].delta.content:
+                    continue
+                if waiting_for_first_token:
+                    mark("llm_first_token")
+                    waiting_for_first_token = False
+                content = chunk.choices[0].delta.content
+                text.append(content)
+                if not streaming:
+                    continue
+                try:
+                    events = parser.feed(content)
+                except Exception as e:
+                    # Keep reading: the full text may still parse
+                    log.warning("Stream parser gave up", error=str(e))
+                    streaming = False
+                    continue
+                if events:
+                    await run_in_threadpool(writer.apply, parser, events)
+
+            mark("llm_done")
+            if streaming and parser.done and parser.title is not None and parser.root_ready:
+                mark("parsed")
+                story = await run_in_threadpool(writer.finish, parser)
+                log.info("Streamed story", nodes=writer.count)
+                return story
+            log.warning("Stream ended before the story was complete", chars=sum(map(len, text)))
+        except Exception as e:
+            log.error("Streaming generation failed", error=str(e))
+            if not text:
+                await run_in_threadpool(writer.discard)
+                raise Exception(f"Failed to generate story: {str(e)}")
+
+        # Start over from the whole response, as generate_story_async would
+        await run_in_threadpool(writer.discard)
+        STORY_STREAM_FALLBACKS.inc()
+        story_tree = cls._parse_story("".join(text))
+        return await run_in_threadpool(cls._save_story, db, session_id, story_tree, on_progress)
+
+    @classmethod
+    def fanout_node_count(cls, depth: int, branching: int) -> int:
+        """Nodes in a full tree of `depth` levels"""
+        return sum(branching ** level for level in range(depth))
+
+    @classmethod
+    async def generate_story_fanout(
+            cls,
+            db: Session,
+            session_id: str,
+            theme: str,
+            depth: int,
+            branching: int,
+            on_progress: Optional[ProgressCallback] = None
+    ) -> Story:
+        """Generate a deeper tree with concurrent calls, one per branch.
+
+        A first call writes the title, the opening node and its option texts.
+        Each option then gets its own call for up to FANOUT_LEVELS_PER_CALL
+        levels, given the path that leads to it; options left open at the
+        bottom of that subtree are expanded the same way. Branches are
+        generated concurrently, so wall time grows with depth, not node count.
+        """
+        from starlette.concurrency import run_in_threadpool
+
+        story_tree = await cls.generate_tree_fanout(theme, depth, branching)
+        return await run_in_threadpool(cls._save_story, db, session_id, story_tree, on_progress)
+
+    @classmethod
+    async def generate_tree_fanout(cls, theme: str, depth: int, branching: int) -> StoryLLMResponse:
+        """The fan-out tree for generate_story_fanout, validated but not saved"""
+        import asyncio
+
+        client = cls._get_async_groq_client()
+        started = time.perf_counter()
+        calls = [0]
+
+        async def generate(prompt: str) -> dict:
+            calls[0] += 1
+            return await cls._generate_fanout_part(client, prompt)
+
+        async def expand(node: dict, path: List[str], level: int):
+            await asyncio.gather(*(
+                grow(option, path + [node["content"], f"Player chose: {option['text']}"], level + 1)
+                for option in node["options"] if "nextNode" not in option
+            ))
+
+        async def grow(option: dict, path: List[str], level: int):
+            # Spread the remaining levels evenly over the fewest rounds, so no
+            # round is spent on single-node calls
+            remaining = depth - level + 1
+            rounds = -(-remaining // settings.FANOUT_LEVELS_PER_CALL)
+            levels = -(-remaining // rounds)
+            subtree = await generate(cls._branch_prompt(theme, title, path, levels, branching, level + levels - 1 >= depth))
+            option["nextNode"] = subtree
+            frontier = cls._fanout_frontier(subtree, path, level, depth, branching)
+            await asyncio.gather(*(expand(*open_node) for open_node in frontier))
+
+        log.info("Fan-out generation", depth=depth, branching=branching)
+        try:
+            opening = await generate(FANOUT_ROOT_PROMPT.format(theme=theme, branching=branching))
+            title = opening.get("title")
+            root = opening.get("rootNode")
+            if not isinstance(title, str) or not isinstance(root, dict):
+                raise Exception("Opening is missing title or rootNode")
+            root.pop("isEnding", None)  # the opening always branches
+            for option in root.get("options") or []:
+                if isinstance(option, dict):
+                    option.pop("nextNode", None)
+
+            frontier = cls._fanout_frontier(root, [], 1, depth, branching)
+            if not frontier:
+                raise Exception("Opening has no options")
+            await asyncio.gather(*(expand(*open_node) for open_node in frontier))
+            mark("llm_done")
+
+            story_tree = StoryLLMResponse.model_validate(
+                {"title": title, "rootNode": root},
+                context={"max_nodes": cls.fanout_node_count(depth, branching), "max_depth": depth}
+            )
+            mark("parsed")
+        except ValidationError as e:
+            log.error("Invalid story tree", error=str(e))
+            raise Exception(f"Failed to generate story: {e.errors()[0]['msg']}")
+        except Exception as e:
+            log.error("Fan-out generation failed", error=str(e))
+            raise Exception(f"Failed to generate story: {str(e)}")
+
+        generate_ms = (time.perf_counter() - started) * 1000
+        log.info("Fan-out tree ready", calls=calls[0], ms=round(generate_ms))
+        return story_tree
+
+    @classmethod
+    async def generate_story_lazy(
+            cls,
+            db: Session,
+            session_id: str,
+            theme: str,
+            depth: int,
+            branching: int,
+            on_progress: Optional[ProgressCallback] = None
+    ) -> Story:
+        """Generate only the opening and the nodes one choice away.
+
+        Deeper nodes are generated when a player opens their parent (see
+        backend/core/lazy_story.py); until then their options have no node_id.
+        """
+        import asyncio
+        from starlette.concurrency import run_in_threadpool
+
+        client = cls._get_async_groq_client()
+        usage = {"tokens": 0}
+
+        log.info("Lazy generation", depth=depth, branching=branching)
+        try:
+            opening = await cls._generate_fanout_part(
+                client, FANOUT_ROOT_PROMPT.format(theme=theme, branching=branching), usage
+            )
+            title = opening.get("title")
+            root = opening.get("rootNode")
+            if not isinstance(title, str) or not isinstance(root, dict):
+                raise Exception("Opening is missing title or rootNode")
+            root.pop("isEnding", None)
+            for option in root.get("options") or []:
+                if isinstance(option, dict):
+                    option.pop("nextNode", None)
+            if not cls._fanout_frontier(root, [], 1, depth, branching):
+                raise Exception("Opening has no options")
+
+            async def first_choice(option: dict):
+                path = [root["content"], f"Player chose: {option['text']}"]
+                child = await cls._generate_fanout_part(
+                    client, cls._branch_prompt(theme, title, path, 1, branching, depth <= 2), usage
+                )
+                cls._fanout_frontier(cls._single_node(child), path, 2, depth, branching)
+                option["nextNode"] = child
+
+            await asyncio.gather(*(first_choice(option) for option in root["options"]))
+            mark("llm_done")
+            mark("parsed")
+        except Exception as e:
+            log.error("Lazy generation failed", error=str(e))
+            raise Exception(f"Failed to generate story: {str(e)}")
+
+        return await run_in_threadpool(
+            cls._save_lazy_story, db, session_id, title, root, theme, depth, branching, usage["tokens"], on_progress
+        )
+
+    @classmethod
+    def _save_lazy_story(
+            cls,
+            db: Session,
+            session_id: str,
+            title: str,
+            root: dict,
+            theme: str,
+            depth: int,
+            branching: int,
+            tokens: int,
+            on_progress: Optional[ProgressCallback] = None
+    ) -> Story:
+        """Persist the opening and its children; deeper options stay pending"""
+        story_db = Story(
+            title=title,
+            session_id=session_id,
+            is_complete=False,
+            is_lazy=True,
+            theme=theme,
+            depth=depth,
+            branching=branching,
+            tokens_used=tokens
+        )
+        db.add(story_db)
+        db.flush()
+
+        try:
+            root_row = cls.lazy_node_row(story_db.id, root, is_root=True)
+            children = []
+            for option in root["options"]:
+                child_row = cls.lazy_node_row(story_db.id, option["nextNode"])
+                db.add(child_row)
+                children.append(child_row)
+            db.add(root_row)
+            db.flush()
+
+            root_row.options = [
+                {"text": option["text"], "node_id": child.id}
+                for option, child in zip(root["options"], children)
+            ]
+            mark("persisted")
+            if on_progress:
+                on_progress(story_db.id, len(children) + 1)
+            db.commit()
+            mark("committed")
+            log.info("Created lazy story", story_id=story_db.id, nodes=len(children) + 1, tokens=tokens)
+        except Exception as e:
+            log.error("DB save failed", error=str(e))
+            db.rollback()
+            raise Exception(f"Failed to save story: {str(e)}")
+
+        return story_db
+
+    @classmethod
+    def lazy_node_row(cls, story_id: int, node: dict, is_root: bool = False) -> StoryNode:
+        """StoryNode for a normalized node dict; its options start out pending"""
+        return StoryNode(
+            story_id=story_id,
+            content=node["content"],
+            is_root=is_root,
+            is_ending=node["isEnding"],
+            is_winning_ending=node["isWinningEnding"],
+            options=[{"text": option["text"], "node_id": None} for option in node["options"]]
+        )
+
+    @classmethod
+    def _single_node(cls, node: dict) -> dict:
+        """Drop any deeper levels the model wrote despite being asked for one"""
+        for option in node.get("options") or []:
+            if isinstance(option, dict):
+                option.pop("nextNode", None)
+        return node
+
+    @classmethod
+    def _branch_prompt(cls, theme: str, title: str, path: List[str], levels: int, branching: int, reaches_end: bool) -> str:
+        bottom = FANOUT_ENDINGS if reaches_end else FANOUT_OPEN_BOTTOM
+        return FANOUT_BRANCH_PROMPT.format(
+            theme=theme,
+            title=title,
+            path="\n".join(path),
+            levels=levels,
+            branching=branching,
+            bottom=bottom.format(levels=levels, branching=branching)
+        )
+
+    @classmethod
+    async def _generate_fanout_part(cls, client, prompt: str, usage: Optional[dict] = None) -> dict:
+        """One fan-out call, parsed to a dict; bad JSON is retried.
+
+        Tokens used are added to usage["tokens"] when given.
+        """
+        params = cls._chat_params(prompt)
+        error = None
+        for _ in range(settings.FANOUT_CALL_ATTEMPTS):
+            response = await groq_scheduler.run(
+                lambda: client.chat.completions.with_raw_response.create(**params),
+                cls._estimate_tokens(params)
+            )
+            if usage is not None and getattr(response, "usage", None) is not None:
+                usage["tokens"] += response.usage.total_tokens or 0
+            # A truncated reply keeps its complete part; open options are
+            # generated again by the caller
+            text = extract_json(response.choices[0].message.content).text
+            try:
+                data = json.loads(text)
+            except json.JSONDecodeError as e:
+                error = e
+                STORY_PARSE_FAILURES.inc(reason="json")
+                log.warning("Fan-out reply was not JSON, retrying", error=str(e))
+                continue
+            if isinstance(data, dict):
+                return data
+            error = "reply is not a JSON object"
+        raise Exception(f"Model returned invalid JSON: {error}")
+
+    @classmethod
+    def _fanout_frontier(cls, node: dict, path: List[str], level: int, depth: int, branching: int) -> List[tuple]:
+        """Normalize a generated subtree in place.
+
+        Returns (node, path, level) for every node whose options still need a
+        subtree. A node without usable options, or on the last level, becomes
+        an ending.
+        """
+        if not isinstance(node.get("content"), str) or not node["content"]:
+            raise Exception(f"Generated node on level {level} has no content")
+
+        options = [
+            option for option in node.get("options") or []
+            if isinstance(option, dict) and isinstance(option.get("text"), str)
+        ][:branching]
+        if level >= depth or node.get("isEnding") or not options:
+            node["isEnding"] = True
+            node["isWinningEnding"] = bool(node.get("isWinningEnding"))
+            node["options"] = []
+            return []
+
+        node["isEnding"] = False
+        node["isWinningEnding"] = False
+        node["options"] = options
+
+        frontier = []
+        needs_expanding = False
+        for option in options:
+            child = option.get("nextNode")
+            if isinstance(child, dict) and child.get("content"):
+                child_path = path + [node["content"], f"Player chose: {option['text']}"]
+                frontier += cls._fanout_frontier(child, child_path, level + 1, depth, branching)
+            else:
+                option.pop("nextNode", None)
+                needs_expanding = True
+        if needs_expanding:
+            frontier.append((node, path, level))
+        return frontier
+
+    @classmethod
+    def _completion_params(cls, theme: str) -> dict:
+        """Chat completion arguments shared by the sync and async paths"""
         # Balanced prompt - one winning path, one losing path
         prompt = f"""Create a {theme} choose-your-own-adventure story with ONE winning path and ONE losing path.
 
@@ -115,100 +627,306 @@ Rules:
 - 3 failures, 1 success = balanced difficulty
 - Keep it engaging and suspenseful"""
 
+        return cls._chat_params(prompt)
+
+    @classmethod
+    def _chat_params(cls, prompt: str) -> dict:
+        return dict(
+            model="llama-3.1-8b-instant",
+            messages=[
+                {"role": "system", "content": "You are a creative story writer. Output only valid JSON with the exact structure requested."},
+                {"role": "user", "content": prompt}
+            ],
+            temperature=0.8,  # Higher creativity
+            max_tokens=2000,  # More tokens for deeper story
+            timeout=settings.GROQ_TIMEOUT
+        )
+
+    @classmethod
+    def _estimate_tokens(cls, params: dict) -> int:
+        """Rough token cost of a call, for rate limiting (~4 chars per token)"""
+        prompt_chars = sum(len(message["content"]) for message in params["messages"])
+        return prompt_chars // 4 + settings.GROQ_COMPLETION_TOKEN_ESTIMATE
+
+    @classmethod
+    def _parse_story(cls, response_text: str) -> StoryLLMResponse:
+        """Extract, parse and validate the story tree from a completion"""
         try:
-            print("[StoryGen] Calling Groq API for deeper story...", flush=True)
-            
-            response = client.chat.completions.create(
-                model="llama-3.1-8b-instant",
-                messages=[
-                    {"role": "system", "content": "You are a creative story writer. Output only valid JSON with the exact structure requested."},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.8,  # Higher creativity
-                max_tokens=2000,  # More tokens for deeper story
-                timeout=45
-            )
-            
-            response_text = response.choices[0].message.content
-            print(f"[StoryGen] Got response: {len(response_text)} chars", flush=True)
-            
+            log.debug("Got response", chars=len(response_text))
+            started = time.perf_counter()
+
             # Extract JSON
-            response_text = cls._extract_json(response_text)
-            
-            # Parse
-            story_data = json.loads(response_text)
-            
-            if "title" not in story_data or "rootNode" not in story_data:
-                raise Exception("Invalid structure")
-            
-            print(f"[StoryGen] Title: {story_data['title']}", flush=True)
-            
+            extracted = extract_json(response_text)
+            response_text = extracted.text
+            extracted_at = time.perf_counter()
+            STORY_PARSE_SECONDS.observe(extracted_at - started, stage="extract")
+
+            if extracted.repaired:
+                STORY_REPAIRS.inc()
+                log.info("Repaired JSON", repairs=", ".join(extracted.repairs))
+                story_data = json.loads(response_text)
+                if not isinstance(story_data, dict) or not cls._drop_incomplete_branches(story_data.get("rootNode")):
+                    raise Exception("Invalid structure")
+                story = StoryLLMResponse.model_validate(story_data)
+            else:
+                # Fast path: pydantic-core parses, builds and checks the tree in one go
+                story = StoryLLMResponse.model_validate_json(response_text)
+            STORY_PARSE_SECONDS.observe(time.perf_counter() - extracted_at, stage="validate")
+
+            mark("parsed")
+            log.info("Parsed story", title=story.title)
+
         except json.JSONDecodeError as e:
-            print(f"[ERROR] Invalid JSON: {e}", flush=True)
-            print(f"Response: {response_text[:500]}", flush=True)
+            STORY_PARSE_FAILURES.inc(reason="json")
+            log.error("Invalid JSON", error=str(e), response=response_text[:500])
             raise Exception(f"Model returned invalid JSON: {str(e)}")
+        except ValidationError as e:
+            error = e.errors()[0]
+            if error["type"] == "json_invalid":
+                STORY_PARSE_FAILURES.inc(reason="json")
+                log.error("Invalid JSON", error=error["msg"], response=response_text[:500])
+                raise Exception(f"Model returned invalid JSON: {error['msg']}")
+            STORY_PARSE_FAILURES.inc(reason="schema")
+            location = ".".join(str(part) for part in error["loc"]) or "story"
+            log.error("Invalid story tree", error=str(e))
+            raise Exception(f"Model returned an invalid story: {location}: {error['msg']}")
         except Exception as e:
-            print(f"[ERROR] Generation failed: {e}", flush=True)
+            STORY_PARSE_FAILURES.inc(reason="structure")
+            log.error("Generation failed", error=str(e))
             raise Exception(f"Failed to generate story: {str(e)}")
 
-        # Save to database
-        story_db = Story(title=story_data["title"], session_id=session_id)
+        return story
+
+    @classmethod
+    def _save_story(
+            cls,
+            db: Session,
+            session_id: str,
+            story_tree: StoryLLMResponse,
+            on_progress: Optional[ProgressCallback] = None
+    ) -> Story:
+        """Persist a validated story tree and commit"""
+        story_db = Story(title=story_tree.title, session_id=session_id)
         db.add(story_db)
         db.flush()
 
         try:
-            # Process the full tree recursively
-            node_count = {"count": 0}
-            root_node = cls._process_node(
-                db, 
-                story_db.id, 
-                story_data["rootNode"], 
-                is_root=True,
-                node_count=node_count
-            )
-            
+            started = time.perf_counter()
+            storage = settings.STORY_STORAGE
+            rows = None
+
+            if storage == "blob":
+                # Node ids only need to be unique within the blob
+                mode = "blob"
+                rows = cls._flatten_tree(story_tree.rootNode)
+                cls._assign_node_ids(rows, list(range(1, len(rows) + 1)))
+            else:
+                mode = "bulk"
+                if settings.BULK_PERSIST:
+                    rows = cls._persist_tree_bulk(db, story_db.id, story_tree.rootNode)
+
+                if rows is None:
+                    # Process the full tree recursively
+                    mode = "recursive"
+                    cls._process_node(
+                        db, 
+                        story_db.id, 
+                        story_tree.rootNode,
+                        is_root=True,
+                        node_count={"count": 0}
+                    )
+                    db.flush()
+                    rows = [
+                        node_to_dict(node)
+                        for node in db.query(StoryNode).filter(StoryNode.story_id == story_db.id)
+                    ]
+
+            if storage in ("blob", "both"):
+                story_db.tree_blob = encode_tree(rows)
+                story_db.tree_format = FORMAT_VERSION
+                if storage == "both":
+                    mode += "+blob"
+
+            cls.record_tree_stats(story_db, rows)
+            node_count = len(rows)
+            mark("persisted")
+            if on_progress:
+                on_progress(story_db.id, node_count)
             db.commit()
-            print(f"[StoryGen] Success! Created {node_count['count']}-node story", flush=True)
-            
+            mark("committed")
+            persist_ms = (time.perf_counter() - started) * 1000
+            STORY_PERSIST_SECONDS.observe(persist_ms / 1000, mode=mode)
+            STORY_NODES.observe(node_count)
+            log.info("Created story", story_id=story_db.id, nodes=node_count, persist=mode, ms=round(persist_ms, 1))
+
         except Exception as e:
-            print(f"[ERROR] DB save failed: {e}", flush=True)
+            log.error("DB save failed", error=str(e))
             db.rollback()
             raise Exception(f"Failed to save story: {str(e)}")
 
         return story_db
 
     @classmethod
-    def _process_node(cls, db: Session, story_id: int, node_data: dict, is_root: bool = False, node_count: dict = None) -> StoryNode:
+    def copy_story(cls, db: Session, story_id: int, session_id: str) -> Optional[Story]:
+        """Give `session_id` its own copy of a finished story and commit. None if it's gone."""
+        source = db.query(Story).filter(Story.id == story_id).first()
+        if source is None:
+            return None
+
+        story_db = Story(session_id=session_id, **{
+            column: getattr(source, column) for column in COPIED_STORY_COLUMNS
+        })
+        db.add(story_db)
+        db.flush()
+
+        rows = [
+            node_to_dict(node)
+            for node in db.query(StoryNode).filter(StoryNode.story_id == story_id).order_by(StoryNode.id)
+        ]
+        node_ids = cls._allocate_node_ids(db, len(rows)) if rows else []
+        if node_ids is None:
+            # Let the database number the nodes, then point the options at them
+            nodes = [
+                StoryNode(
+                    story_id=story_db.id, content=row["content"], is_root=row["is_root"],
+                    is_ending=row["is_ending"], is_winning_ending=row["is_winning_ending"]
+                )
+                for row in rows
+            ]
+            db.add_all(nodes)
+            db.flush()
+            node_ids = [node.id for node in nodes]
+        else:
+            nodes = None
+
+        new_ids = {row["id"]: node_id for row, node_id in zip(rows, node_ids)}
+        for row in rows:
+            row["id"] = new_ids[row["id"]]
+            row["story_id"] = story_db.id
+            row["options"] = [
+                {**option, "node_id": new_ids.get(option.get("node_id"))} for option in row["options"] or []
+            ]
+        if nodes is not None:
+            for node, row in zip(nodes, rows):
+                node.options = row["options"]
+        elif rows:
+            db.execute(insert(StoryNode), rows)
+
+        db.commit()
+        log.info("Copied story", story_id=story_id, copy_id=story_db.id, nodes=len(rows))
+        return story_db
+
+    @classmethod
+    def record_tree_stats(cls, story: Story, rows: List[dict]):
+        """Store the tree's shape metadata on the story row (committed with it)"""
+        for column, value in tree_stats(rows).items():
+            setattr(story, column, value)
+
+    @classmethod
+    def _persist_tree_bulk(cls, db: Session, story_id: int, root_node: StoryNodeLLM) -> Optional[List[dict]]:
+        """Write every node of the tree in one batched INSERT.
+
+        Node IDs are assigned before the insert so that each row's options can
+        point at its children straight away. Returns the inserted rows, or None
+        when the database can't hand out IDs up front (caller falls back to the
+        recursive path).
+        """
+        rows = cls._flatten_tree(root_node)
+        node_ids = cls._allocate_node_ids(db, len(rows))
+        if node_ids is None:
+            return None
+
+        cls._assign_node_ids(rows, node_ids)
+        for row in rows:
+            row["story_id"] = story_id
+
+        db.execute(insert(StoryNode), rows)
+        return rows
+
+    @classmethod
+    def _assign_node_ids(cls, rows: List[dict], node_ids: List[int]):
+        """Give flattened rows their ids and point options at them"""
+        for row, node_id in zip(rows, node_ids):
+            row["id"] = node_id
+        for row in rows:
+            for option in row["options"]:
+                option["node_id"] = node_ids[option["node_id"]]
+
+    @classmethod
+    def _flatten_tree(cls, root_node: StoryNodeLLM) -> List[dict]:
+        """Flatten the validated tree into pre-order rows; option node_ids are row indexes.
+
+        StoryLLMResponse has already applied the node limit.
+        """
+        rows = []
+
+        def visit(node: StoryNodeLLM, is_root: bool) -> int:
+            index = len(rows)
+            row = {
+                "content": node.content,
+                "is_root": is_root,
+                "is_ending": node.isEnding,
+                "is_winning_ending": node.isWinningEnding,
+                "options": [],
+            }
+            rows.append(row)
+
+            if not node.isEnding and node.options:
+                for option in node.options:
+                    child_index = visit(option.nextNode, False)
+                    row["options"].append({"text": option.text, "node_id": child_index})
+            return index
+
+        visit(root_node, True)
+        return rows
+
+    @classmethod
+    def _allocate_node_ids(cls, db: Session, count: int) -> Optional[List[int]]:
+        """Reserve `count` story_nodes IDs in a single round-trip"""
+        dialect = db.get_bind().dialect.name
+
+        if dialect == "postgresql":
+            result = db.execute(
+                text("SELECT nextval(pg_get_serial_sequence('story_nodes', 'id')) FROM generate_series(1, :n)"),
+                {"n": count}
+            )
+            return sorted(result.scalars().all())
+
+        if dialect == "sqlite":
+            # The story INSERT above already holds SQLite's write lock, so
+            # nobody else can insert nodes until we commit.
+            start = db.execute(select(func.coalesce(func.max(StoryNode.id), 0))).scalar_one()
+            return list(range(start + 1, start + 1 + count))
+
+        return None
+
+    @classmethod
+    def _process_node(cls, db: Session, story_id: int, node_data: StoryNodeLLM, is_root: bool = False, node_count: dict = None) -> StoryNode:
         """Recursively process story nodes"""
         if node_count is None:
             node_count = {"count": 0}
         
+        # The node limit was already applied by StoryLLMResponse
         node_count["count"] += 1
         
-        # Safety check
-        if node_count["count"] > 15:
-            print(f"[WARNING] Hit node limit", flush=True)
-            node_data["isEnding"] = True
-            node_data["options"] = []
-        
         # Create node
         node = StoryNode(
             story_id=story_id,
-            content=node_data.get("content", ""),
+            content=node_data.content,
             is_root=is_root,
-            is_ending=node_data.get("isEnding", False),
-            is_winning_ending=node_data.get("isWinningEnding", False),
+            is_ending=node_data.isEnding,
+            is_winning_ending=node_data.isWinningEnding,
             options=[]
         )
         db.add(node)
         db.flush()
         
         # Process children recursively
-        if not node.is_ending and "options" in node_data and node_data["options"]:
+        if not node.is_ending and node_data.options:
             options_list = []
             
-            for option in node_data["options"]:
-                next_node_data = option.get("nextNode", {})
+            for option in node_data.options:
+                next_node_data = option.nextNode
                 
                 # Recursively process child
                 child_node = cls._process_node(
@@ -220,7 +938,7 @@ Rules:
                 )
                 
                 options_list.append({
-                    "text": option.get("text", "Continue"),
+                    "text": option.text,
                     "node_id": child_node.id
                 })
             
@@ -231,27 +949,121 @@ Rules:
 
     @classmethod
     def _extract_json(cls, text: str) -> str:
-        """Extract JSON from response"""
-        text = text.strip()
-        
-        # Remove markdown
-        if "```" in text:
-            text = text.replace("```json", "").replace("```", "").strip()
-        
-        # Find JSON
-        if not text.startswith('{'):
-            start = text.find('{')
-            if start != -1:
-                text = text[start:]
-        
-        # Find closing brace
-        brace_count = 0
-        for i, char in enumerate(text):
-            if char == '{':
-                brace_count += 1
-            elif char == '}':
-                brace_count -= 1
-                if brace_count == 0:
-                    return text[:i+1]
-        
-        return text
\ No newline at end of file
+        """Extract JSON from response (see backend/core/json_repair.py)"""
+        return extract_json(text).text
+
+    @classmethod
+    def _drop_incomplete_branches(cls, node_data) -> bool:
+        """Prune options whose subtree was lost to truncation.
+
+        Returns False if `node_data` itself is unusable. A non-ending node
+        left without options becomes a (losing) ending.
+        """
+        if not isinstance(node_data, dict) or not isinstance(node_data.get("content"), str):
+            return False
+
+        options = node_data.get("options")
+        kept = [
+            option for option in (options if isinstance(options, list) else [])
+            if isinstance(option, dict) and cls._drop_incomplete_branches(option.get("nextNode"))
+        ]
+        node_data["options"] = kept
+        if not kept and not node_data.get("isEnding"):
+            node_data["isEnding"] = True
+            node_data["isWinningEnding"] = False
+        return True
+
+
+class _StreamingStoryWriter:
+    """Writes nodes reported by StoryStreamParser, committing as it goes"""
+
+    def __init__(self, db: Session, session_id: str, on_progress: Optional[ProgressCallback] = None):
+        self.db = db
+        self.session_id = session_id
+        self.on_progress = on_progress
+        self.story: Optional[Story] = None
+        self.rows = {}
+        self.skipped = set()
+        self.count = 0
+
+    def apply(self, parser: StoryStreamParser, events: List[tuple]):
+        for kind, node in events:
+            if kind == "start":
+                self._insert(parser, node)
+            elif node.index in self.rows and node.index not in self.skipped:
+                self._update(node)
+
+        if self.story is None:
+            return
+        if self.on_progress:
+            self.on_progress(self.story.id, self.count)
+        self.db.commit()
+
+    def finish(self, parser: StoryStreamParser) -> Story:
+        # The same tree rules as every other path (dead ends, winning
+        # non-endings, depth); raises before anything is committed
+        StoryLLMResponse.model_validate(parser.result)
+        self.story.title = parser.title
+        self.story.is_complete = True
+        rows = [node_to_dict(row) for row in self.rows.values()]
+        StoryGenerator.record_tree_stats(self.story, rows)
+        if settings.STORY_STORAGE in ("blob", "both"):
+            # Nodes were already written for progressive reads; add the blob too
+            self.story.tree_blob = encode_tree(rows)
+            self.story.tree_format = FORMAT_VERSION
+        mark("persisted")
+        self.db.commit()
+        mark("committed")
+        return self.story
+
+    def discard(self):
+        """Remove whatever was written for a stream that failed"""
+        self.db.rollback()
+        if self.story is not None and inspect(self.story).persistent:
+            story_id = self.story.id
+            self.db.query(StoryNode).filter(StoryNode.story_id == story_id).delete()
+            self.db.query(Story).filter(Story.id == story_id).delete()
+            if self.on_progress:
+                # Its id was already published; take it back with the delete
+                self.on_progress(None, 0)
+            self.db.commit()
+        self.story = None
+
+    def _insert(self, parser: StoryStreamParser, node: StreamNode):
+        if node.parent is not None and node.parent in self.skipped:
+            self.skipped.add(node.index)
+            return
+
+        if self.story is None:
+            self.story = Story(title=parser.title or "Untitled", session_id=self.session_id, is_complete=False)
+            self.db.add(self.story)
+            self.db.flush()
+
+        self.count += 1
+        truncated = self.count > MAX_STORY_NODES
+        if truncated:
+            # Keep the node as an ending but drop everything below it
+            log.warning("Hit node limit", nodes=self.count)
+            self.skipped.add(node.index)
+
+        row = StoryNode(
+            story_id=self.story.id,
+            content=node.content,
+            is_root=node.parent is None,
+            is_ending=node.is_ending or truncated,
+            is_winning_ending=node.is_winning_ending,
+            options=[]
+        )
+        self.db.add(row)
+        self.db.flush()
+        self.rows[node.index] = row
+
+        if node.parent is not None:
+            parent = self.rows[node.parent]
+            parent.options = parent.options + [{"text": node.option_text, "node_id": row.id}]
+
+    def _update(self, node: StreamNode):
+        row = self.rows[node.index]
+        row.content = node.content
+        row.is_ending = node.is_ending
+        row.is_winning_ending = node.is_winning_ending
@@ -0,0 +1,89 @@
+"""
+Fast JSON bodies for GET /stories/{id}/complete.
+
+Nodes go straight from database rows (or the decoded tree blob) into plain
+dicts and through orjson, with no per-node pydantic models and no second
+validation of the options. The body lists every node once in `all_nodes`
+and points at the opening with `root_node_id`:
+
+    {"id": 7, "title": "...", "created_at": "...",
+     "root_node_id": 41,
+     "all_nodes": {"41": {"id": 41, "content": "...", "is_ending": false,
+                          "is_winning_ending": false,
+                          "options": [{"text": "...", "node_id": 42}]}, ...}}
+
+With STORY_RESPONSE_LEGACY_SHAPE the root is also inlined as `root_node`
+(and `root_node_id` left out), the shape clients read before.
+
+orjson is optional; without it pydantic-core, which pydantic already
+installs, does the encoding.
+"""
+
+from typing import Iterable, List, Optional, Tuple
+
+from backend.core.story_codec import decode_tree
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - depends on the environment
+    orjson = None
+
+if orjson is not None:
+    def dumps(value) -> bytes:
+        return orjson.dumps(value)
+else:
+    from pydantic_core import to_json as dumps
+
+JSON_BACKEND = "orjson" if orjson is not None else "pydantic-core"
+
+
+def node_rows_from_blob(blob: bytes, version: int) -> List[tuple]:
+    """(id, content, is_root, is_ending, is_winning_ending, options) per node of a tree blob"""
+    return [
+        (node["id"], node["content"], node["is_root"], node["is_ending"], node["is_winning_ending"], node["options"])
+        for node in decode_tree(blob, version)
+    ]
+
+
+def complete_story_body(
+        story: Tuple[int, str, object],
+        node_rows: Iterable[tuple],
+        legacy: bool = False
+) -> Optional[bytes]:
+    """Serialize a story from its (id, title, created_at) and node rows.
+
+    Node rows are (id, content, is_root, is_ending, is_winning_ending, options)
+    with options already in the stored {"text", "node_id"} form. Returns None
+    when no node is the root.
+    """
+    all_nodes = {}
+    root = None
+    for node_id, content, is_root, is_ending, is_winning_ending, options in node_rows:
+        node = {
+            "id": node_id,
+            "content": content,
+            "is_ending": bool(is_ending),
+            "is_winning_ending": bool(is_winning_ending),
+            "options": options or [],
+        }
+        # JSON object keys are strings; say so up front instead of per dump
+        all_nodes[str(node_id)] = node
+        if is_root:
+            root = node
+    if root is None:
+        return None
+
+    # No session_id: the body is public and cached, and a session id is a
+    # bearer credential for the player's history
+    story_id, title, created_at = story
+    body = {
+        "id": story_id,
+        "title": title,
+        "created_at": created_at,
+    }
+    if legacy:
+        body["root_node"] = root
+    else:
+        body["root_node_id"] = root["id"]
+    body["all_nodes"] = all_nodes
+    return dumps(body)
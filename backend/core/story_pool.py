@@ -0,0 +1,222 @@
+import asyncio
+import threading
+import time
+from contextlib import asynccontextmanager
+from typing import Dict, Optional
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from backend.core.cache import complete_story_cache
+from backend.core.config import settings
+from backend.core.log import get_logger
+from backend.core.story_generator import StoryGenerator
+from backend.db.database import SessionLocal, advisory_lock
+from backend.models.story import Story
+
+log = get_logger("StoryPool")
+
+# pg_advisory_xact_lock key held by whichever process is refilling the pool
+REFILL_LOCK_ID = 0x53544F52  # "STOR"
+
+
+def normalize_theme(theme: str) -> str:
+    return " ".join(theme.lower().split())
+
+
+class StoryPool:
+    """Warm pool of completed, unassigned stories for popular themes.
+
+    Pooled stories are ordinary Story rows with session_id unset and
+    pool_theme set. claim() hands one to a player in a single transaction;
+    the refill worker keeps each theme topped up to POOL_TARGET_DEPTH. It
+    runs in the queue worker (JOB_QUEUE=database) or, without one, in the
+    API; on Postgres an advisory lock lets only one process refill at a time.
+    """
+
+    # How often claim() retries when another request takes the same row
+    CLAIM_ATTEMPTS = 3
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.refills = 0
+        self.refill_failures = 0
+        # Themes below target depth, and since when (monotonic)
+        self._short_since: Dict[str, float] = {}
+        self._last_refill_lag: Dict[str, float] = {}
+        self._wake: Optional[asyncio.Event] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def claim(self, db: Session, theme: str, session_id: str) -> Optional[Story]:
+        """Assign a pooled story to `session_id`, or None if the pool is empty.
+
+        The row is locked with FOR UPDATE SKIP LOCKED on Postgres, and the
+        UPDATE only matches while pool_theme is still set, so two requests can
+        never claim the same story (SQLite has no row locks). Flushes but does
+        not commit, so the caller can commit its job row in the same
+        transaction.
+        """
+        theme = normalize_theme(theme)
+        if theme not in settings.POOL_THEMES:
+            return None
+
+        for _ in range(self.CLAIM_ATTEMPTS):
+            candidate = (
+                db.query(Story.id)
+                .filter(Story.pool_theme == theme)
+                .order_by(Story.id)
+                .limit(1)
+                .with_for_update(skip_locked=True)
+                .scalar()
+            )
+            if candidate is None:
+                break
+
+            claimed = (
+                db.query(Story)
+                .filter(Story.id == candidate, Story.pool_theme == theme)
+                .update(
+                    {"pool_theme": None, "session_id": session_id, "created_at": func.now()},
+                    synchronize_session=False
+                )
+            )
+            if claimed:
+                # Its owner and created_at just changed; never serve a body
+                # cached before the claim
+                complete_story_cache.invalidate(candidate)
+                with self._lock:
+                    self.hits += 1
+                self._poke()
+                return db.get(Story, candidate)
+
+        with self._lock:
+            self.misses += 1
+        self._poke()
+        return None
+
+    def depths(self, db: Session) -> Dict[str, int]:
+        rows = (
+            db.query(Story.pool_theme, func.count(Story.id))
+            .filter(Story.pool_theme.isnot(None))
+            .group_by(Story.pool_theme)
+            .all()
+        )
+        depths = {theme: 0 for theme in settings.POOL_THEMES}
+        depths.update({theme: count for theme, count in rows})
+        return depths
+
+    def stats(self, db: Session) -> dict:
+        now = time.monotonic()
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "themes": settings.POOL_THEMES,
+                "target_depth": settings.POOL_TARGET_DEPTH,
+                "depth": self.depths(db),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else None,
+                "refills": self.refills,
+                "refill_failures": self.refill_failures,
+                "refill_lag_seconds": {
+                    theme: round(now - since, 3) for theme, since in self._short_since.items()
+                },
+                "last_refill_lag_seconds": {
+                    theme: round(lag, 3) for theme, lag in self._last_refill_lag.items()
+                },
+            }
+
+    async def refill_once(self):
+        """Generate stories for every theme that is below target depth"""
+        async with self._refill_lock() as acquired:
+            if not acquired:
+                log.info("Another process is refilling the pool")
+                return
+            await self._refill()
+
+    @asynccontextmanager
+    async def _refill_lock(self):
+        """Hold REFILL_LOCK_ID for the refill (see database.advisory_lock).
+
+        The lock's connection stays checked out, idle in its transaction,
+        until the refill is done; it is taken and released on a worker
+        thread so the event loop never waits on the database.
+        """
+        lock = advisory_lock(REFILL_LOCK_ID)
+        acquired = await run_in_threadpool(lock.__enter__)
+        try:
+            yield acquired
+        finally:
+            await run_in_threadpool(lock.__exit__, None, None, None)
+
+    async def _refill(self):
+        db = SessionLocal()
+        try:
+            depths = await run_in_threadpool(self.depths, db)
+        finally:
+            db.close()
+
+        now = time.monotonic()
+        pending = []
+        for theme in settings.POOL_THEMES:
+            missing = settings.POOL_TARGET_DEPTH - depths.get(theme, 0)
+            with self._lock:
+                if missing <= 0:
+                    since = self._short_since.pop(theme, None)
+                    if since is not None:
+                        self._last_refill_lag[theme] = now - since
+                    continue
+                self._short_since.setdefault(theme, now)
+            pending.extend([theme] * missing)
+
+        semaphore = asyncio.Semaphore(settings.POOL_REFILL_CONCURRENCY)
+
+        async def generate(theme: str):
+            async with semaphore:
+                await self._generate_pooled(theme)
+
+        await asyncio.gather(*(generate(theme) for theme in pending))
+
+    async def run_refill_worker(self):
+        """Keep the pool topped up until cancelled"""
+        self._loop = asyncio.get_running_loop()
+        self._wake = asyncio.Event()
+        log.info("Refill worker started", themes=settings.POOL_THEMES)
+        while True:
+            try:
+                await self.refill_once()
+            except Exception as e:
+                log.error("Refill failed", error=str(e))
+            self._wake.clear()
+            try:
+                await asyncio.wait_for(self._wake.wait(), settings.POOL_REFILL_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _generate_pooled(self, theme: str):
+        db = SessionLocal()
+
+        def mark_pooled(story_id: int, nodes_ready: int):
+            db.get(Story, story_id).pool_theme = theme
+
+        try:
+            await StoryGenerator.generate_story_async(db, None, theme, on_progress=mark_pooled)
+            with self._lock:
+                self.refills += 1
+        except Exception as e:
+            log.error("Could not generate pooled story", theme=theme, error=str(e))
+            with self._lock:
+                self.refill_failures += 1
+        finally:
+            db.close()
+
+    def _poke(self):
+        """Wake the refill worker after the pool was drawn from (thread-safe)"""
+        if self._loop is not None and self._wake is not None and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._wake.set)
+
+
+story_pool = StoryPool()
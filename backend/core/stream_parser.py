@@ -0,0 +1,209 @@
+import json
+from dataclasses import dataclass
+from typing import Any, List, Optional, Tuple
+
+
+@dataclass
+class StreamNode:
+    """A story node seen in the token stream"""
+    index: int
+    parent: Optional[int] = None
+    option_text: str = "Continue"
+    content: str = ""
+    is_ending: bool = False
+    is_winning_ending: bool = False
+
+
+@dataclass
+class _Frame:
+    kind: str  # "object" or "array"
+    value: Any
+    role: Optional[str] = None  # "node", "options" or "option"
+    node: Optional[StreamNode] = None
+    key: Optional[str] = None
+    expect_key: bool = True
+    started: bool = False
+
+
+_LITERAL_CHARS = set("0123456789+-.eEtruefalsn")
+_ESCAPES = {'"': '"', "\\": "\\", "/": "/", "b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t"}
+
+
+class StoryStreamParser:
+    """Incremental parser for the story JSON as it streams from the model.
+
+    Feed it text chunks in order; each call returns the events the chunk
+    completed:
+
+    - ("start", node): the node's own fields are known (its "options" key was
+      reached, or the object closed). Parents always start before children, so
+      the root is reported after only a few dozen tokens.
+    - ("done", node): the node's object closed, with its final fields.
+
+    Text before the first "{" (prose, markdown fences) and after the top-level
+    object closes is ignored.
+    """
+
+    def __init__(self):
+        self.title: Optional[str] = None
+        self.nodes: List[StreamNode] = []
+        self.done = False
+        self.result: Optional[dict] = None
+
+        self._stack: List[_Frame] = []
+        self._events: List[Tuple[str, StreamNode]] = []
+        self._string: Optional[List[str]] = None
+        self._string_is_key = False
+        self._escape = False
+        self._unicode: Optional[str] = None
+        self._literal: Optional[List[str]] = None
+
+    def feed(self, chunk: str) -> List[Tuple[str, StreamNode]]:
+        self._events = []
+        for char in chunk:
+            if self.done:
+                break
+            self._step(char)
+        return self._events
+
+    @property
+    def root_ready(self) -> bool:
+        return bool(self.nodes)
+
+    def _step(self, char: str):
+        if self._string is not None:
+            self._step_string(char)
+            return
+
+        if self._literal is not None:
+            if char in _LITERAL_CHARS:
+                self._literal.append(char)
+                return
+            literal = "".join(self._literal)
+            self._literal = None
+            try:
+                self._add_value(json.loads(literal))
+            except json.JSONDecodeError:
+                raise ValueError(f"Invalid literal in stream: {literal!r}")
+
+        if not self._stack:
+            # Still looking for the top-level object
+            if char == "{":
+                self._open("object")
+            return
+
+        if char.isspace():
+            return
+        if char == "{":
+            self._open("object")
+        elif char == "[":
+            self._open("array")
+        elif char in "}]":
+            self._close()
+        elif char == '"':
+            frame = self._stack[-1]
+            self._string = []
+            self._string_is_key = frame.kind == "object" and frame.expect_key
+        elif char == ",":
+            self._stack[-1].expect_key = True
+        elif char == ":":
+            self._stack[-1].expect_key = False
+        elif char in _LITERAL_CHARS:
+            self._literal = [char]
+        else:
+            raise ValueError(f"Unexpected character in stream: {char!r}")
+
+    def _step_string(self, char: str):
+        if self._unicode is not None:
+            self._unicode += char
+            if len(self._unicode) == 4:
+                self._string.append(chr(int(self._unicode, 16)))
+                self._unicode = None
+        elif self._escape:
+            self._escape = False
+            if char == "u":
+                self._unicode = ""
+            else:
+                self._string.append(_ESCAPES.get(char, char))
+        elif char == "\\":
+            self._escape = True
+        elif char == '"':
+            value = "".join(self._string)
+            self._string = None
+            if self._string_is_key:
+                self._set_key(value)
+            else:
+                self._add_value(value)
+        else:
+            self._string.append(char)
+
+    def _open(self, kind: str):
+        parent = self._stack[-1] if self._stack else None
+        frame = _Frame(kind=kind, value={} if kind == "object" else [])
+
+        if parent is None:
+            pass
+        elif kind == "object" and parent.kind == "object" and parent.key in ("rootNode", "nextNode"):
+            if parent.key == "rootNode" and len(self._stack) == 1:
+                frame.role = "node"
+                frame.node = StreamNode(index=-1)
+            elif parent.key == "nextNode" and parent.role == "option":
+                frame.role = "node"
+                frame.node = StreamNode(
+                    index=-1,
+                    parent=parent.node.index,
+                    option_text=str(parent.value.get("text", "Continue")),
+                )
+        elif kind == "array" and parent.role == "node" and parent.key == "options":
+            frame.role = "options"
+            frame.node = parent.node
+        elif kind == "object" and parent.role == "options":
+            frame.role = "option"
+            frame.node = parent.node
+
+        self._stack.append(frame)
+
+    def _close(self):
+        frame = self._stack.pop()
+        if frame.role == "node":
+            self._start_node(frame)
+            self._read_fields(frame)
+            self._events.append(("done", frame.node))
+
+        if not self._stack:
+            self.done = True
+            self.result = frame.value
+            return
+        self._add_value(frame.value)
+
+    def _set_key(self, key: str):
+        frame = self._stack[-1]
+        frame.key = key
+        frame.expect_key = False
+        if frame.role == "node" and key == "options":
+            self._start_node(frame)
+
+    def _add_value(self, value: Any):
+        frame = self._stack[-1]
+        if frame.kind == "array":
+            frame.value.append(value)
+            return
+        frame.value[frame.key] = value
+        if len(self._stack) == 1 and frame.key == "title":
+            self.title = str(value)
+
+    def _start_node(self, frame: _Frame):
+        if frame.started:
+            return
+        frame.started = True
+        frame.node.index = len(self.nodes)
+        self._read_fields(frame)
+        self.nodes.append(frame.node)
+        self._events.append(("start", frame.node))
+
+    @staticmethod
+    def _read_fields(frame: _Frame):
+        node = frame.node
+        node.content = str(frame.value.get("content", ""))
+        node.is_ending = bool(frame.value.get("isEnding", False))
+        node.is_winning_ending = bool(frame.value.get("isWinningEnding", False))
@@ -0,0 +1,101 @@
+"""
+Per-job span timelines for latency forensics.
+
+run_story_job() opens a JobTimeline for each attempt. Code further down the
+pipeline calls `mark("...")` without knowing about jobs: the timeline
+travels in a context variable, which asyncio tasks and run_in_threadpool
+both inherit. Outside a job (the warm pool, benchmarks) `mark()` does
+nothing.
+
+The finished timeline is stored on StoryJob.timeline as
+    {"attempt": 2, "outcome": "completed",
+     "events": [["queued", -1520.3], ["started", 0.0], ["llm_request", 3.1], ...],
+     "tokens": {"prompt": 812, "completion": 1630}}
+with event times in ms relative to the attempt's start.
+"""
+
+import time
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+
+# Events recorded by the pipeline, in the order they normally happen
+EVENTS = (
+    "queued", "started", "llm_request", "llm_retry", "llm_response", "llm_first_token",
+    "llm_done", "parsed", "persisted", "committed",
+)
+
+# (phase, from event, to event); "first"/"last" pick among repeated events
+PHASES = (
+    ("queue", ("queued", "first"), ("started", "first")),
+    ("llm_wait_first_token", ("llm_request", "first"), ("llm_first_token", "first")),
+    ("llm", ("llm_request", "first"), ("llm_done", "last")),
+    ("parse", ("llm_done", "last"), ("parsed", "last")),
+    ("persist", ("parsed", "last"), ("persisted", "last")),
+    ("commit", ("persisted", "last"), ("committed", "last")),
+    ("total", ("queued", "first"), ("committed", "last")),
+)
+
+
+class JobTimeline:
+    def __init__(self, attempt: int = 1):
+        self.attempt = attempt
+        self.origin = time.perf_counter()
+        self.events: List[list] = []
+        self.tokens: Dict[str, int] = {}
+
+    def elapsed_ms(self) -> float:
+        return (time.perf_counter() - self.origin) * 1000
+
+    def mark(self, event: str, offset_ms: Optional[float] = None):
+        if offset_ms is None:
+            offset_ms = self.elapsed_ms()
+        self.events.append([event, round(offset_ms, 1)])
+
+    def add_tokens(self, prompt: int, completion: int):
+        self.tokens["prompt"] = self.tokens.get("prompt", 0) + prompt
+        self.tokens["completion"] = self.tokens.get("completion", 0) + completion
+
+    def to_dict(self, outcome: str) -> dict:
+        return {
+            "attempt": self.attempt,
+            "outcome": outcome,
+            "events": sorted(self.events, key=lambda event: event[1]),
+            "tokens": self.tokens,
+        }
+
+
+current_timeline: ContextVar[Optional[JobTimeline]] = ContextVar("current_timeline", default=None)
+
+
+def mark(event: str):
+    timeline = current_timeline.get()
+    if timeline is not None:
+        timeline.mark(event)
+
+
+def add_tokens(prompt: int, completion: int):
+    timeline = current_timeline.get()
+    if timeline is not None:
+        timeline.add_tokens(prompt, completion)
+
+
+def phase_durations(timeline: dict) -> Dict[str, float]:
+    """Milliseconds per phase of a stored timeline (phases it lacks are skipped).
+
+    Streams mark llm_first_token and llm_done themselves; for plain calls the
+    response is the first token and the end of the call.
+    """
+    times: Dict[str, List[float]] = {}
+    for event, offset in timeline.get("events") or []:
+        times.setdefault(event, []).append(offset)
+    for alias in ("llm_first_token", "llm_done"):
+        if alias not in times and "llm_response" in times:
+            times[alias] = times["llm_response"]
+
+    durations = {}
+    for phase, (start, start_pick), (end, end_pick) in PHASES:
+        if start in times and end in times:
+            begin = times[start][0] if start_pick == "first" else times[start][-1]
+            finish = times[end][0] if end_pick == "first" else times[end][-1]
+            durations[phase] = round(finish - begin, 1)
+    return durations
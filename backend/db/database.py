@@ -1,26 +1,209 @@
-from sqlalchemy import create_engine
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from sqlalchemy import create_engine, event, exc, text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool, QueuePool, StaticPool
 
 from backend.core.config import settings
+from backend.core.log import get_logger
+from backend.core.metrics import DB_CHECKOUT_SECONDS
+
+log = get_logger("DB")
+
+# Checkout waits kept for percentiles
+CHECKOUT_WINDOW = 1000
+
+
+class PoolMetrics:
+    """Connection pool counters, fed by pool and engine events"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.checkout_wait_ms = deque(maxlen=CHECKOUT_WINDOW)
+        self.checkout_wait_max_ms = 0.0
+        self.checkout_failures = 0
+        self.connections_opened = 0
+        self.connections_invalidated = 0
+        self.pre_ping_failures = 0
+
+    def record_checkout(self, seconds: float, failed: bool = False):
+        ms = seconds * 1000
+        with self._lock:
+            if failed:
+                self.checkout_failures += 1
+                return
+            self.checkouts += 1
+            self.checkout_wait_ms.append(ms)
+            self.checkout_wait_max_ms = max(self.checkout_wait_max_ms, ms)
+
+    def count(self, counter: str):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def stats(self) -> dict:
+        with self._lock:
+            waits = sorted(self.checkout_wait_ms)
+            return {
+                "profile": DB_PROFILE,
+                "pool": engine.pool.status(),
+                "checkouts": self.checkouts,
+                "checkout_wait_ms_p50": round(waits[len(waits) // 2], 3) if waits else None,
+                "checkout_wait_ms_p95": round(waits[min(len(waits) - 1, int(len(waits) * 0.95))], 3) if waits else None,
+                "checkout_wait_ms_max": round(self.checkout_wait_max_ms, 3),
+                "checkout_failures": self.checkout_failures,
+                "connections_opened": self.connections_opened,
+                "connections_invalidated": self.connections_invalidated,
+                "pre_ping_failures": self.pre_ping_failures,
+            }
+
+
+pool_metrics = PoolMetrics()
+
+
+def _timed(pool_class):
+    """`pool_class` with checkouts (including waits and pre-pings) timed"""
+
+    class TimedPool(pool_class):
+        def connect(self):
+            started = time.perf_counter()
+            try:
+                connection = super().connect()
+            except Exception:
+                pool_metrics.record_checkout(time.perf_counter() - started, failed=True)
+                raise
+            elapsed = time.perf_counter() - started
+            pool_metrics.record_checkout(elapsed)
+            DB_CHECKOUT_SECONDS.observe(elapsed)
+            return connection
+
+    TimedPool.__name__ = f"Timed{pool_class.__name__}"
+    return TimedPool
+
+
+def engine_profile(url: str) -> str:
+    """DB_PROFILE, or for "auto": sqlite for SQLite URLs, serverless on Vercel, else server"""
+    if settings.DB_PROFILE != "auto":
+        return settings.DB_PROFILE
+    if url.startswith("sqlite"):
+        return "sqlite"
+    if os.getenv("VERCEL"):
+        return "serverless"
+    return "server"
 
-# For PostgreSQL, don't use check_same_thread
-connect_args = {}
-if "sqlite" in settings.DATABASE_URL:
-    connect_args = {"check_same_thread": False}
 
-engine = create_engine(
-    settings.DATABASE_URL,
-    connect_args=connect_args
-)
+def engine_options(profile: str, url: str) -> dict:
+    """create_engine() arguments for a profile.
+
+    serverless: no pool at all. Every session opens a fresh connection and
+        closes it after, so frozen function instances never hold stale
+        connections; point DATABASE_URL at a pgbouncer/Neon pooler endpoint.
+    server: a sized QueuePool for long-lived uvicorn/worker processes, with
+        pre-ping and recycling to survive idle timeouts on the server side.
+    sqlite: WAL journal for file databases (readers don't block the writer);
+        an in-memory database shares one connection across threads.
+    """
+    postgres = url.startswith(("postgres", "postgresql"))
+    connect_args = {"connect_timeout": settings.DB_CONNECT_TIMEOUT} if postgres else {}
+
+    if profile == "serverless":
+        if url.startswith("postgresql+psycopg:"):
+            # Transaction-mode pgbouncer can't keep server-side prepared statements
+            connect_args["prepare_threshold"] = None
+        return {"poolclass": _timed(NullPool), "connect_args": connect_args}
+
+    if profile == "sqlite":
+        connect_args = {"check_same_thread": False}
+        if ":memory:" in url or url in ("sqlite://", "sqlite:///"):
+            return {"poolclass": _timed(StaticPool), "connect_args": connect_args}
+        connect_args["timeout"] = settings.DB_SQLITE_BUSY_TIMEOUT
+
+    return {
+        "poolclass": _timed(QueuePool),
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": profile == "server",
+        "connect_args": connect_args,
+    }
+
+
+DB_PROFILE = engine_profile(settings.DATABASE_URL)
+engine = create_engine(settings.DATABASE_URL, **engine_options(DB_PROFILE, settings.DATABASE_URL))
+
+
+@event.listens_for(engine, "connect")
+def _on_connect(dbapi_connection, connection_record):
+    pool_metrics.count("connections_opened")
+    if DB_PROFILE == "sqlite" and ":memory:" not in settings.DATABASE_URL:
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.close()
+
+
+@event.listens_for(engine, "invalidate")
+def _on_invalidate(dbapi_connection, connection_record, exception):
+    pool_metrics.count("connections_invalidated")
+    # Checkout raises DisconnectionError when the pre-ping finds a dead connection
+    if isinstance(exception, exc.DisconnectionError):
+        pool_metrics.count("pre_ping_failures")
+
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
 def create_tables():
+    from backend.db.migrations import record_schema_version, upgrade_schema
+
     Base.metadata.create_all(bind=engine)
+    for change in upgrade_schema(engine):
+        log.info("Migrated", change=change)
+    record_schema_version(engine)
+
+def ensure_schema():
+    """Bring the schema up to date at start-up, as SCHEMA_MODE says.
+
+    "create" always runs create_tables(); "check" only runs it when the
+    stored schema fingerprint is missing or stale; "skip" trusts that
+    `python -m backend.manage migrate` ran at deploy time.
+    """
+    if settings.SCHEMA_MODE == "skip":
+        return
+    if settings.SCHEMA_MODE == "check":
+        from backend.db.migrations import schema_is_current
+
+        if schema_is_current(engine):
+            return
+    create_tables()
+
+@contextmanager
+def advisory_lock(lock_id: int):
+    """Yield whether this process holds the cluster-wide lock `lock_id`.
+
+    On Postgres this is pg_try_advisory_xact_lock on a connection of its
+    own, whose transaction stays open until the block exits: the lock goes
+    with that transaction, so it is released even if the process dies, and
+    behind PgBouncer in transaction pooling mode it can't be left on a
+    server connection another client gets next (a session-level lock can).
+    Other databases have a single process; the lock is always granted.
+    Blocking, so call it from a thread, not the event loop.
+    """
+    if engine.dialect.name != "postgresql":
+        yield True
+        return
+    with engine.connect() as conn:
+        with conn.begin():
+            yield conn.execute(text("SELECT pg_try_advisory_xact_lock(:id)"), {"id": lock_id}).scalar()
 
 def get_db():
+    # Sessions are cheap; the connection is only checked out on first use
     db = SessionLocal()
     try:
         yield db
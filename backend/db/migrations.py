@@ -0,0 +1,108 @@
+"""
+Additive schema migrations.
+
+create_all() only creates missing tables; it never touches tables that
+already exist. upgrade_schema() fills that gap by adding any column or index
+that the models define but the database lacks, so older deployments pick up
+new fields without a separate migration tool. Columns with a scalar default
+get it as a server default, which also backfills existing rows.
+
+After a successful upgrade the schema's fingerprint is stored in the
+schema_version table, so a later start-up can confirm the schema is current
+with one SELECT instead of inspecting every table (SCHEMA_MODE=check).
+"""
+
+import hashlib
+import json
+from typing import List
+
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, func, inspect, literal, select, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import SQLAlchemyError
+
+from backend.db.database import Base
+
+# Kept out of Base.metadata so it isn't part of its own fingerprint
+schema_version = Table(
+    "schema_version", MetaData(),
+    Column("id", Integer, primary_key=True),
+    Column("fingerprint", String(64), nullable=False),
+    Column("applied_at", DateTime(timezone=True), server_default=func.now()),
+)
+
+
+def _column_ddl(engine: Engine, table, column) -> str:
+    dialect = engine.dialect
+    preparer = dialect.identifier_preparer
+    ddl = (
+        f"ALTER TABLE {preparer.format_table(table)} "
+        f"ADD COLUMN {preparer.format_column(column)} {column.type.compile(dialect=dialect)}"
+    )
+    default = column.default
+    if default is not None and default.is_scalar:
+        value = literal(default.arg, column.type).compile(
+            dialect=dialect, compile_kwargs={"literal_binds": True}
+        )
+        ddl += f" DEFAULT {value}"
+    return ddl
+
+
+def upgrade_schema(engine: Engine) -> List[str]:
+    """Add missing columns and indexes to existing tables. Returns what was applied."""
+    inspector = inspect(engine)
+    applied = []
+
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+
+            existing_columns = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing_columns:
+                    conn.execute(text(_column_ddl(engine, table, column)))
+                    applied.append(f"{table.name}.{column.name}")
+
+            existing_indexes = {index["name"] for index in inspector.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name not in existing_indexes:
+                    index.create(conn)
+                    applied.append(f"index {index.name}")
+
+    return applied
+
+
+def schema_fingerprint() -> str:
+    """Hash of every table, column and index the models define"""
+    import backend.models.job  # noqa: F401 - make sure every table is registered
+    import backend.models.story  # noqa: F401
+
+    shape = [
+        [
+            table.name,
+            sorted(f"{column.name} {column.type}" for column in table.columns),
+            sorted(index.name for index in table.indexes),
+        ]
+        for table in sorted(Base.metadata.tables.values(), key=lambda table: table.name)
+    ]
+    return hashlib.sha256(json.dumps(shape).encode()).hexdigest()
+
+
+def schema_is_current(engine: Engine) -> bool:
+    """True if the stored fingerprint matches the models (one query)"""
+    try:
+        with engine.connect() as conn:
+            stored = conn.execute(
+                select(schema_version.c.fingerprint).where(schema_version.c.id == 1)
+            ).scalar()
+    except SQLAlchemyError:
+        return False  # no schema_version table yet
+    return stored == schema_fingerprint()
+
+
+def record_schema_version(engine: Engine):
+    fingerprint = schema_fingerprint()
+    with engine.begin() as conn:
+        schema_version.create(conn, checkfirst=True)
+        conn.execute(schema_version.delete())
+        conn.execute(schema_version.insert().values(id=1, fingerprint=fingerprint))
@@ -1,11 +1,19 @@
+import asyncio
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 
 from backend.core.config import settings
-from backend.routers import story, job
-from backend.db.database import create_tables
+from backend.core.metrics import CallbackCounter, Gauge, MetricsMiddleware, render_metrics
+from backend.routers import admin, story, job
+from backend.db.database import ensure_schema, pool_metrics
+from backend.core.story_generator import StoryGenerator
+from backend.core.rate_limiter import groq_scheduler
+from backend.core.story_pool import story_pool
+from backend.core.job_maintenance import job_maintenance
 
-create_tables()
+ensure_schema()
 
 app = FastAPI(
     title="Choose Your Own Adventure Game API",
@@ -26,8 +34,37 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+app.add_middleware(MetricsMiddleware)
+
 app.include_router(story.router, prefix=settings.API_PREFIX)
 app.include_router(job.router, prefix=settings.API_PREFIX)
+app.include_router(admin.router, prefix=settings.API_PREFIX)
+
+
+background_workers = []
+
+
+@app.on_event("startup")
+async def start_background_workers():
+    # With the database queue the worker refills the pool instead
+    if settings.POOL_THEMES and settings.JOB_QUEUE == "background":
+        background_workers.append(asyncio.create_task(story_pool.run_refill_worker()))
+    # No worker to sweep stuck and expired jobs either (serverless); opt-in,
+    # since every instance schedules it
+    if (
+        settings.JOB_MAINTENANCE_IN_API and settings.JOB_QUEUE == "background"
+        and settings.JOB_MAINTENANCE_INTERVAL > 0
+    ):
+        background_workers.append(asyncio.create_task(job_maintenance.run_periodic()))
+
+
+@app.on_event("shutdown")
+async def stop_background_workers():
+    for worker in background_workers:
+        worker.cancel()
+    await asyncio.gather(*background_workers, return_exceptions=True)
+    background_workers.clear()
+    await StoryGenerator.close_async_client()
 
 
 @app.get("/")
@@ -45,6 +82,34 @@ def health():
     return {"status": "healthy", "api": "groq"}
 
 
+@app.get("/health/groq")
+def groq_health():
+    """Groq scheduler queue depth, throttling and retry counters"""
+    return groq_scheduler.stats()
+
+
+Gauge(
+    "pathedplay_groq_queue_depth", "Groq calls waiting for admission",
+    lambda: {(): groq_scheduler.queue_depth},
+)
+CallbackCounter(
+    "pathedplay_db_connections_opened_total", "Database connections opened by this process",
+    lambda: {(): pool_metrics.connections_opened},
+)
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    """Prometheus text exposition of this process's counters and histograms"""
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/health/db")
+def db_health():
+    """Engine profile, pool status, checkout wait times and connection churn"""
+    return pool_metrics.stats()
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
\ No newline at end of file
@@ -0,0 +1,155 @@
+"""
+Maintenance commands.
+
+Run from the project root:
+    python -m backend.manage migrate
+    python -m backend.manage backfill-blobs [--batch-size 200] [--drop-nodes]
+    python -m backend.manage backfill-stats [--batch-size 200]
+    python -m backend.manage maintain-jobs [--retention-mode archive|delete] [--no-requeue]
+"""
+
+import argparse
+
+from sqlalchemy import update
+
+from backend.core.config import settings
+from backend.core.story_codec import FORMAT_VERSION, decode_tree, encode_tree, node_to_dict, tree_stats
+from backend.db.database import SessionLocal, create_tables
+from backend.models.job import StoryJob  # noqa: F401 - registers the table
+from backend.models.story import Story, StoryNode
+
+
+def migrate(args):
+    """Create missing tables, add missing columns and indexes, record the schema version"""
+    create_tables()
+    print("Schema is up to date")
+
+
+def backfill_blobs(args):
+    """Write tree_blob for finished stories that only have story_nodes rows"""
+    db = SessionLocal()
+    converted = 0
+    last_id = 0
+    try:
+        while True:
+            story_ids = [
+                story_id for (story_id,) in db.query(Story.id)
+                .filter(Story.id > last_id, Story.tree_blob.is_(None), Story.is_complete.is_(True))
+                .order_by(Story.id)
+                .limit(args.batch_size)
+            ]
+            if not story_ids:
+                break
+            last_id = story_ids[-1]
+
+            nodes_by_story = {story_id: [] for story_id in story_ids}
+            for node in db.query(StoryNode).filter(StoryNode.story_id.in_(story_ids)).order_by(StoryNode.id):
+                nodes_by_story[node.story_id].append(node_to_dict(node))
+
+            blobs = [
+                {"id": story_id, "tree_blob": encode_tree(nodes), "tree_format": FORMAT_VERSION}
+                for story_id, nodes in nodes_by_story.items() if nodes
+            ]
+            if blobs:
+                db.execute(update(Story), blobs)
+            if args.drop_nodes:
+                db.query(StoryNode).filter(StoryNode.story_id.in_(story_ids)).delete(synchronize_session=False)
+            db.commit()
+
+            converted += len(blobs)
+            print(f"Backfilled {converted} stories (up to id {last_id})", flush=True)
+    finally:
+        db.close()
+
+    print(f"Done: {converted} stories now have a tree blob")
+
+
+def backfill_stats(args):
+    """Compute the tree shape columns for finished stories written before they existed"""
+    db = SessionLocal()
+    updated = 0
+    last_id = 0
+    try:
+        while True:
+            stories = (
+                db.query(Story.id, Story.tree_blob, Story.tree_format)
+                .filter(Story.id > last_id, Story.node_count.is_(None), Story.is_complete.is_(True))
+                .order_by(Story.id)
+                .limit(args.batch_size)
+                .all()
+            )
+            if not stories:
+                break
+            last_id = stories[-1].id
+
+            nodes_by_story = {
+                story.id: decode_tree(story.tree_blob, story.tree_format) if story.tree_blob is not None else []
+                for story in stories
+            }
+            node_story_ids = [story.id for story in stories if story.tree_blob is None]
+            for node in db.query(StoryNode).filter(StoryNode.story_id.in_(node_story_ids)):
+                nodes_by_story[node.story_id].append(node_to_dict(node))
+
+            rows = [
+                {"id": story_id, **tree_stats(nodes)}
+                for story_id, nodes in nodes_by_story.items() if nodes
+            ]
+            if rows:
+                db.execute(update(Story), rows)
+            db.commit()
+
+            updated += len(rows)
+            print(f"Backfilled {updated} stories (up to id {last_id})", flush=True)
+    finally:
+        db.close()
+
+    print(f"Done: {updated} stories now have tree stats")
+
+
+def maintain_jobs(args):
+    """Requeue or fail stuck jobs, then archive or delete old finished ones"""
+    from backend.core.job_maintenance import job_maintenance
+
+    if args.retention_mode:
+        settings.JOB_RETENTION_MODE = args.retention_mode
+    # Requeued jobs only run again if queue workers are polling for them
+    requeue = settings.JOB_QUEUE == "database" and not args.no_requeue
+    result = job_maintenance.run_once(requeue)
+    if result.get("skipped"):
+        print("Skipped: another process is running maintenance")
+        return
+    print(
+        f"Requeued {len(result['requeued'])}, failed {result['failed']} stuck jobs; "
+        f"{settings.JOB_RETENTION_MODE}d {result['expired']} finished jobs"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    commands.add_parser("migrate", help=migrate.__doc__).set_defaults(func=migrate)
+
+    backfill = commands.add_parser("backfill-blobs", help=backfill_blobs.__doc__)
+    backfill.add_argument("--batch-size", type=int, default=200)
+    backfill.add_argument(
+        "--drop-nodes", action="store_true",
+        help="Delete the story_nodes rows once the blob is written (STORY_STORAGE=blob)"
+    )
+    backfill.set_defaults(func=backfill_blobs)
+
+    stats = commands.add_parser("backfill-stats", help=backfill_stats.__doc__)
+    stats.add_argument("--batch-size", type=int, default=200)
+    stats.set_defaults(func=backfill_stats)
+
+    maintain = commands.add_parser("maintain-jobs", help=maintain_jobs.__doc__)
+    maintain.add_argument("--retention-mode", choices=("archive", "delete"), help="Overrides JOB_RETENTION_MODE")
+    maintain.add_argument("--no-requeue", action="store_true", help="Fail stuck jobs instead of requeueing them")
+    maintain.set_defaults(func=maintain_jobs)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
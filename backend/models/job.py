@@ -1,8 +1,11 @@
-from sqlalchemy import Column, Integer, String, DateTime
+from sqlalchemy import JSON, Column, Integer, String, DateTime, Boolean, Index
 from sqlalchemy.sql import func
 
 from backend.db.database import Base
 
+# Statuses of jobs that still need a worker
+ACTIVE_STATUSES = ("pending", "processing")
+
 
 class StoryJob(Base):
     __tablename__ = "story_jobs"
@@ -11,8 +14,73 @@ class StoryJob(Base):
     job_id = Column(String, index=True, unique=True)
     session_id = Column(String, index=True)
     theme = Column(String)
+    # normalize_theme(theme), so differently typed requests for one theme match
+    theme_key = Column(String, nullable=True)
     status = Column(String)
     story_id = Column(Integer, nullable=True)
     error = Column(String, nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
-    completed_at = Column(DateTime(timezone=True), nullable=True)
\ No newline at end of file
+    completed_at = Column(DateTime(timezone=True), nullable=True)
+
+    # Requested tree shape; NULL means the classic single-prompt story
+    depth = Column(Integer, nullable=True)
+    branching = Column(Integer, nullable=True)
+    # Generate only the first choice up front, the rest as it's played
+    lazy = Column(Boolean, default=False)
+
+    # Partial progress while a story streams in
+    nodes_ready = Column(Integer, default=0)
+    root_ready = Column(Boolean, default=False)
+
+    # Dedupes retried or double-clicked creates (see routers/story.py).
+    # A keyed job is inserted as "reserved" while its create request decides
+    # how to serve it; nothing runs or counts reserved jobs.
+    idempotency_key = Column(String, nullable=True)
+
+    # Span timeline of the latest attempt (see backend/core/timeline.py)
+    timeline = Column(JSON, nullable=True)
+
+    # Queue bookkeeping (see backend/core/job_queue.py)
+    attempts = Column(Integer, default=0)
+    available_at = Column(DateTime(timezone=True), nullable=True)
+    started_at = Column(DateTime(timezone=True), nullable=True)
+    lease_owner = Column(String, nullable=True)
+    lease_expires_at = Column(DateTime(timezone=True), nullable=True)
+    heartbeat_at = Column(DateTime(timezone=True), nullable=True)
+
+    __table_args__ = (
+        Index("ix_story_jobs_status_available_at", "status", "available_at"),
+        # Only the few unfinished jobs, not the ever-growing finished ones
+        # (partial on Postgres and SQLite; a plain index elsewhere)
+        Index(
+            "ix_story_jobs_active_status_id", "status", "id",
+            postgresql_where=status.in_(ACTIVE_STATUSES),
+            sqlite_where=status.in_(ACTIVE_STATUSES),
+        ),
+        # Retention sweeps and the admin timeline window
+        Index("ix_story_jobs_completed_at", "completed_at"),
+        # Stories already written for a theme, served when shedding load
+        Index("ix_story_jobs_theme_key_id", "theme_key", "id"),
+        Index("ix_story_jobs_idempotency_key", "idempotency_key", unique=True),
+    )
+
+
+class StoryJobArchive(Base):
+    """Finished jobs moved out of story_jobs by the retention sweep (backend/core/job_maintenance.py)"""
+    __tablename__ = "story_jobs_archive"
+
+    id = Column(Integer, primary_key=True)
+    job_id = Column(String, unique=True)
+    session_id = Column(String)
+    theme = Column(String)
+    status = Column(String)
+    story_id = Column(Integer, nullable=True)
+    error = Column(String, nullable=True)
+    created_at = Column(DateTime(timezone=True), nullable=True)
+    completed_at = Column(DateTime(timezone=True), nullable=True)
+    depth = Column(Integer, nullable=True)
+    branching = Column(Integer, nullable=True)
+    lazy = Column(Boolean, default=False)
+    attempts = Column(Integer, default=0)
+    timeline = Column(JSON, nullable=True)
+    archived_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Boolean, ForeignKey, JSON
+from sqlalchemy import Column, Integer, String, DateTime, Boolean, ForeignKey, Index, JSON, LargeBinary
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 
@@ -12,9 +12,38 @@ class Story(Base):
     title = Column(String, index=True)
     session_id = Column(String, index=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+    # False while nodes are still being streamed in
+    is_complete = Column(Boolean, default=True)
+    # Set while the story sits unclaimed in the warm pool
+    pool_theme = Column(String, nullable=True, index=True)
+    # Whole tree in one compressed value (see backend/core/story_codec.py)
+    tree_blob = Column(LargeBinary, nullable=True)
+    tree_format = Column(Integer, nullable=True)
+    # Requested shape for fan-out and lazy stories
+    theme = Column(String, nullable=True)
+    depth = Column(Integer, nullable=True)
+    branching = Column(Integer, nullable=True)
+    # Lazy stories grow as they are played (see backend/core/lazy_story.py)
+    is_lazy = Column(Boolean, default=False)
+    tokens_used = Column(Integer, default=0)
+    # Tree shape, computed when the tree is written (story_codec.tree_stats);
+    # NULL until then for lazy stories, and for old rows until backfill-stats
+    node_count = Column(Integer, nullable=True)
+    winning_ending_count = Column(Integer, nullable=True)
+    losing_ending_count = Column(Integer, nullable=True)
+    max_depth = Column(Integer, nullable=True)
+    content_length = Column(Integer, nullable=True)
+    is_balanced = Column(Boolean, nullable=True)
 
     nodes = relationship("StoryNode", back_populates="story")
 
+    __table_args__ = (
+        # A session's history, newest first, read page by page (GET /stories)
+        Index("ix_stories_session_id_created_at_id", "session_id", "created_at", "id"),
+        # Finding stories by shape, e.g. balanced ones of a given depth
+        Index("ix_stories_is_balanced_max_depth", "is_balanced", "max_depth"),
+    )
+
 
 class StoryNode(Base):
     __tablename__ = "story_nodes"
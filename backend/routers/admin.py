@@ -0,0 +1,132 @@
+import hmac
+from datetime import timedelta
+from typing import Dict, List, Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from backend.core.config import settings
+from backend.core.job_maintenance import job_maintenance
+from backend.core.job_queue import utcnow
+from backend.core.timeline import PHASES, phase_durations
+from backend.db.database import get_db
+from backend.models.job import StoryJob
+
+
+def require_admin(x_admin_token: Optional[str] = Header(None)):
+    """X-Admin-Token must match ADMIN_TOKEN; with no ADMIN_TOKEN set, nobody gets in"""
+    if not settings.ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Set ADMIN_TOKEN to use the admin endpoints")
+    if not x_admin_token or not hmac.compare_digest(x_admin_token, settings.ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+
+router = APIRouter(
+    prefix="/admin",
+    tags=["admin"],
+    dependencies=[Depends(require_admin)]
+)
+
+
+def _percentiles(values: List[float]) -> dict:
+    values = sorted(values)
+    if not values:
+        return {"count": 0}
+
+    def rank(q: float) -> float:
+        return values[min(len(values) - 1, int(len(values) * q))]
+
+    return {
+        "count": len(values),
+        "p50": rank(0.5),
+        "p95": rank(0.95),
+        "p99": rank(0.99),
+        "max": values[-1],
+    }
+
+
+@router.get("/jobs/timelines")
+def get_job_timelines(
+        minutes: float = Query(60, gt=0, le=7 * 24 * 60, description="Jobs finished in the last N minutes"),
+        status: Optional[str] = Query(None, description="Only completed or failed jobs"),
+        slowest: int = Query(10, ge=0, le=100, description="How many of the slowest jobs to include in full"),
+        db: Session = Depends(get_db)
+):
+    """Per-phase latency percentiles (ms) over recently finished jobs, plus the slowest ones"""
+    since = utcnow() - timedelta(minutes=minutes)
+    query = db.query(StoryJob.job_id, StoryJob.status, StoryJob.completed_at, StoryJob.timeline).filter(
+        StoryJob.completed_at >= since, StoryJob.timeline.isnot(None)
+    )
+    if status:
+        query = query.filter(StoryJob.status == status)
+    rows = query.order_by(StoryJob.completed_at.desc()).limit(settings.ADMIN_TIMELINE_MAX_JOBS).all()
+
+    phases: Dict[str, List[float]] = {phase: [] for phase, _, _ in PHASES}
+    tokens: Dict[str, List[float]] = {"prompt": [], "completion": []}
+    outcomes: Dict[str, int] = {}
+    jobs = []
+    for job_id, job_status, completed_at, timeline in rows:
+        if not timeline:
+            continue
+        durations = phase_durations(timeline)
+        for phase, duration in durations.items():
+            phases[phase].append(duration)
+        for kind, count in (timeline.get("tokens") or {}).items():
+            tokens.setdefault(kind, []).append(count)
+        outcomes[job_status] = outcomes.get(job_status, 0) + 1
+        jobs.append((durations.get("total", 0.0), job_id, job_status, completed_at, durations, timeline))
+
+    jobs.sort(key=lambda job: job[0], reverse=True)
+    return {
+        "window_minutes": minutes,
+        "jobs": len(jobs),
+        "truncated": len(rows) == settings.ADMIN_TIMELINE_MAX_JOBS,
+        "outcomes": outcomes,
+        "phases_ms": {phase: _percentiles(values) for phase, values in phases.items()},
+        "tokens": {kind: _percentiles(values) for kind, values in tokens.items()},
+        "slowest": [
+            {
+                "job_id": job_id,
+                "status": job_status,
+                "completed_at": completed_at,
+                "phases_ms": durations,
+                "timeline": timeline,
+            }
+            for _, job_id, job_status, completed_at, durations, timeline in jobs[:slowest]
+        ],
+    }
+
+
+@router.get("/jobs/maintenance")
+def get_job_maintenance():
+    """Totals of requeued, failed and expired jobs, and when maintenance last ran"""
+    return job_maintenance.stats()
+
+
+@router.post("/jobs/maintenance")
+async def run_job_maintenance():
+    """Run both maintenance sweeps now (requeued jobs are left to the queue workers)"""
+    result = await run_in_threadpool(job_maintenance.run_once, settings.JOB_QUEUE == "database")
+    return {
+        "requeued": len(result["requeued"]),
+        "failed": result["failed"],
+        "expired": result["expired"],
+        "skipped": result.get("skipped", False),
+    }
+
+
+@router.get("/jobs/{job_id}/timeline")
+def get_job_timeline(job_id: str, db: Session = Depends(get_db)):
+    """The span timeline of a job's latest attempt, with per-phase durations (ms)"""
+    row = db.query(StoryJob.status, StoryJob.attempts, StoryJob.timeline).filter(StoryJob.job_id == job_id).first()
+    if row is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    status, attempts, timeline = row
+    return {
+        "job_id": job_id,
+        "status": status,
+        "attempts": attempts,
+        "phases_ms": phase_durations(timeline) if timeline else {},
+        "timeline": timeline,
+    }
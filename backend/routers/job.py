@@ -1,7 +1,15 @@
-from fastapi import APIRouter, Depends, HTTPException
+import asyncio
+import json
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 
-from backend.db.database import get_db
+from backend.core.job_events import job_events, TERMINAL_STATUSES
+from backend.core.job_queue import queue_stats
+from backend.db.database import get_db, SessionLocal
 from backend.models.job import StoryJob
 from backend.schemas.job import StoryJobResponse
 
@@ -10,12 +18,139 @@ router = APIRouter(
     tags=["jobs"]
 )
 
+# Long-poll requests are capped below typical serverless function timeouts
+MAX_WAIT_SECONDS = 25.0
+KEEPALIVE_SECONDS = 15.0
+# How often a long-poll re-reads the job row while nothing is published.
+# Only for jobs this process has no snapshot of (running on another
+# instance); local jobs publish every change, so those polls just wait.
+POLL_SECONDS = KEEPALIVE_SECONDS
 
-@router.get("/{job_id}", response_model=StoryJobResponse)
-def get_job_status(job_id: str, db: Session = Depends(get_db)):
-    job = db.query(StoryJob).filter(StoryJob.job_id == job_id).first()
 
-    if not job:
+def _load_job(job_id: str) -> Optional[dict]:
+    db = SessionLocal()
+    try:
+        job = db.query(StoryJob).filter(StoryJob.job_id == job_id).first()
+        if not job:
+            return None
+        return StoryJobResponse.model_validate(job).model_dump(mode="json")
+    finally:
+        db.close()
+
+
+async def _current_state(job_id: str) -> dict:
+    """Latest job state: the in-process snapshot if we have one, else the DB"""
+    state = job_events.snapshot(job_id)
+    if state is None:
+        state = await run_in_threadpool(_load_job, job_id)
+    if state is None:
         raise HTTPException(status_code=404, detail="Job not found")
+    return state
+
+
+async def read_job_status(job_id: str, wait: float = 0, since: Optional[str] = None) -> dict:
+    """Return the job state, optionally long-polling for a change.
+
+    With `wait`, the request is held until the job's status differs from
+    `since` (or, without `since`, until the next update) or the timeout runs
+    out, whichever comes first. Progress updates that leave the status as it
+    was do not end a `since` poll.
+    """
+    # Subscribe before the first read so an update published in between is
+    # still seen
+    async with job_events.subscribe(job_id) as queue:
+        state = await _current_state(job_id)
+        if not wait or state["status"] in TERMINAL_STATUSES:
+            return state
+        if since is not None and state["status"] != since:
+            return state
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + min(wait, MAX_WAIT_SECONDS)
+        while True:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                return state
+            local = job_events.snapshot(job_id) is not None
+            try:
+                _, latest = await asyncio.wait_for(queue.get(), remaining if local else min(remaining, POLL_SECONDS))
+            except asyncio.TimeoutError:
+                # The job may be running on another instance, which publishes
+                # nothing here; go by the row
+                latest = await _current_state(job_id)
+                if since is None and latest == state:
+                    continue
+            if latest["status"] in TERMINAL_STATUSES:
+                return latest
+            if since is None or latest["status"] != since:
+                return latest
+            state = latest
+
+
+async def _job_updates(job_id: str):
+    """Yield (event, state) pairs until the job finishes.
+
+    Pushed events arrive as soon as they are published. If nothing arrives
+    for a while the DB is re-checked, in case the job is being processed by
+    another instance; an unchanged state is yielded as (None, state).
+    """
+    async with job_events.subscribe(job_id) as queue:
+        state = await _current_state(job_id)
+        yield "status", state
+        while state["status"] not in TERMINAL_STATUSES:
+            try:
+                event, state = await asyncio.wait_for(queue.get(), KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                latest = await _current_state(job_id)
+                event = None if latest == state else "status"
+                state = latest
+            yield event, state
+
+
+@router.get("/queue/stats")
+def get_queue_stats(db: Session = Depends(get_db)):
+    """Database queue depth: ready, delayed (retry backoff), running and stale jobs"""
+    return queue_stats(db)
+
+
+@router.get("/{job_id}", response_model=StoryJobResponse)
+async def get_job_status(
+        job_id: str,
+        wait: float = Query(0, ge=0, description="Seconds to hold the request open waiting for a change"),
+        since: Optional[str] = Query(None, description="Status the client already knows about")
+):
+    return await read_job_status(job_id, wait, since)
+
+
+@router.get("/{job_id}/events")
+async def stream_job_events(job_id: str):
+    """Server-Sent Events stream of job updates, closed once the job finishes"""
+    async def event_stream():
+        async for event, state in _job_updates(job_id):
+            if event is None:
+                yield ": keep-alive\n\n"
+            else:
+                yield f"event: {event}\ndata: {json.dumps(state)}\n\n"
+
+    # Resolve 404s before the stream starts
+    await _current_state(job_id)
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 
-    return job
\ No newline at end of file
+@router.websocket("/{job_id}/ws")
+async def job_events_websocket(websocket: WebSocket, job_id: str):
+    """WebSocket feed of job updates, closed once the job finishes"""
+    await websocket.accept()
+    try:
+        async for event, state in _job_updates(job_id):
+            if event is not None:
+                await websocket.send_json({"event": event, "job": state})
+        await websocket.close()
+    except HTTPException:
+        await websocket.close(code=4404, reason="Job not found")
+    except WebSocketDisconnect:
+        pass
@@ -1,23 +1,42 @@
+import hashlib
+import time
 import uuid
-from typing import Optional
-from datetime import datetime
-from fastapi import APIRouter, Depends, HTTPException, Cookie, Response, BackgroundTasks
+from typing import Dict, List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Cookie, Header, Response, BackgroundTasks, Query
+from sqlalchemy import case, func, select, tuple_
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 
-from backend.db.database import get_db, SessionLocal
+from backend.core.admission import admission
+from backend.core.cache import complete_story_cache, etag_matches, strong_etag
+from backend.core.config import settings
+from backend.core.job_queue import utcnow
+from backend.core.jobs import run_story_job
+from backend.core.lazy_story import NodeLimitReached, lazy_stories, load_story_node
+from backend.core.metrics import STORY_CREATE_REPLAYS
+from backend.core.single_flight import story_flights
+from backend.core.story_codec import decode_tree
+from backend.core.story_generator import StoryGenerator
+from backend.core.story_json import complete_story_body, node_rows_from_blob
+from backend.core.story_pool import normalize_theme, story_pool
+from backend.db.database import get_db
 from backend.models.story import Story, StoryNode
 from backend.models.job import StoryJob
 from backend.schemas.story import (
-    CompleteStoryResponse, CompleteStoryNodeResponse, CreateStoryRequest
+    CompleteStoryResponse, CompleteStoryNodeResponse, CreateStoryRequest, StoryHistoryResponse,
+    StorySummaryResponse
 )
 from backend.schemas.job import StoryJobResponse
-from backend.core.story_generator import StoryGenerator
+from backend.routers.job import read_job_status
 
 router = APIRouter(
     prefix="/stories",
     tags=["stories"]
 )
 
+STORY_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
 
 def get_session_id(session_id: Optional[str] = Cookie(None)):
     if not session_id:
@@ -25,47 +44,84 @@ def get_session_id(session_id: Optional[str] = Cookie(None)):
     return session_id
 
 
-def generate_story_task(job_id: str, theme: str, session_id: str):
-    """Background task to generate a story (Windows compatible - no signal timeout)"""
-    import sys
-    print(f"[BACKGROUND TASK] Started for job_id: {job_id}", flush=True)
-    sys.stdout.flush()
-    
-    db = SessionLocal()
+async def generate_story_task(job_id: str):
+    """Background task to generate a story (JOB_QUEUE=background)"""
+    await run_story_job(job_id)
 
-    try:
-        job = db.query(StoryJob).filter(StoryJob.job_id == job_id).first()
 
-        if not job:
-            print(f"[BACKGROUND TASK] Job not found: {job_id}", flush=True)
-            return
+def _fanout_shape(request: CreateStoryRequest) -> tuple:
+    """Requested (depth, branching), defaulting to the classic 3 x 2 shape"""
+    depth = request.depth or 3
+    branching = request.branching or 2
+    if depth > settings.FANOUT_MAX_DEPTH or branching > settings.FANOUT_MAX_BRANCHING:
+        raise HTTPException(
+            status_code=422,
+            detail=f"depth is limited to {settings.FANOUT_MAX_DEPTH} and branching to {settings.FANOUT_MAX_BRANCHING}"
+        )
+    # Lazy stories only generate the paths that get played, so they may be
+    # larger, but expanding every node must still stay affordable
+    limit = settings.LAZY_MAX_NODES if request.lazy else settings.FANOUT_MAX_NODES
+    if StoryGenerator.fanout_node_count(depth, branching) > limit:
+        raise HTTPException(
+            status_code=422,
+            detail=f"A {depth} x {branching} story would have more than {limit} nodes"
+        )
+    return depth, branching
+
 
-        try:
-            print(f"[BACKGROUND TASK] Setting status to processing", flush=True)
-            job.status = "processing"
-            db.commit()
+def _idempotency_key(
+        session_id: str,
+        header: Optional[str],
+        theme: str,
+        depth: Optional[int],
+        branching: Optional[int],
+        lazy: bool
+) -> Optional[str]:
+    """The stored key for a create request: the client's, or one derived from the request.
 
-            print(f"[BACKGROUND TASK] Calling StoryGenerator.generate_story", flush=True)
-            
-            # No timeout wrapper - Groq is fast enough (8-12 seconds)
-            story = StoryGenerator.generate_story(db, session_id, theme)
+    Both kinds are scoped to the session, so a key another client happens
+    to pick never finds their job. Derived keys cover one fixed window of
+    IDEMPOTENCY_WINDOW_SECONDS, so a duplicate that lands just past a
+    window boundary still gets its own job.
+    """
+    if header is not None:
+        scoped = f"{session_id}\n{header}"
+        return f"key:{hashlib.sha256(scoped.encode()).hexdigest()}"
+    if settings.IDEMPOTENCY_WINDOW_SECONDS <= 0:
+        return None
+    window = int(time.time() // settings.IDEMPOTENCY_WINDOW_SECONDS)
+    request = f"{session_id}\n{theme}\n{depth}\n{branching}\n{lazy}\n{window}"
+    return f"auto:{hashlib.sha256(request.encode()).hexdigest()}"
 
-            job.story_id = story.id
-            job.status = "completed"
-            job.completed_at = datetime.now()
-            db.commit()
-            print(f"[BACKGROUND TASK] Completed! Story ID: {story.id}", flush=True)
-            
-        except Exception as e:
-            print(f"[BACKGROUND TASK] ERROR: {str(e)}", flush=True)
-            import traceback
-            traceback.print_exc()
-            job.status = "failed"
-            job.completed_at = datetime.now()
-            job.error = str(e)
-            db.commit()
-    finally:
-        db.close()
+
+def _replay(job: StoryJob, response: Response, theme: str, depth, branching, lazy: bool) -> StoryJob:
+    """Answer a repeated create with the job the first one made"""
+    if (job.theme, job.depth, job.branching, bool(job.lazy)) != (theme, depth, branching, lazy):
+        raise HTTPException(status_code=422, detail="Idempotency-Key was already used for a different story request")
+    STORY_CREATE_REPLAYS.inc(source="header" if job.idempotency_key.startswith("key:") else "derived")
+    response.headers["Idempotent-Replayed"] = "true"
+    return job
+
+
+def _release_key(db: Session, job: StoryJob):
+    """Let a failed job's key be used again, so a retry gets a fresh attempt"""
+    db.query(StoryJob).filter(StoryJob.id == job.id, StoryJob.status == "failed").update(
+        {"idempotency_key": None}, synchronize_session=False
+    )
+    db.commit()
+
+
+def _insert_job(db: Session, job: StoryJob) -> Optional[StoryJob]:
+    """Commit a new job; if a concurrent duplicate got its key in first, return that job instead"""
+    db.add(job)
+    try:
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        if job.idempotency_key is None:
+            raise
+        return db.query(StoryJob).filter(StoryJob.idempotency_key == job.idempotency_key).first()
+    return None
 
 
 @router.post("/create", response_model=StoryJobResponse)
@@ -74,78 +130,322 @@ def create_story(
         background_tasks: BackgroundTasks,
         response: Response,
         session_id: str = Depends(get_session_id),
+        idempotency_key: Optional[str] = Header(None, max_length=255),
         db: Session = Depends(get_db)
 ):
-    """Create a new story generation job"""
+    """Create a new story generation job.
+
+    Repeating a request with the same Idempotency-Key (or, without one, the
+    same request within IDEMPOTENCY_WINDOW_SECONDS) returns the original
+    job instead of generating another story, unless that job failed.
+    """
     response.set_cookie(key="session_id", value=session_id, httponly=True)
 
     job_id = str(uuid.uuid4())
 
+    depth, branching = None, None
+    if request.lazy or request.depth is not None or request.branching is not None:
+        depth, branching = _fanout_shape(request)
+
+    key = _idempotency_key(session_id, idempotency_key, request.theme, depth, branching, request.lazy)
     job = StoryJob(
         job_id=job_id,
         session_id=session_id,
         theme=request.theme,
-        status="pending"
+        theme_key=normalize_theme(request.theme),
+        status="pending",
+        depth=depth,
+        branching=branching,
+        lazy=request.lazy,
+        idempotency_key=key
     )
+    if key is not None:
+        existing = db.query(StoryJob).filter(StoryJob.idempotency_key == key).first()
+        if existing and existing.status == "failed":
+            _release_key(db, existing)
+        elif existing:
+            return _replay(existing, response, request.theme, depth, branching, request.lazy)
+
+        # Hold the key before claiming or copying a story, so a duplicate
+        # that loses the race can't leave one behind
+        job.status = "reserved"
+        duplicate = _insert_job(db, job)
+        if duplicate:
+            return _replay(duplicate, response, request.theme, depth, branching, request.lazy)
+
+    # Serve a pre-generated story when the theme has a warm pool
+    pooled_story = story_pool.claim(db, request.theme, session_id) if depth is None else None
+    if pooled_story:
+        return _completed_job(db, job, pooled_story.id)
+
+    rejection = admission.check(db, session_id)
+    if rejection:
+        # Overloaded: an existing story for the theme beats no story at all
+        if rejection.status_code == 503 and settings.ADMISSION_SERVE_EXISTING and depth is None:
+            story_id = admission.existing_story(db, request.theme)
+            # The player gets their own copy; the original stays with its session
+            story = StoryGenerator.copy_story(db, story_id, session_id) if story_id is not None else None
+            if story is not None:
+                admission.record("served_existing")
+                response.headers["X-Story-Source"] = "existing"
+                return _completed_job(db, job, story.id)
+        if key is not None:
+            # Nothing was started; a retry with the key should try again
+            db.delete(job)
+            db.commit()
+        raise HTTPException(
+            status_code=rejection.status_code,
+            detail=rejection.detail,
+            headers={"Retry-After": str(rejection.retry_after)}
+        )
+
+    job.status = "pending"
     db.add(job)
     db.commit()
 
-    background_tasks.add_task(
-        generate_story_task,
-        job_id=job_id,
-        theme=request.theme,
-        session_id=session_id
-    )
+    # With the database queue, a worker process picks the job up instead
+    if settings.JOB_QUEUE == "background":
+        background_tasks.add_task(generate_story_task, job_id=job_id)
 
     return job
 
 
-@router.get("/jobs/{job_id}", response_model=StoryJobResponse)
-def get_job_status(job_id: str, db: Session = Depends(get_db)):
-    """Get the status of a story generation job"""
-    job = db.query(StoryJob).filter(StoryJob.job_id == job_id).first()
-    
-    if not job:
-        raise HTTPException(status_code=404, detail="Job not found")
-    
+def _completed_job(db: Session, job: StoryJob, story_id: int) -> StoryJob:
+    """Finish a job on arrival, for a story that already exists"""
+    job.status = "completed"
+    job.story_id = story_id
+    job.root_ready = True
+    job.completed_at = utcnow()
+    db.add(job)
+    db.commit()
     return job
 
 
+@router.get("", response_model=StoryHistoryResponse)
+def list_stories(
+        cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+        limit: int = Query(20, ge=1, le=100),
+        session_id: Optional[str] = Cookie(None),
+        db: Session = Depends(get_db)
+):
+    """Stories created in this session, newest first.
+
+    Keyset pagination: a page is one range scan of the (session_id,
+    created_at, id) index starting just past the cursor story, so deep pages
+    cost the same as the first one. Nodes are never loaded.
+    """
+    if not session_id:
+        return StoryHistoryResponse(stories=[])
+
+    query = db.query(
+        Story.id, Story.title, Story.created_at, Story.is_complete, Story.is_lazy, Story.tree_format,
+        Story.node_count, Story.winning_ending_count, Story.losing_ending_count, Story.max_depth,
+        Story.is_balanced
+    ).filter(Story.session_id == session_id)
+    if cursor:
+        after_id = _decode_cursor(cursor)
+        # Compare against the stored timestamp itself rather than one
+        # round-tripped through the client (SQLite keeps them as text)
+        after_created_at = select(Story.created_at).where(Story.id == after_id).scalar_subquery()
+        query = query.filter(tuple_(Story.created_at, Story.id) < tuple_(after_created_at, after_id))
+    rows = query.order_by(Story.created_at.desc(), Story.id.desc()).limit(limit + 1).all()
+
+    page = rows[:limit]
+    stats = _outcome_stats(db, page)
+    return StoryHistoryResponse(
+        stories=[
+            StorySummaryResponse(
+                id=row.id,
+                title=row.title,
+                created_at=row.created_at,
+                is_complete=row.is_complete is not False,
+                is_lazy=bool(row.is_lazy),
+                **stats.get(row.id, {})
+            )
+            for row in page
+        ],
+        next_cursor=str(page[-1].id) if len(rows) > limit else None
+    )
+
+
+def _decode_cursor(cursor: str) -> int:
+    try:
+        return int(cursor)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def _outcome_stats(db: Session, rows: List) -> Dict[int, dict]:
+    """Node and ending counts for one page of stories.
+
+    Stories carry them as columns once their tree is written; the rest
+    (lazy stories still growing, rows not backfilled yet) are counted here.
+    """
+    stats = {}
+    for row in rows:
+        if row.node_count is not None:
+            stats[row.id] = {
+                "node_count": row.node_count,
+                "ending_count": row.winning_ending_count + row.losing_ending_count,
+                "winning_ending_count": row.winning_ending_count,
+                "max_depth": row.max_depth,
+                "is_balanced": row.is_balanced,
+            }
+    rows = [row for row in rows if row.id not in stats]
+
+    node_story_ids = [row.id for row in rows if row.tree_format is None]
+    if node_story_ids:
+        counts = db.query(
+            StoryNode.story_id,
+            func.count(StoryNode.id),
+            func.sum(case((StoryNode.is_ending, 1), else_=0)),
+            func.sum(case((StoryNode.is_winning_ending, 1), else_=0)),
+        ).filter(StoryNode.story_id.in_(node_story_ids)).group_by(StoryNode.story_id)
+        for story_id, nodes, endings, winning in counts:
+            stats[story_id] = {"node_count": nodes, "ending_count": endings or 0, "winning_ending_count": winning or 0}
+
+    blob_story_ids = [row.id for row in rows if row.tree_format is not None]
+    if blob_story_ids:
+        blobs = db.query(Story.id, Story.tree_blob, Story.tree_format).filter(Story.id.in_(blob_story_ids))
+        for story_id, blob, version in blobs:
+            nodes = decode_tree(blob, version)
+            stats[story_id] = {
+                "node_count": len(nodes),
+                "ending_count": sum(1 for node in nodes if node["is_ending"]),
+                "winning_ending_count": sum(1 for node in nodes if node["is_winning_ending"]),
+            }
+    return stats
+
+
+@router.get("/admission/stats")
+def get_admission_stats():
+    """Admitted and shed story requests, the caps, and the last observed load"""
+    return admission.stats()
+
+
+@router.get("/pool/stats")
+def get_pool_stats(db: Session = Depends(get_db)):
+    """Warm pool depth per theme, hit rate and refill lag"""
+    return story_pool.stats(db)
+
+
+@router.get("/jobs/{job_id}", response_model=StoryJobResponse)
+async def get_job_status(
+        job_id: str,
+        wait: float = Query(0, ge=0, description="Seconds to hold the request open waiting for a change"),
+        since: Optional[str] = Query(None, description="Status the client already knows about")
+):
+    """Get the status of a story generation job (same as GET /jobs/{job_id})"""
+    return await read_job_status(job_id, wait, since)
+
+
+@router.get("/cache/stats")
+def get_cache_stats():
+    """Hit/miss/eviction counters for the complete-story cache"""
+    return complete_story_cache.stats()
+
+
+@router.get("/flights/stats")
+def get_flight_stats():
+    """Single-flight coalescing: generations started, jobs that joined one, overflow"""
+    return story_flights.stats()
+
+
+@router.get("/lazy/stats")
+def get_lazy_stats():
+    """Lazy story growth: nodes generated and prefetched, choice wait times, tokens per story"""
+    return lazy_stories.stats()
+
+
+@router.get("/{story_id}/nodes/{node_id}", response_model=CompleteStoryNodeResponse)
+async def get_story_node(story_id: int, node_id: int):
+    """Fetch one node as it is; options of a lazy story may not have a node_id yet"""
+    node, _ = await run_in_threadpool(load_story_node, story_id, node_id)
+    if node is None:
+        raise HTTPException(status_code=404, detail="Story node not found")
+    return node
+
+
+@router.post("/{story_id}/nodes/{node_id}/expand", response_model=CompleteStoryNodeResponse)
+async def expand_story_node(story_id: int, node_id: int):
+    """Fetch one node of a lazy story, generating its missing children first.
+
+    Makes sure every option has a node_id (generating the missing ones,
+    which can take a few seconds) and starts generating the next level in
+    the background. A POST, since it spends LLM calls. Other stories' nodes
+    are returned as they are.
+    """
+    try:
+        node = await lazy_stories.expand(story_id, node_id)
+    except NodeLimitReached as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=502, detail=f"Failed to generate the next part of the story: {e}")
+    if node is None:
+        raise HTTPException(status_code=404, detail="Story node not found")
+    return node
+
+
 @router.get("/{story_id}/complete", response_model=CompleteStoryResponse)
-def get_complete_story(story_id: int, db: Session = Depends(get_db)):
-    """Get a complete story with all nodes"""
-    story = db.query(Story).filter(Story.id == story_id).first()
+def get_complete_story(
+        story_id: int,
+        if_none_match: Optional[str] = Header(None),
+        db: Session = Depends(get_db)
+):
+    """Get a complete story with all nodes.
+
+    Finished stories never change, so their serialized body is cached and
+    served with a strong ETag; conditional requests for a cached story are
+    answered without touching the database.
+    """
+    cached = complete_story_cache.get(story_id)
+    if cached:
+        body, etag = cached
+        return _story_response(body, etag, immutable=True, if_none_match=if_none_match)
+
+    story = db.query(
+        Story.id, Story.title, Story.created_at,
+        Story.is_complete, Story.tree_blob, Story.tree_format
+    ).filter(Story.id == story_id).first()
     if not story:
         raise HTTPException(status_code=404, detail="Story not found")
 
-    complete_story = build_complete_story_tree(db, story)
-    return complete_story
+    body = complete_story_json(db, story)
 
+    if story.is_complete:
+        etag = complete_story_cache.put(story_id, body)
+    else:
+        # Still streaming in; don't let anyone keep this version
+        etag = strong_etag(body)
+    return _story_response(body, etag, immutable=story.is_complete, if_none_match=if_none_match)
 
-def build_complete_story_tree(db: Session, story: Story) -> CompleteStoryResponse:
-    """Build a complete story tree from database nodes"""
-    nodes = db.query(StoryNode).filter(StoryNode.story_id == story.id).all()
 
-    node_dict = {}
-    for node in nodes:
-        node_response = CompleteStoryNodeResponse(
-            id=node.id,
-            content=node.content,
-            is_ending=node.is_ending,
-            is_winning_ending=node.is_winning_ending,
-            options=node.options
-        )
-        node_dict[node.id] = node_response
+def _story_response(body: bytes, etag: str, immutable: bool, if_none_match: Optional[str]) -> Response:
+    headers = {
+        "ETag": etag,
+        "Cache-Control": STORY_CACHE_CONTROL if immutable else "no-cache",
+    }
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
 
-    root_node = next((node for node in nodes if node.is_root), None)
-    if not root_node:
-        raise HTTPException(status_code=500, detail="Story root node not found")
 
-    return CompleteStoryResponse(
-        id=story.id,
-        title=story.title,
-        session_id=story.session_id,
-        created_at=story.created_at,
-        root_node=node_dict[root_node.id],
-        all_nodes=node_dict
-    )
\ No newline at end of file
+def complete_story_json(db: Session, story) -> bytes:
+    """Serialize a story row (id, title, created_at, tree_blob, tree_format) with all its nodes"""
+    if story.tree_blob is not None:
+        # Compact storage: the whole tree came with the story row
+        node_rows = node_rows_from_blob(story.tree_blob, story.tree_format)
+    else:
+        node_rows = db.query(
+            StoryNode.id, StoryNode.content, StoryNode.is_root,
+            StoryNode.is_ending, StoryNode.is_winning_ending, StoryNode.options
+        ).filter(StoryNode.story_id == story.id).all()
+
+    body = complete_story_body(
+        (story.id, story.title, story.created_at),
+        node_rows,
+        legacy=settings.STORY_RESPONSE_LEGACY_SHAPE
+    )
+    if body is None:
+        raise HTTPException(status_code=500, detail="Story root node not found")
+    return body
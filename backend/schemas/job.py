@@ -14,6 +14,8 @@ class StoryJobResponse(BaseModel):
     story_id: Optional[int] = None
     completed_at: Optional[datetime] = None
     error: Optional[str] = None
+    nodes_ready: int = 0
+    root_ready: bool = False
 
     class Config:
         from_attributes = True
@@ -1,6 +1,6 @@
 from typing import List, Optional, Dict
 from datetime import datetime
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 
 class StoryOptionsSchema(BaseModel):
@@ -24,7 +24,6 @@ class CompleteStoryNodeResponse(StoryNodeBase):
 
 class StoryBase(BaseModel):
     title: str
-    session_id: Optional[str] = None
 
     class Config:
         from_attributes = True
@@ -32,13 +31,39 @@ class StoryBase(BaseModel):
 
 class CreateStoryRequest(BaseModel):
     theme: str
+    # Setting either one generates a deeper tree branch by branch
+    depth: Optional[int] = Field(default=None, ge=2, description="Levels from the opening to the endings")
+    branching: Optional[int] = Field(default=None, ge=2, description="Options at every choice")
+    # Generate the opening and first choice now, everything else as it's played
+    lazy: bool = False
 
 
 class CompleteStoryResponse(StoryBase):
     id: int
     created_at: datetime
-    root_node: CompleteStoryNodeResponse
+    root_node_id: Optional[int] = None
+    # Only with STORY_RESPONSE_LEGACY_SHAPE, which sends it instead of root_node_id
+    root_node: Optional[CompleteStoryNodeResponse] = None
     all_nodes: Dict[int, CompleteStoryNodeResponse]
 
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+class StorySummaryResponse(BaseModel):
+    id: int
+    title: str
+    created_at: datetime
+    is_complete: bool = True
+    is_lazy: bool = False
+    node_count: int = 0
+    ending_count: int = 0
+    winning_ending_count: int = 0
+    # Known once the whole tree has been written
+    max_depth: Optional[int] = None
+    is_balanced: Optional[bool] = None
+
+
+class StoryHistoryResponse(BaseModel):
+    stories: List[StorySummaryResponse]
+    # Pass back as ?cursor= for the next (older) page; None on the last page
+    next_cursor: Optional[str] = None
@@ -59,9 +59,10 @@ try:
                 story_response = requests.get(f"{BASE_URL}/stories/{status_data['story_id']}/complete")
                 story = story_response.json()
                 
+                root_node = story.get('root_node') or story['all_nodes'][str(story['root_node_id'])]
                 print(f"\n   Title: {story['title']}")
-                print(f"   Root node: {story['root_node']['content'][:100]}...")
-                print(f"   Options: {len(story['root_node']['options'])}")
+                print(f"   Root node: {root_node['content'][:100]}...")
+                print(f"   Options: {len(root_node['options'])}")
                 
                 print("\n" + "=" * 60)
                 print("✓✓ SUCCESS! Story generation works!")
@@ -0,0 +1,22 @@
+import os
+
+# Settings are read at import time; keep the tests off any configured database
+os.environ["POSTGRES_URL"] = "sqlite:///:memory:"
+os.environ.setdefault("GROQ_API_KEY", "test")
+
+import pytest
+
+from backend.db.database import Base, SessionLocal, engine
+import backend.models.job  # noqa: F401,E402 - registers the tables
+import backend.models.story  # noqa: F401,E402
+
+
+@pytest.fixture
+def db():
+    Base.metadata.create_all(bind=engine)
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+        Base.metadata.drop_all(bind=engine)
@@ -0,0 +1,115 @@
+from datetime import timedelta
+
+import pytest
+from fastapi import BackgroundTasks, HTTPException, Response
+
+from backend.core.admission import admission
+from backend.core.config import settings
+from backend.core.job_queue import utcnow
+from backend.core.models import StoryLLMResponse
+from backend.core.story_generator import StoryGenerator
+from backend.core.story_pool import normalize_theme
+from backend.models.job import StoryJob
+from backend.models.story import Story
+from backend.routers.story import create_story
+from backend.schemas.story import CreateStoryRequest
+
+from backend.tests.test_story_persist import TREE
+
+
+@pytest.fixture(autouse=True)
+def caps(monkeypatch):
+    monkeypatch.setattr(settings, "ADMISSION_MAX_SESSION_JOBS", 2)
+    monkeypatch.setattr(settings, "ADMISSION_MAX_ACTIVE_JOBS", 3)
+    monkeypatch.setattr(settings, "ADMISSION_THROUGHPUT_WINDOW", 60)
+    monkeypatch.setattr(settings, "ADMISSION_RETRY_AFTER_MAX", 120)
+    monkeypatch.setattr(settings, "JOB_QUEUE", "database")
+
+
+def add_jobs(db, session_id: str, count: int, status: str = "processing", theme: str = "pirates", **columns):
+    db.add_all(
+        StoryJob(
+            job_id=f"{session_id}-{status}-{index}", session_id=session_id, theme=theme,
+            theme_key=normalize_theme(theme), status=status, **columns
+        )
+        for index in range(count)
+    )
+    db.commit()
+
+
+def create(db, session_id: str, theme: str = "pirates", response: Response = None):
+    return create_story(
+        request=CreateStoryRequest(theme=theme),
+        background_tasks=BackgroundTasks(),
+        response=response or Response(),
+        session_id=session_id,
+        idempotency_key=None,
+        db=db
+    )
+
+
+def test_admits_while_under_both_caps(db):
+    add_jobs(db, "a", 1)
+
+    assert admission.check(db, "a") is None
+
+
+def test_session_at_its_cap_gets_429(db):
+    add_jobs(db, "a", 2)
+
+    rejection = admission.check(db, "a")
+
+    assert rejection.status_code == 429
+    assert admission.check(db, "b") is None
+
+
+def test_overload_gets_503_with_retry_after_from_recent_throughput(db):
+    add_jobs(db, "a", 1)
+    add_jobs(db, "b", 2, status="pending")
+    # Six finished in the last minute: 0.1 jobs/s, and one job ahead
+    add_jobs(db, "done", 6, status="completed", completed_at=utcnow() - timedelta(seconds=10))
+
+    rejection = admission.check(db, "c")
+
+    assert rejection.status_code == 503
+    assert rejection.retry_after == 10
+
+
+def test_retry_after_is_capped_without_recent_completions(db):
+    add_jobs(db, "a", 3)
+
+    assert admission.check(db, "c").retry_after == settings.ADMISSION_RETRY_AFTER_MAX
+
+
+def test_finished_and_reserved_jobs_hold_no_slot(db):
+    add_jobs(db, "a", 5, status="completed")
+    add_jobs(db, "a", 5, status="failed")
+    add_jobs(db, "a", 5, status="reserved")
+
+    assert admission.check(db, "a") is None
+
+
+def test_overload_serves_a_copy_of_an_existing_story(db):
+    original = StoryGenerator._save_story(db, "someone", StoryLLMResponse.model_validate(TREE))
+    add_jobs(db, "someone", 1, status="completed", theme="Pirates ", story_id=original.id)
+    add_jobs(db, "busy", 3)
+    response = Response()
+
+    job = create(db, "player", theme="pirates", response=response)
+
+    assert job.status == "completed"
+    assert response.headers["X-Story-Source"] == "existing"
+    copy = db.get(Story, job.story_id)
+    assert copy.id != original.id
+    assert (copy.session_id, copy.title) == ("player", original.title)
+
+
+def test_overload_without_an_existing_story_is_refused(db):
+    add_jobs(db, "busy", 3)
+
+    with pytest.raises(HTTPException) as error:
+        create(db, "player", theme="ghosts")
+
+    assert error.value.status_code == 503
+    assert error.value.headers["Retry-After"] == str(settings.ADMISSION_RETRY_AFTER_MAX)
+    assert db.query(StoryJob).filter(StoryJob.session_id == "player").count() == 0
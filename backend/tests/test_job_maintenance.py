@@ -0,0 +1,86 @@
+from contextlib import contextmanager
+from datetime import timedelta
+
+import pytest
+
+from backend.core import job_maintenance as maintenance
+from backend.core.config import settings
+from backend.core.job_queue import utcnow
+from backend.core.job_maintenance import job_maintenance, recover_stuck_jobs
+from backend.models.job import StoryJob
+
+
+def add_job(db, job_id: str, status: str = "processing", idle: float = 3600, **columns) -> StoryJob:
+    seen = utcnow() - timedelta(seconds=idle)
+    job = StoryJob(
+        job_id=job_id, session_id="s", theme="t", status=status,
+        created_at=seen, started_at=seen, heartbeat_at=seen, **columns
+    )
+    db.add(job)
+    db.commit()
+    return job
+
+
+def statuses(db) -> dict:
+    return dict(db.query(StoryJob.job_id, StoryJob.status))
+
+
+@pytest.fixture(autouse=True)
+def sweep_settings(monkeypatch):
+    monkeypatch.setattr(settings, "JOB_STUCK_SECONDS", 600)
+    monkeypatch.setattr(settings, "JOB_MAX_ATTEMPTS", 3)
+
+
+def test_stuck_background_jobs_are_failed(db, monkeypatch):
+    monkeypatch.setattr(settings, "JOB_QUEUE", "background")
+    add_job(db, "silent")
+    add_job(db, "never-started", status="pending")
+    add_job(db, "alive", idle=10)
+    add_job(db, "ours")
+
+    result = recover_stuck_jobs(db, requeue=False, skip={"ours"})
+
+    assert result == {"requeued": [], "failed": 2}
+    assert statuses(db) == {"silent": "failed", "never-started": "failed", "alive": "processing", "ours": "processing"}
+
+
+def test_stuck_jobs_are_requeued_while_attempts_remain(db, monkeypatch):
+    monkeypatch.setattr(settings, "JOB_QUEUE", "database")
+    add_job(db, "retry", attempts=1)
+    add_job(db, "used-up", attempts=3)
+    add_job(db, "waiting", status="pending")
+
+    result = recover_stuck_jobs(db, requeue=True)
+
+    assert result == {"requeued": ["retry"], "failed": 1}
+    # The queue polls for pending jobs itself in this mode
+    assert statuses(db) == {"retry": "pending", "used-up": "failed", "waiting": "pending"}
+
+
+def test_leased_jobs_are_left_to_the_queue(db, monkeypatch):
+    monkeypatch.setattr(settings, "JOB_QUEUE", "database")
+    add_job(db, "leased", lease_owner="worker-1", lease_expires_at=utcnow() - timedelta(seconds=60))
+
+    assert recover_stuck_jobs(db, requeue=True) == {"requeued": [], "failed": 0}
+    assert statuses(db) == {"leased": "processing"}
+
+
+def test_abandoned_reservations_are_failed_not_requeued(db, monkeypatch):
+    monkeypatch.setattr(settings, "JOB_QUEUE", "database")
+    add_job(db, "abandoned", status="reserved", idempotency_key="key:abc")
+    add_job(db, "deciding", status="reserved", idle=1, idempotency_key="key:def")
+
+    assert recover_stuck_jobs(db, requeue=True) == {"requeued": [], "failed": 1}
+    assert statuses(db) == {"abandoned": "failed", "deciding": "reserved"}
+
+
+def test_run_once_skips_while_another_process_holds_the_lock(db, monkeypatch):
+    @contextmanager
+    def held_elsewhere(lock_id):
+        yield False
+
+    monkeypatch.setattr(maintenance, "advisory_lock", held_elsewhere)
+    add_job(db, "silent")
+
+    assert job_maintenance.run_once(requeue=False)["skipped"]
+    assert statuses(db) == {"silent": "processing"}
@@ -0,0 +1,74 @@
+from datetime import timedelta
+from types import SimpleNamespace
+
+from backend.core.job_queue import claim_next_job, renew_lease, utcnow
+from backend.core.jobs import _complete_job, _fail_job
+from backend.core.timeline import JobTimeline
+from backend.models.job import StoryJob
+
+
+def add_job(db, job_id: str, **columns) -> StoryJob:
+    job = StoryJob(job_id=job_id, session_id="s", theme="t", status="pending", attempts=0, **columns)
+    db.add(job)
+    db.commit()
+    return job
+
+
+def row(db, job_id: str) -> StoryJob:
+    db.expire_all()
+    return db.query(StoryJob).filter(StoryJob.job_id == job_id).one()
+
+
+def test_claims_runnable_jobs_oldest_first(db):
+    add_job(db, "first")
+    add_job(db, "delayed", available_at=utcnow() + timedelta(minutes=5))
+    add_job(db, "second")
+
+    assert claim_next_job("worker-1") == "first"
+    assert claim_next_job("worker-2") == "second"
+    assert claim_next_job("worker-1") is None
+
+    first = row(db, "first")
+    assert (first.status, first.lease_owner, first.attempts) == ("processing", "worker-1", 1)
+
+
+def test_expired_lease_is_reclaimed_by_another_worker(db):
+    add_job(db, "job")
+    claim_next_job("worker-1")
+    db.query(StoryJob).update({"lease_expires_at": utcnow() - timedelta(seconds=1)})
+    db.commit()
+
+    assert claim_next_job("worker-2") == "job"
+    assert not renew_lease("job", "worker-1")
+    assert renew_lease("job", "worker-2")
+    assert (row(db, "job").lease_owner, row(db, "job").attempts) == ("worker-2", 2)
+
+
+def test_outcome_is_recorded_only_under_a_held_lease(db):
+    add_job(db, "job")
+    claim_next_job("worker-1")
+    job = row(db, "job")
+    # worker-1 stalls past its lease and worker-2 takes the job over
+    db.query(StoryJob).update({"lease_expires_at": utcnow() - timedelta(seconds=1)})
+    db.commit()
+    claim_next_job("worker-2")
+
+    assert _complete_job(db, job, SimpleNamespace(id=5), JobTimeline(), "worker-1") is None
+    assert _fail_job(db, job, "boom", "worker-1", JobTimeline()) == "abandoned"
+    reclaimed = row(db, "job")
+    assert (reclaimed.status, reclaimed.lease_owner, reclaimed.story_id) == ("processing", "worker-2", None)
+
+    assert _complete_job(db, reclaimed, SimpleNamespace(id=5), JobTimeline(), "worker-2") == 5
+    finished = row(db, "job")
+    assert (finished.status, finished.lease_owner, finished.story_id) == ("completed", None, 5)
+
+
+def test_failed_attempt_under_a_lease_is_retried(db):
+    add_job(db, "job")
+    claim_next_job("worker-1")
+    job = row(db, "job")
+
+    assert _fail_job(db, job, "boom", "worker-1", JobTimeline()) == "retried"
+    retried = row(db, "job")
+    assert (retried.status, retried.lease_owner, retried.error) == ("pending", None, "boom")
+    assert retried.available_at is not None
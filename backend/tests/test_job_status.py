@@ -0,0 +1,51 @@
+import asyncio
+
+import pytest
+
+from backend.core.job_events import job_events
+from backend.models.job import StoryJob
+from backend.routers import job as job_router
+from backend.routers.job import read_job_status
+
+
+@pytest.fixture
+def db_reads(monkeypatch):
+    reads = []
+    load_job = job_router._load_job
+    monkeypatch.setattr(job_router, "_load_job", lambda job_id: reads.append(job_id) or load_job(job_id))
+    return reads
+
+
+def test_long_poll_of_a_local_job_never_reads_the_database(db_reads, monkeypatch):
+    monkeypatch.setattr(job_router, "POLL_SECONDS", 0.01)
+    job_events.publish("local-job", "status", {"status": "processing", "nodes_ready": 0})
+
+    state = asyncio.run(read_job_status("local-job", wait=0.1, since="processing"))
+
+    assert state["status"] == "processing"
+    assert db_reads == []
+
+
+def test_long_poll_sees_a_published_change(db_reads):
+    job_events.publish("published-job", "status", {"status": "processing"})
+
+    async def poll():
+        waiting = asyncio.create_task(read_job_status("published-job", wait=5, since="processing"))
+        await asyncio.sleep(0.05)
+        job_events.publish("published-job", "status", {"status": "completed", "story_id": 7})
+        return await waiting
+
+    assert asyncio.run(poll())["story_id"] == 7
+    assert db_reads == []
+
+
+def test_long_poll_of_a_remote_job_reads_the_database_every_poll_interval(db, db_reads, monkeypatch):
+    monkeypatch.setattr(job_router, "POLL_SECONDS", 0.05)
+    db.add(StoryJob(job_id="remote-job", session_id="s", theme="t", status="processing"))
+    db.commit()
+
+    state = asyncio.run(read_job_status("remote-job", wait=0.22, since="processing"))
+
+    assert state["status"] == "processing"
+    # One read up front, then one per interval
+    assert 3 <= len(db_reads) <= 6
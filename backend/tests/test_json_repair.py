@@ -0,0 +1,66 @@
+import json
+
+from backend.core.json_repair import extract_json
+
+
+def test_valid_json_is_left_alone():
+    text = '{"title": "T", "rootNode": {"content": "a", "options": []}}'
+    extracted = extract_json(text)
+
+    assert extracted.text == text
+    assert not extracted.repaired
+
+
+def test_strips_prose_and_markdown_fences():
+    extracted = extract_json('Sure! Here it is:\n```json\n{"title": "T"}\n```\nHave fun.')
+
+    assert json.loads(extracted.text) == {"title": "T"}
+
+
+def test_braces_inside_strings_do_not_end_the_object():
+    text = '{"content": "a } tricky { story", "n": 1} trailing {"other": 2}'
+
+    assert json.loads(extract_json(text).text) == {"content": "a } tricky { story", "n": 1}
+
+
+def test_drops_trailing_commas():
+    extracted = extract_json('{"options": [{"text": "a"}, {"text": "b"},],}')
+
+    assert extracted.repaired
+    assert json.loads(extracted.text) == {"options": [{"text": "a"}, {"text": "b"}]}
+
+
+def test_rewrites_single_quoted_strings():
+    extracted = extract_json("{'title': 'It\\'s \"here\"', 'n': 1}")
+
+    assert extracted.repaired
+    assert json.loads(extracted.text) == {"title": "It's \"here\"", "n": 1}
+
+
+def test_escapes_raw_control_characters_in_strings():
+    extracted = extract_json('{"content": "line one\nline two\tend"}')
+
+    assert extracted.repaired
+    assert json.loads(extracted.text) == {"content": "line one\nline two\tend"}
+
+
+def test_truncated_output_keeps_finished_subtrees():
+    text = (
+        '{"title": "T", "rootNode": {"content": "root", "options": ['
+        '{"text": "left", "nextNode": {"content": "done", "isEnding": true}}, '
+        '{"text": "right", "nextNode": {"content": "cut off mid'
+    )
+    extracted = extract_json(text)
+    story = json.loads(extracted.text)
+
+    assert extracted.repaired
+    assert story["title"] == "T"
+    first = story["rootNode"]["options"][0]
+    assert first == {"text": "left", "nextNode": {"content": "done", "isEnding": True}}
+
+
+def test_no_object_returns_the_stripped_text():
+    extracted = extract_json("  no json here  ")
+
+    assert extracted.text == "no json here"
+    assert not extracted.repaired
@@ -0,0 +1,102 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from backend.core.config import settings
+from backend.core.lazy_story import NodeLimitReached, lazy_stories
+from backend.core.story_generator import StoryGenerator
+from backend.models.story import Story, StoryNode
+from backend.routers.story import _fanout_shape, expand_story_node, get_story_node
+from backend.schemas.story import CreateStoryRequest
+
+
+@pytest.fixture
+def llm(monkeypatch):
+    calls = []
+
+    async def generate_part(client, prompt, usage=None):
+        calls.append(prompt)
+        return {"content": f"Part {len(calls)}", "options": [{"text": "On"}, {"text": "Back"}]}
+
+    monkeypatch.setattr(StoryGenerator, "_get_async_groq_client", classmethod(lambda cls: None))
+    monkeypatch.setattr(StoryGenerator, "_generate_fanout_part", generate_part)
+    monkeypatch.setattr(settings, "LAZY_PREFETCH_CHILDREN", 0)
+    return calls
+
+
+def add_lazy_story(db) -> StoryNode:
+    # Right is already written, Left is not. One pending option at a time:
+    # the tests' shared in-memory connection doesn't isolate concurrent attaches
+    story = Story(title="Lazy", session_id="s", theme="caves", is_lazy=True, is_complete=False, depth=3, branching=2)
+    db.add(story)
+    db.flush()
+    right = StoryNode(story_id=story.id, content="Cave", is_root=False, is_ending=True, is_winning_ending=True, options=[])
+    db.add(right)
+    db.flush()
+    root = StoryNode(
+        story_id=story.id, content="Start", is_root=True, is_ending=False, is_winning_ending=False,
+        options=[{"text": "Left", "node_id": None}, {"text": "Right", "node_id": right.id}]
+    )
+    db.add(root)
+    db.commit()
+    return root
+
+
+def test_expand_generates_every_missing_child(db, llm):
+    root = add_lazy_story(db)
+
+    node = asyncio.run(expand_story_node(root.story_id, root.id))
+
+    assert len(llm) == 1
+    children = [option["node_id"] for option in node["options"]]
+    assert None not in children
+    assert db.query(StoryNode).filter(StoryNode.id.in_(children)).count() == 2
+    # Already there: nothing more to generate
+    asyncio.run(lazy_stories.expand(root.story_id, root.id))
+    assert len(llm) == 1
+
+
+def test_get_never_generates(db, llm):
+    root = add_lazy_story(db)
+
+    node = asyncio.run(get_story_node(root.story_id, root.id))
+
+    assert llm == []
+    assert node["options"][0]["node_id"] is None
+
+
+def test_expansion_stops_at_the_node_limit_before_calling_the_llm(db, llm, monkeypatch):
+    monkeypatch.setattr(settings, "LAZY_MAX_NODES", 2)
+    root = add_lazy_story(db)
+
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(expand_story_node(root.story_id, root.id))
+
+    assert error.value.status_code == 409
+    assert llm == []
+    assert db.query(StoryNode).filter(StoryNode.story_id == root.story_id).count() == 2
+
+
+def test_node_limit_is_checked_again_when_storing(db, llm, monkeypatch):
+    root = add_lazy_story(db)
+
+    async def fill_up_meanwhile(client, prompt, usage=None):
+        # Another expansion stores the story's last allowed node first
+        monkeypatch.setattr(settings, "LAZY_MAX_NODES", 2)
+        return {"content": "Late", "options": []}
+
+    monkeypatch.setattr(StoryGenerator, "_generate_fanout_part", fill_up_meanwhile)
+
+    with pytest.raises(NodeLimitReached):
+        asyncio.run(lazy_stories.expand(root.story_id, root.id))
+    assert db.query(StoryNode).filter(StoryNode.story_id == root.story_id).count() == 2
+
+
+def test_lazy_shapes_larger_than_the_limit_are_refused(monkeypatch):
+    monkeypatch.setattr(settings, "LAZY_MAX_NODES", 15)
+
+    assert _fanout_shape(CreateStoryRequest(theme="caves", lazy=True, depth=4, branching=2)) == (4, 2)
+    with pytest.raises(HTTPException) as error:
+        _fanout_shape(CreateStoryRequest(theme="caves", lazy=True, depth=5, branching=2))
+    assert error.value.status_code == 422
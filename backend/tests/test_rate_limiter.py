@@ -0,0 +1,80 @@
+import pytest
+
+from backend.core.rate_limiter import TokenBucket, parse_duration
+
+
+def bucket(per_minute: float, now: float = 0.0) -> TokenBucket:
+    token_bucket = TokenBucket(per_minute)
+    token_bucket.updated = now
+    return token_bucket
+
+
+def test_starts_full():
+    token_bucket = bucket(60)
+
+    assert token_bucket.rate == 1.0
+    assert token_bucket.wait_time(60, now=0) == 0
+
+
+def test_waits_for_the_missing_amount():
+    token_bucket = bucket(60)
+    token_bucket.take(50, now=0)
+
+    assert token_bucket.wait_time(10, now=0) == 0
+    assert token_bucket.wait_time(20, now=0) == pytest.approx(10)
+    # Five seconds later five more have trickled in
+    assert token_bucket.wait_time(20, now=5) == pytest.approx(5)
+
+
+def test_refill_is_capped_at_capacity():
+    token_bucket = bucket(60)
+    token_bucket.take(30, now=0)
+    token_bucket.wait_time(1, now=1000)
+
+    assert token_bucket.level == 60
+
+
+def test_reservations_can_go_into_debt():
+    token_bucket = bucket(60)
+    token_bucket.take(90, now=0)
+
+    assert token_bucket.level == -30
+    assert token_bucket.wait_time(10, now=0) == pytest.approx(40)
+
+
+def test_requests_larger_than_capacity_wait_for_a_full_bucket():
+    token_bucket = bucket(60)
+    token_bucket.take(60, now=0)
+
+    assert token_bucket.wait_time(600, now=0) == pytest.approx(60)
+
+
+def test_give_back_is_capped():
+    token_bucket = bucket(60)
+    token_bucket.take(10, now=0)
+    token_bucket.give_back(50, now=0)
+
+    assert token_bucket.level == 60
+
+
+def test_observe_follows_the_server():
+    token_bucket = bucket(60)
+    token_bucket.observe(limit=120, remaining=12, now=0)
+
+    assert token_bucket.capacity == 120
+    assert token_bucket.level == 12
+    # A higher remaining count never adds tokens we didn't see refill
+    token_bucket.observe(limit=None, remaining=100, now=0)
+    assert token_bucket.level == 12
+
+
+@pytest.mark.parametrize("value, seconds", [
+    ("7.66s", 7.66),
+    ("2m59.56s", 179.56),
+    ("450ms", 0.45),
+    ("3", 3.0),
+    (None, None),
+    ("soon", None),
+])
+def test_parse_duration(value, seconds):
+    assert parse_duration(value) == (pytest.approx(seconds) if seconds is not None else None)
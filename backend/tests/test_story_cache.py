@@ -0,0 +1,71 @@
+import json
+
+import pytest
+
+from backend.core.cache import ResponseCache
+from backend.core.models import StoryLLMResponse
+from backend.core.story_generator import StoryGenerator
+from backend.models.story import Story
+from backend.routers import story as story_router
+from backend.routers.story import STORY_CACHE_CONTROL, get_complete_story
+
+from backend.tests.test_story_persist import TREE
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    # Story ids start over with every test database
+    cache = ResponseCache(max_entries=10, max_bytes=1 << 20)
+    monkeypatch.setattr(story_router, "complete_story_cache", cache)
+    return cache
+
+
+def save_story(db) -> int:
+    return StoryGenerator._save_story(db, "session", StoryLLMResponse.model_validate(TREE)).id
+
+
+def test_complete_story_is_served_with_a_strong_etag(db, cache):
+    story_id = save_story(db)
+
+    response = get_complete_story(story_id, if_none_match=None, db=db)
+
+    assert response.status_code == 200
+    assert json.loads(response.body)["title"] == TREE["title"]
+    assert response.headers["ETag"].startswith('"')
+    assert response.headers["Cache-Control"] == STORY_CACHE_CONTROL
+    assert cache.get(story_id) == (response.body, response.headers["ETag"])
+
+
+@pytest.mark.parametrize("if_none_match", ["{etag}", "W/{etag}", '"other", {etag}', "*"])
+def test_matching_conditional_request_gets_304_from_the_cache(db, cache, if_none_match):
+    story_id = save_story(db)
+    etag = get_complete_story(story_id, if_none_match=None, db=db).headers["ETag"]
+
+    # Cached: answered without a database session at all
+    response = get_complete_story(story_id, if_none_match=if_none_match.format(etag=etag), db=None)
+
+    assert response.status_code == 304
+    assert response.body == b""
+    assert response.headers["ETag"] == etag
+
+
+def test_stale_etag_gets_the_body(db, cache):
+    story_id = save_story(db)
+    get_complete_story(story_id, if_none_match=None, db=db)
+
+    response = get_complete_story(story_id, if_none_match='"stale"', db=None)
+
+    assert response.status_code == 200
+    assert json.loads(response.body)["id"] == story_id
+
+
+def test_unfinished_story_is_not_cached(db, cache):
+    story_id = save_story(db)
+    db.query(Story).filter(Story.id == story_id).update({"is_complete": False})
+    db.commit()
+
+    response = get_complete_story(story_id, if_none_match=None, db=db)
+
+    assert response.headers["Cache-Control"] == "no-cache"
+    assert cache.get(story_id) is None
+    assert get_complete_story(story_id, if_none_match=response.headers["ETag"], db=db).status_code == 304
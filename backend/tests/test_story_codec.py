@@ -0,0 +1,93 @@
+from types import SimpleNamespace
+
+import pytest
+
+from backend.core.story_codec import FORMAT_VERSION, decode_tree, encode_tree, node_to_dict, tree_stats
+
+
+def node(node_id, content="text", is_root=False, is_ending=False, is_winning_ending=False, options=()):
+    return {
+        "id": node_id,
+        "content": content,
+        "is_root": is_root,
+        "is_ending": is_ending,
+        "is_winning_ending": is_winning_ending,
+        "options": [{"text": f"to {target}", "node_id": target} for target in options],
+    }
+
+
+def classic_tree():
+    """Root, two choices, four endings: one winning, three losing"""
+    return [
+        node(1, "Start", is_root=True, options=(2, 3)),
+        node(2, "Left", options=(4, 5)),
+        node(3, "Right", options=(6, 7)),
+        node(4, "Win", is_ending=True, is_winning_ending=True),
+        node(5, "Lose", is_ending=True),
+        node(6, "Lose", is_ending=True),
+        node(7, "Lose", is_ending=True),
+    ]
+
+
+def test_round_trip():
+    nodes = classic_tree()
+    nodes[0]["content"] = "Ünïcode ☃ and \"quotes\"\nand newlines"
+
+    assert decode_tree(encode_tree(nodes), FORMAT_VERSION) == nodes
+
+
+def test_round_trip_keeps_unlinked_options():
+    nodes = [node(1, is_root=True)]
+    nodes[0]["options"] = [{"text": "Not written yet", "node_id": None}]
+
+    assert decode_tree(encode_tree(nodes), FORMAT_VERSION) == nodes
+
+
+def test_unknown_format_version_is_rejected():
+    with pytest.raises(ValueError):
+        decode_tree(encode_tree(classic_tree()), FORMAT_VERSION + 1)
+
+
+def test_node_to_dict_reads_row_attributes():
+    row = SimpleNamespace(
+        id=5, content="c", is_root=False, is_ending=True, is_winning_ending=False,
+        options=[], story_id=9
+    )
+
+    assert node_to_dict(row) == node(5, "c", is_ending=True)
+
+
+def test_tree_stats_of_the_classic_tree():
+    assert tree_stats(classic_tree()) == {
+        "node_count": 7,
+        "winning_ending_count": 1,
+        "losing_ending_count": 3,
+        "max_depth": 3,
+        "content_length": len("StartLeftRightWinLoseLoseLose"),
+        "is_balanced": True,
+    }
+
+
+def test_tree_stats_depth_counts_the_root():
+    assert tree_stats([node(1, is_root=True, is_ending=True)])["max_depth"] == 1
+
+
+def test_tree_stats_unbalanced_without_a_winning_ending():
+    nodes = classic_tree()
+    nodes[3]["is_winning_ending"] = False
+
+    stats = tree_stats(nodes)
+    assert stats["winning_ending_count"] == 0
+    assert stats["losing_ending_count"] == 4
+    assert not stats["is_balanced"]
+
+
+def test_tree_stats_ignores_missing_children_and_cycles():
+    nodes = [
+        node(1, is_root=True, options=(2, 99)),
+        node(2, options=(1,)),
+    ]
+
+    stats = tree_stats(nodes)
+    assert stats["max_depth"] == 2
+    assert stats["node_count"] == 2
@@ -0,0 +1,74 @@
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import HTTPException
+
+from backend.models.story import Story
+from backend.routers.story import list_stories
+
+SESSION = "history-session"
+
+
+def add_stories(db, session_id: str, count: int, started: datetime) -> list:
+    # Three stories per second, like CURRENT_TIMESTAMP on SQLite, so there are ties
+    stories = [
+        Story(title=f"Story {index}", session_id=session_id, created_at=started + timedelta(seconds=index // 3))
+        for index in range(count)
+    ]
+    db.add_all(stories)
+    db.commit()
+    return stories
+
+
+def walk(db, session_id: str, limit: int) -> list:
+    pages, cursor = [], None
+    while True:
+        page = list_stories(cursor=cursor, limit=limit, session_id=session_id, db=db)
+        pages.append([summary.id for summary in page.stories])
+        if page.next_cursor is None:
+            return pages
+        cursor = page.next_cursor
+
+
+def test_history_pages_cover_the_session_newest_first(db):
+    stories = add_stories(db, SESSION, 25, datetime(2026, 1, 1))
+    add_stories(db, "someone-else", 10, datetime(2026, 1, 1))
+    expected = [story.id for story in sorted(stories, key=lambda story: (story.created_at, story.id), reverse=True)]
+
+    pages = walk(db, SESSION, limit=10)
+
+    assert [len(page) for page in pages] == [10, 10, 5]
+    assert [story_id for page in pages for story_id in page] == expected
+
+
+def test_history_last_page_has_no_cursor(db):
+    add_stories(db, SESSION, 4, datetime(2026, 1, 1))
+
+    page = list_stories(cursor=None, limit=4, session_id=SESSION, db=db)
+
+    assert len(page.stories) == 4
+    assert page.next_cursor is None
+
+
+def test_history_page_is_stable_when_newer_stories_arrive(db):
+    add_stories(db, SESSION, 6, datetime(2026, 1, 1))
+    first = list_stories(cursor=None, limit=3, session_id=SESSION, db=db)
+    add_stories(db, SESSION, 3, datetime(2026, 2, 1))
+
+    second = list_stories(cursor=first.next_cursor, limit=3, session_id=SESSION, db=db)
+
+    seen = {summary.id for summary in first.stories}
+    assert len(second.stories) == 3
+    assert seen.isdisjoint(summary.id for summary in second.stories)
+
+
+def test_history_without_a_session_is_empty(db):
+    add_stories(db, SESSION, 3, datetime(2026, 1, 1))
+
+    assert list_stories(cursor=None, limit=10, session_id=None, db=db).stories == []
+
+
+def test_history_rejects_a_bad_cursor(db):
+    with pytest.raises(HTTPException) as error:
+        list_stories(cursor="not-a-story", limit=10, session_id=SESSION, db=db)
+    assert error.value.status_code == 400
@@ -0,0 +1,79 @@
+import pytest
+
+from backend.core.config import settings
+from backend.core.models import StoryLLMResponse
+from backend.core.story_generator import StoryGenerator
+from backend.models.story import Story, StoryNode
+
+TREE = {
+    "title": "The Drowned Lantern",
+    "rootNode": {
+        "content": "Start",
+        "options": [
+            {"text": "Left", "nextNode": {"content": "Left end", "isEnding": True}},
+            {
+                "text": "Right",
+                "nextNode": {
+                    "content": "Lake",
+                    "options": [
+                        {"text": "Swim", "nextNode": {"content": "Shore", "isEnding": True, "isWinningEnding": True}},
+                        {"text": "Wait", "nextNode": {"content": "Cold", "isEnding": True}},
+                    ],
+                },
+            },
+        ],
+    },
+}
+
+
+@pytest.fixture
+def bulk_settings(monkeypatch):
+    monkeypatch.setattr(settings, "BULK_PERSIST", True)
+    monkeypatch.setattr(settings, "STORY_STORAGE", "nodes")
+
+
+def test_bulk_persist_links_options_to_preassigned_ids(db, bulk_settings, monkeypatch):
+    # An earlier story's nodes, so allocation has to start past them
+    StoryGenerator._save_story(db, "earlier", StoryLLMResponse.model_validate(TREE))
+    calls = []
+    allocate = StoryGenerator._allocate_node_ids.__func__
+    monkeypatch.setattr(
+        StoryGenerator, "_allocate_node_ids",
+        classmethod(lambda cls, db, count: calls.append(count) or allocate(cls, db, count))
+    )
+
+    story = StoryGenerator._save_story(db, "session", StoryLLMResponse.model_validate(TREE))
+
+    assert calls == [5]
+    nodes = {node.id: node for node in db.query(StoryNode).filter(StoryNode.story_id == story.id)}
+    earlier = db.query(StoryNode.id).filter(StoryNode.story_id != story.id).all()
+    assert len(nodes) == 5
+    assert sorted(nodes) == list(range(max(node_id for (node_id,) in earlier) + 1, max(nodes) + 1))
+
+    by_content = {node.content: node for node in nodes.values()}
+    root = by_content["Start"]
+    assert [node.is_root for node in nodes.values()].count(True) == 1
+    assert root.is_root and not root.is_ending
+
+    def child(node, text):
+        option = next(option for option in node.options if option["text"] == text)
+        return nodes[option["node_id"]]
+
+    assert child(root, "Left").content == "Left end"
+    lake = child(root, "Right")
+    assert lake.content == "Lake" and not lake.is_ending
+    shore, cold = child(lake, "Swim"), child(lake, "Wait")
+    assert (shore.is_ending, shore.is_winning_ending) == (True, True)
+    assert (cold.is_ending, cold.is_winning_ending) == (True, False)
+    assert db.get(Story, story.id).node_count == 5
+
+
+def test_falls_back_to_recursive_inserts_without_preassigned_ids(db, bulk_settings, monkeypatch):
+    monkeypatch.setattr(StoryGenerator, "_allocate_node_ids", classmethod(lambda cls, db, count: None))
+
+    story = StoryGenerator._save_story(db, "session", StoryLLMResponse.model_validate(TREE))
+
+    nodes = {node.id: node for node in db.query(StoryNode).filter(StoryNode.story_id == story.id)}
+    assert len(nodes) == 5
+    for node in nodes.values():
+        assert all(option["node_id"] in nodes for option in node.options or [])
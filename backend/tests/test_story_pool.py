@@ -0,0 +1,49 @@
+import asyncio
+import threading
+from contextlib import contextmanager
+
+from backend.core import story_pool as pool_module
+from backend.core.story_pool import StoryPool
+
+
+def fake_lock(granted: bool, calls: list):
+    @contextmanager
+    def advisory_lock(lock_id):
+        calls.append(("acquire", threading.get_ident()))
+        try:
+            yield granted
+        finally:
+            calls.append(("release", threading.get_ident()))
+
+    return advisory_lock
+
+
+def test_refill_lock_is_taken_and_released_off_the_event_loop(monkeypatch):
+    calls, refilled = [], []
+    monkeypatch.setattr(pool_module, "advisory_lock", fake_lock(True, calls))
+    pool = StoryPool()
+
+    async def refill():
+        refilled.append(threading.get_ident())
+
+    monkeypatch.setattr(pool, "_refill", refill)
+    asyncio.run(pool.refill_once())
+
+    loop_thread = refilled[0]
+    assert [step for step, _ in calls] == ["acquire", "release"]
+    assert all(thread != loop_thread for _, thread in calls)
+
+
+def test_refill_is_skipped_without_the_lock(monkeypatch):
+    calls, refilled = [], []
+    monkeypatch.setattr(pool_module, "advisory_lock", fake_lock(False, calls))
+    pool = StoryPool()
+
+    async def refill():
+        refilled.append(True)
+
+    monkeypatch.setattr(pool, "_refill", refill)
+    asyncio.run(pool.refill_once())
+
+    assert refilled == []
+    assert [step for step, _ in calls] == ["acquire", "release"]
@@ -0,0 +1,130 @@
+from types import SimpleNamespace
+
+import pytest
+from fastapi import BackgroundTasks, HTTPException, Response
+
+from backend.core.admission import Rejection, admission
+from backend.core.config import settings
+from backend.core.story_pool import story_pool
+from backend.models.job import StoryJob
+from backend.routers import story as story_router
+from backend.routers.story import _idempotency_key, create_story
+from backend.schemas.story import CreateStoryRequest
+
+
+def create(db, session_id: str = "session-a", key: str = "retry-me", theme: str = "pirates"):
+    return create_story(
+        request=CreateStoryRequest(theme=theme),
+        background_tasks=BackgroundTasks(),
+        response=Response(),
+        session_id=session_id,
+        idempotency_key=key,
+        db=db
+    )
+
+
+@pytest.fixture
+def database_queue(monkeypatch):
+    # Keep create_story from scheduling generation in the test process
+    monkeypatch.setattr(settings, "JOB_QUEUE", "database")
+
+
+def test_header_keys_are_scoped_to_the_session():
+    first = _idempotency_key("session-a", "retry-me", "pirates", None, None, False)
+
+    assert first.startswith("key:")
+    assert first == _idempotency_key("session-a", "retry-me", "ghosts", None, None, False)
+    assert first != _idempotency_key("session-b", "retry-me", "pirates", None, None, False)
+    assert first != _idempotency_key("session-a", "another-key", "pirates", None, None, False)
+
+
+def test_no_derived_key_by_default(monkeypatch):
+    monkeypatch.setattr(settings, "IDEMPOTENCY_WINDOW_SECONDS", 0)
+
+    assert _idempotency_key("session-a", None, "pirates", None, None, False) is None
+
+
+def test_derived_keys_cover_one_window(monkeypatch):
+    monkeypatch.setattr(settings, "IDEMPOTENCY_WINDOW_SECONDS", 10)
+    now = [1000.0]
+    monkeypatch.setattr(story_router.time, "time", lambda: now[0])
+
+    key = _idempotency_key("session-a", None, "pirates", None, None, False)
+    assert key.startswith("auto:")
+
+    now[0] = 1009.9
+    assert _idempotency_key("session-a", None, "pirates", None, None, False) == key
+    now[0] = 1010.0
+    assert _idempotency_key("session-a", None, "pirates", None, None, False) != key
+
+
+@pytest.mark.parametrize("changed", [
+    ("session-b", "pirates", None, None, False),
+    ("session-a", "ghosts", None, None, False),
+    ("session-a", "pirates", 4, 2, False),
+    ("session-a", "pirates", None, None, True),
+])
+def test_derived_keys_differ_per_session_and_request(monkeypatch, changed):
+    monkeypatch.setattr(settings, "IDEMPOTENCY_WINDOW_SECONDS", 10)
+    monkeypatch.setattr(story_router.time, "time", lambda: 1000.0)
+    session_id, theme, depth, branching, lazy = changed
+
+    assert (
+        _idempotency_key(session_id, None, theme, depth, branching, lazy)
+        != _idempotency_key("session-a", None, "pirates", None, None, False)
+    )
+
+
+def test_key_is_reserved_before_a_pooled_story_is_claimed(db, database_queue, monkeypatch):
+    seen = []
+
+    def claim(db, theme, session_id):
+        seen.append(db.query(StoryJob.status).filter(StoryJob.idempotency_key.isnot(None)).all())
+        return SimpleNamespace(id=42)
+
+    monkeypatch.setattr(story_pool, "claim", claim)
+
+    job = create(db)
+
+    assert seen == [[("reserved",)]]
+    assert (job.status, job.story_id) == ("completed", 42)
+    assert create(db).job_id == job.job_id
+    assert db.query(StoryJob).count() == 1
+
+
+def test_duplicate_of_a_reserved_job_is_replayed_without_claiming(db, database_queue, monkeypatch):
+    claims = []
+    monkeypatch.setattr(story_pool, "claim", lambda db, theme, session_id: claims.append(theme))
+    reserved = StoryJob(
+        job_id="first", session_id="session-a", theme="pirates", status="reserved", lazy=False,
+        idempotency_key=_idempotency_key("session-a", "retry-me", "pirates", None, None, False)
+    )
+    db.add(reserved)
+    db.commit()
+
+    assert create(db).job_id == "first"
+    assert claims == []
+
+
+def test_same_key_in_another_session_gets_its_own_job(db, database_queue, monkeypatch):
+    monkeypatch.setattr(story_pool, "claim", lambda db, theme, session_id: None)
+    monkeypatch.setattr(admission, "check", lambda db, session_id: None)
+
+    first = create(db, session_id="session-a")
+    second = create(db, session_id="session-b")
+
+    assert first.job_id != second.job_id
+    assert (first.status, second.status) == ("pending", "pending")
+
+
+def test_rejected_create_gives_its_key_back(db, database_queue, monkeypatch):
+    monkeypatch.setattr(story_pool, "claim", lambda db, theme, session_id: None)
+    monkeypatch.setattr(admission, "check", lambda db, session_id: Rejection(429, "busy", 5))
+
+    with pytest.raises(HTTPException) as error:
+        create(db)
+    assert error.value.status_code == 429
+    assert db.query(StoryJob).count() == 0
+
+    monkeypatch.setattr(admission, "check", lambda db, session_id: None)
+    assert create(db).status == "pending"
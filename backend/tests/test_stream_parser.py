@@ -0,0 +1,105 @@
+import json
+
+import pytest
+
+from backend.core.stream_parser import StoryStreamParser
+
+STORY = {
+    "title": "The Drowned Lantern",
+    "rootNode": {
+        "content": "The tunnel splits in two.",
+        "isEnding": False,
+        "options": [
+            {"text": "Go left", "nextNode": {"content": "Cold air. You freeze.", "isEnding": True}},
+            {
+                "text": "Go right",
+                "nextNode": {
+                    "content": "A \"quiet\" lake\nglows.",
+                    "isEnding": False,
+                    "options": [
+                        {
+                            "text": "Swim",
+                            "nextNode": {"content": "You find the way out.", "isEnding": True, "isWinningEnding": True},
+                        },
+                    ],
+                },
+            },
+        ],
+    },
+}
+
+
+def feed_in_chunks(parser: StoryStreamParser, text: str, size: int) -> list:
+    events = []
+    for start in range(0, len(text), size):
+        events.extend(parser.feed(text[start:start + size]))
+    return events
+
+
+@pytest.mark.parametrize("size", [1, 7, 64, 10000])
+def test_reports_every_node_whatever_the_chunking(size):
+    parser = StoryStreamParser()
+    events = feed_in_chunks(parser, json.dumps(STORY), size)
+
+    assert parser.done
+    assert parser.title == "The Drowned Lantern"
+    assert parser.result == STORY
+    assert [node.content for node in parser.nodes] == [
+        "The tunnel splits in two.",
+        "Cold air. You freeze.",
+        "A \"quiet\" lake\nglows.",
+        "You find the way out.",
+    ]
+    assert [kind for kind, _ in events].count("start") == 4
+    assert [kind for kind, _ in events].count("done") == 4
+
+
+def test_parents_start_before_children():
+    parser = StoryStreamParser()
+    starts = [node for kind, node in feed_in_chunks(parser, json.dumps(STORY), 5) if kind == "start"]
+
+    assert starts[0].parent is None
+    for node in starts[1:]:
+        assert node.parent is not None
+        assert node.parent < node.index
+    assert [node.option_text for node in starts[1:]] == ["Go left", "Go right", "Swim"]
+
+
+def test_root_is_ready_before_the_rest_of_the_tree():
+    text = json.dumps(STORY)
+    parser = StoryStreamParser()
+    parser.feed(text[:text.index('"Go left"')])
+
+    assert parser.root_ready
+    assert parser.nodes[0].content == "The tunnel splits in two."
+    assert not parser.done
+
+
+def test_ending_flags():
+    parser = StoryStreamParser()
+    parser.feed(json.dumps(STORY))
+
+    endings = [(node.is_ending, node.is_winning_ending) for node in parser.nodes]
+    assert endings == [(False, False), (True, False), (False, False), (True, True)]
+
+
+def test_ignores_prose_and_fences_around_the_object():
+    parser = StoryStreamParser()
+    parser.feed("Here is your story:\n```json\n" + json.dumps(STORY) + "\n```\nEnjoy!")
+
+    assert parser.done
+    assert parser.result == STORY
+
+
+def test_unicode_escapes():
+    parser = StoryStreamParser()
+    parser.feed('{"title": "Caf\\u00e9", "rootNode": {"content": "\\u2603", "options": []}}')
+
+    assert parser.title == "Café"
+    assert parser.nodes[0].content == "☃"
+
+
+def test_rejects_malformed_json():
+    parser = StoryStreamParser()
+    with pytest.raises(ValueError):
+        parser.feed("{'title': 'single quotes'}")
@@ -0,0 +1,63 @@
+import json
+
+import pytest
+from pydantic import ValidationError
+
+from backend.core.story_generator import _StreamingStoryWriter
+from backend.core.stream_parser import StoryStreamParser
+from backend.models.story import Story, StoryNode
+
+from backend.tests.test_stream_parser import STORY
+
+
+def stream_into(db, story: dict, progress: list) -> tuple:
+    parser = StoryStreamParser()
+    writer = _StreamingStoryWriter(db, "session", lambda story_id, nodes: progress.append((story_id, nodes)))
+    text = json.dumps(story)
+    for start in range(0, len(text), 16):
+        events = parser.feed(text[start:start + 16])
+        if events:
+            writer.apply(parser, events)
+    return parser, writer
+
+
+def test_finish_writes_the_whole_tree(db):
+    progress = []
+    parser, writer = stream_into(db, STORY, progress)
+
+    story = writer.finish(parser)
+
+    assert story.is_complete
+    assert story.title == "The Drowned Lantern"
+    assert db.query(StoryNode).filter(StoryNode.story_id == story.id).count() == 4
+    assert progress[-1] == (story.id, 4)
+
+
+def test_finish_rejects_a_dead_end(db):
+    dead_end = json.loads(json.dumps(STORY))
+    dead_end["rootNode"]["options"][1]["nextNode"]["options"] = []
+    parser, writer = stream_into(db, dead_end, [])
+
+    with pytest.raises(ValidationError):
+        writer.finish(parser)
+
+
+def test_finish_rejects_a_winning_non_ending(db):
+    winning = json.loads(json.dumps(STORY))
+    winning["rootNode"]["isWinningEnding"] = True
+    parser, writer = stream_into(db, winning, [])
+
+    with pytest.raises(ValidationError):
+        writer.finish(parser)
+
+
+def test_discard_deletes_the_story_and_takes_back_its_progress(db):
+    progress = []
+    parser, writer = stream_into(db, STORY, progress)
+    story_id = progress[0][0]
+
+    writer.discard()
+
+    assert progress[-1] == (None, 0)
+    assert db.get(Story, story_id) is None
+    assert db.query(StoryNode).filter(StoryNode.story_id == story_id).count() == 0
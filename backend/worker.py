@@ -0,0 +1,147 @@
+"""
+Standalone story generation worker for the database job queue.
+
+Set JOB_QUEUE=database on the API so it only enqueues jobs, then run from
+the project root:
+    python -m backend.worker [--processes 2] [--concurrency 16]
+
+Each process runs up to --concurrency generations at once on one event loop.
+SIGINT/SIGTERM stop claiming new jobs and let running ones finish. The
+first process also runs job maintenance every JOB_MAINTENANCE_INTERVAL
+seconds (backend/core/job_maintenance.py) and keeps the warm story pool
+topped up (backend/core/story_pool.py).
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import os
+import signal
+import socket
+from typing import Optional, Set
+
+from starlette.concurrency import run_in_threadpool
+
+from backend.core.config import settings
+from backend.core.job_maintenance import job_maintenance
+from backend.core.job_queue import claim_next_job, renew_lease
+from backend.core.jobs import run_story_job
+from backend.core.log import get_logger
+from backend.core.story_generator import StoryGenerator
+from backend.core.story_pool import story_pool
+
+log = get_logger("WORKER")
+
+class QueueWorker:
+    def __init__(self, worker_id: str, concurrency: int, housekeeping: bool = False):
+        self.worker_id = worker_id
+        self.concurrency = concurrency
+        self.housekeeping = housekeeping
+        self._stopping: Optional[asyncio.Event] = None
+
+    async def run(self):
+        self._stopping = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, self._stopping.set)
+            except (NotImplementedError, RuntimeError):
+                pass  # Windows: fall back to KeyboardInterrupt
+
+        log.info("Started", worker_id=self.worker_id, concurrency=self.concurrency)
+        slots = asyncio.Semaphore(self.concurrency)
+        in_flight: Set[asyncio.Task] = set()
+        chores: Set[asyncio.Task] = set()
+        if self.housekeeping and settings.JOB_MAINTENANCE_INTERVAL > 0:
+            chores.add(asyncio.create_task(job_maintenance.run_periodic()))
+        if self.housekeeping and settings.POOL_THEMES:
+            chores.add(asyncio.create_task(story_pool.run_refill_worker()))
+
+        try:
+            while not self._stopping.is_set():
+                await slots.acquire()
+                job_id = await run_in_threadpool(claim_next_job, self.worker_id)
+                if job_id is None:
+                    slots.release()
+                    await self._idle()
+                    continue
+
+                task = asyncio.create_task(self._process(job_id))
+                in_flight.add(task)
+                task.add_done_callback(in_flight.discard)
+                task.add_done_callback(lambda _: slots.release())
+        finally:
+            for task in chores:
+                task.cancel()
+            await asyncio.gather(*chores, return_exceptions=True)
+            if in_flight:
+                log.info("Finishing running jobs", worker_id=self.worker_id, jobs=len(in_flight))
+                await asyncio.gather(*in_flight, return_exceptions=True)
+            await StoryGenerator.close_async_client()
+            log.info("Stopped", worker_id=self.worker_id)
+
+    async def _idle(self):
+        try:
+            await asyncio.wait_for(self._stopping.wait(), settings.WORKER_POLL_INTERVAL)
+        except asyncio.TimeoutError:
+            pass
+
+    async def _process(self, job_id: str):
+        """Run one job, renewing its lease until it finishes"""
+        work = asyncio.create_task(run_story_job(job_id, lease_owner=self.worker_id))
+        while True:
+            done, _ = await asyncio.wait({work}, timeout=settings.JOB_HEARTBEAT_SECONDS)
+            if done:
+                break
+            if not await run_in_threadpool(renew_lease, job_id, self.worker_id):
+                log.warning("Lost lease, abandoning job", job_id=job_id)
+                work.cancel()
+                break
+        try:
+            await work
+        except asyncio.CancelledError:
+            pass
+
+
+def run_process(concurrency: int, housekeeping: bool = True):
+    worker_id = f"{socket.gethostname()}:{os.getpid()}"
+    try:
+        asyncio.run(QueueWorker(worker_id, concurrency, housekeeping).run())
+    except KeyboardInterrupt:
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--processes", type=int, default=settings.WORKER_PROCESSES)
+    parser.add_argument("--concurrency", type=int, default=settings.WORKER_CONCURRENCY)
+    args = parser.parse_args()
+
+    if args.processes <= 1:
+        run_process(args.concurrency)
+        return
+
+    processes = [
+        multiprocessing.Process(target=run_process, args=(args.concurrency, i == 0), name=f"story-worker-{i}")
+        for i in range(args.processes)
+    ]
+    for process in processes:
+        process.start()
+
+    def forward(signum, frame):
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+
+    signal.signal(signal.SIGTERM, forward)
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        # Children got the same SIGINT and are shutting down on their own
+        for process in processes:
+            process.join()
+
+
+if __name__ == "__main__":
+    main()
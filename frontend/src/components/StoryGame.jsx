@@ -1,10 +1,11 @@
 import { useState, useMemo } from "react";
 
 function StoryGame({ story, onNewStory }) {
+  // The API names the root by id; older responses inline it as root_node
+  const rootNodeId = story?.root_node_id ?? story?.root_node?.id ?? null;
+
   // Initialize from props directly
-  const [currentNodeId, setCurrentNodeId] = useState(
-    story?.root_node?.id || null,
-  );
+  const [currentNodeId, setCurrentNodeId] = useState(rootNodeId);
 
   // Calculate derived state using useMemo
   const { currentNode, options, isEnding, isWinningEnding } = useMemo(() => {
@@ -35,8 +36,8 @@ function StoryGame({ story, onNewStory }) {
   };
 
   const restartStory = () => {
-    if (story && story.root_node) {
-      setCurrentNodeId(story.root_node.id);
+    if (rootNodeId) {
+      setCurrentNodeId(rootNodeId);
     }
   };
 
@@ -40,30 +40,30 @@ function StoryGenerator() {
 
   const pollJobStatus = async (jobId) => {
     return new Promise((resolve, reject) => {
-      const maxAttempts = 60; // 60 seconds max
-      let attempts = 0;
+      const deadline = Date.now() + 90000; // 90 seconds max
+      let lastStatus = null;
 
       const checkStatus = async () => {
         try {
-          attempts++;
-
+          // Long-poll: the server holds the request until the status changes
           const response = await axios.get(
             `${API_BASE_URL}/stories/jobs/${jobId}`,
+            { params: lastStatus ? { wait: 25, since: lastStatus } : {} },
           );
 
           const job = response.data;
-          console.log(`Polling attempt ${attempts}:`, job.status);
+          lastStatus = job.status;
+          console.log("Job status:", job.status);
 
           if (job.status === "completed") {
             console.log("Story completed! ID:", job.story_id);
             resolve(job.story_id);
           } else if (job.status === "failed") {
             reject(new Error(job.error || "Story generation failed"));
-          } else if (attempts >= maxAttempts) {
+          } else if (Date.now() >= deadline) {
             reject(new Error("Story generation timed out"));
           } else {
-            // Still processing, check again in 1 second
-            setTimeout(checkStatus, 1000);
+            checkStatus();
           }
         } catch (err) {
           reject(err);